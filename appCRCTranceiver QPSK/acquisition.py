@@ -0,0 +1,207 @@
+import argparse
+import functools
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from framing import BITS_PER_SYMBOL, DEFAULT_PROFILE, PREAMBLE_BYTE, PROFILES, SAMP_RATE, SPS, burst_preamble_len
+
+# Symbols in one acquisition window; a preamble of two windows always holds a whole one
+WINDOW_SYMBOLS = 128
+# FFT zero padding over the window length for the coarse search
+OVERSAMPLE = 8
+# Lag-one-symbol correlation above which a window is taken for preamble
+DETECT_THRESHOLD = 0.7
+# Residual offsets the FLL/Costas and symbol sync loops pull in quickly: 1 % of the
+# symbol rate and an eighth of a symbol
+PULL_IN_CFO = 0.01
+PULL_IN_TIMING = 0.125
+
+
+@dataclass(frozen=True)
+class Acquisition:
+    """Carrier and timing of a received 0xAA preamble.
+
+    cfo is in cycles per sample, timing the sample offset of the symbol centres
+    within a symbol (0 <= timing < sps) and phase the carrier phase in radians,
+    both at the first sample of the window. purity is the fraction of the window
+    energy in the preamble's two tones (1 for a clean preamble).
+    """
+    cfo: float
+    timing: float
+    phase: float
+    purity: float
+
+
+# Training preamble bytes that hold two acquisition windows
+def preamble_len(sps=SPS, window_symbols=WINDOW_SYMBOLS):
+    return math.ceil(2 * window_symbols * BITS_PER_SYMBOL / 8)
+
+
+# How much a window looks like the preamble, from 0 (data or noise) to 1
+def detect(iq, sps=SPS):
+    """0xAA flips the carrier every symbol, so every sample is minus the one a
+    symbol earlier (rotated by the frequency offset). Works on the last axis, so
+    a 2-D array of windows is checked in one go.
+    """
+    iq = np.asarray(iq, dtype=np.complex64)
+    corr = np.abs(np.sum(iq[..., sps:] * np.conj(iq[..., :-sps]), axis=-1))
+    power = np.sum(iq.real * iq.real + iq.imag * iq.imag, axis=-1)
+    return corr / np.maximum(power, np.finfo(np.float32).tiny)
+
+
+# Complex amplitudes of the two preamble tones at +-Rs/2, after removing `cfo`
+def _tones(iq, cfo, sps):
+    t = np.arange(len(iq))
+    y = iq * np.exp(-2j * np.pi * cfo * t)
+    half = np.exp(-1j * np.pi * t / sps)
+    return y, y * half, y * np.conj(half)
+
+
+# Estimate frequency offset, symbol timing and carrier phase from a window of preamble
+def estimate(iq, sps=SPS, max_cfo=None, oversample=OVERSAMPLE):
+    """The differentially encoded 0xAA preamble alternates between two opposite
+    constellation points, so after pulse shaping it is a pair of tones at
+    cfo -+ Rs/2. The coarse offset is the peak of the summed power of bin pairs
+    one symbol rate apart in a zero-padded FFT; the phase drift of the tone pair
+    between the two halves of the window refines it. The tones' phases then give
+    the carrier phase (their mean) and the symbol timing (their difference).
+
+    Offsets are searched up to `max_cfo` cycles per sample (default Rs/4; beyond
+    Rs/2 the tone pairs alias).
+    """
+    iq = np.asarray(iq, dtype=np.complex64)
+    n = len(iq)
+    max_cfo = 1 / (4 * sps) if max_cfo is None else max_cfo
+    nfft = sps << max(0, math.ceil(math.log2(oversample * n / sps)))
+    power = np.abs(np.fft.fft(iq * np.hanning(n), nfft)) ** 2
+    score = power + np.roll(power, -(nfft // sps))
+    # Bin k holds the lower tone of an offset k/nfft + Rs/2
+    cfos = (np.arange(nfft) / nfft + 1 / (2 * sps) + 0.5) % 1 - 0.5
+    k = int(np.argmax(np.where(np.abs(cfos) <= max_cfo, score, -1)))
+    a, b, c = score[k - 1], score[k], score[(k + 1) % nfft]
+    cfo = cfos[k] + (0.5 * (a - c) / (a - 2 * b + c) if a - 2 * b + c else 0.0) / nfft
+
+    # The tone pair's phase turns by 4*pi*residual per sample
+    _, upper, lower = _tones(iq, cfo, sps)
+    h = n // 2
+    first = np.sum(upper[:h]) * np.sum(lower[:h])
+    second = np.sum(upper[h:2 * h]) * np.sum(lower[h:2 * h])
+    cfo += np.angle(second * np.conj(first)) / (4 * np.pi * h)
+
+    y, upper, lower = _tones(iq, cfo, sps)
+    up, low = np.sum(upper), np.sum(lower)
+    energy = np.sum(np.abs(y) ** 2)
+    return Acquisition(
+        cfo=float(cfo),
+        timing=float(np.angle(low * np.conj(up)) * sps / (2 * np.pi) % sps),
+        phase=float(np.angle(up * low) / 2),
+        purity=float((abs(up) ** 2 + abs(low) ** 2) / max(n * energy, np.finfo(np.float32).tiny)),
+    )
+
+
+# Timing and phase of the preamble as the modulator sends it, with no channel in between
+@functools.lru_cache(maxsize=8)
+def reference(sps=SPS, window_symbols=WINDOW_SYMBOLS):
+    from qpsk_sim import Modulator
+    return estimate(Modulator(sps).raw(bytes([PREAMBLE_BYTE]) * (window_symbols * BITS_PER_SYMBOL // 8)), sps)
+
+
+# Shift by a fractional number of samples (positive: later) with an FFT, padding against wrap-around
+def delay(iq, samples):
+    n = len(iq)
+    pad = n + 2 * math.ceil(abs(samples)) + 64
+    f = np.fft.fftfreq(pad)
+    return np.fft.ifft(np.fft.fft(iq, pad) * np.exp(-2j * np.pi * f * samples))[:n].astype(np.complex64)
+
+
+# Undo the offsets found by estimate() so the burst is on the modulator's carrier and symbol grid
+def correct(iq, acq, sps=SPS):
+    """Removes the frequency offset and carrier phase (up to the multiple of pi/2
+    the differential decoder does not care about) and moves the symbol centres
+    to where the modulator put them. `iq` starts at the window estimate() saw.
+    """
+    ref = reference(sps)
+    t = np.arange(len(iq))
+    y = iq * np.exp(-1j * (2 * np.pi * acq.cfo * t + acq.phase - ref.phase))
+    shift = (acq.timing - ref.timing + sps / 2) % sps - sps / 2
+    return delay(y, -shift)
+
+
+# Synthetic bursts with random offsets: estimate, correct and decode each one
+def self_test(trials=100, ebn0_db=10.0, window_symbols=WINDOW_SYMBOLS, packets=2, max_cfo=None, sps=SPS,
+              packet_len=8, seed=None):
+    """Each burst is a window of preamble followed by `packets` random packets,
+    sent through a channel with a random frequency offset (up to `max_cfo`,
+    default Rs/8), fractional delay and carrier phase, plus AWGN. Prints the
+    estimation errors and how many packets qpsk_sim decodes with and without the
+    correction. qpsk_sim has no tracking loops, so the residual frequency error
+    shows up as lost packets towards the end of longer bursts; the flowgraph's
+    loops only need to start inside their pull-in range. Returns True when every
+    burst is within PULL_IN_CFO of the frequency and PULL_IN_TIMING of the timing.
+    """
+    from qpsk_sim import Modulator, awgn, demodulate
+
+    rng = np.random.default_rng(seed)
+    max_cfo = 1 / (8 * sps) if max_cfo is None else max_cfo
+    ref = reference(sps, window_symbols)
+    cfo_err, timing_err, phase_err = [], [], []
+    decoded = raw = 0
+    for _ in range(trials):
+        cfo, lag, phase = rng.uniform(-max_cfo, max_cfo), rng.uniform(0, sps), rng.uniform(-np.pi, np.pi)
+        payload = rng.integers(0, 256, packets * packet_len, dtype=np.uint8).tobytes()
+        mod = Modulator(sps, packet_len=packet_len)
+        pre = mod.raw(bytes([PREAMBLE_BYTE]) * (window_symbols * BITS_PER_SYMBOL // 8))
+        tx = np.concatenate((pre, mod.process(payload), mod.flush()))
+        t = np.arange(len(tx))
+        rx = awgn(delay(tx, lag) * np.exp(1j * (2 * np.pi * cfo * t + phase)).astype(np.complex64), ebn0_db, sps, rng=rng)
+
+        acq = estimate(rx[:len(pre)], sps)
+        cfo_err.append(acq.cfo - cfo)
+        timing_err.append((acq.timing - ref.timing - lag + sps / 2) % sps - sps / 2)
+        # Carrier phase at the start, seen through the ambiguities of QPSK
+        phase_err.append((acq.phase - ref.phase - phase + np.pi / 4) % (np.pi / 2) - np.pi / 4)
+        decoded += len(demodulate(correct(rx, acq, sps), sps, packet_len=packet_len)[0]) // packet_len
+        raw += len(demodulate(rx, sps, packet_len=packet_len)[0]) // packet_len
+
+    def rms(values):
+        return float(np.sqrt(np.mean(np.square(values))))
+
+    sent = trials * packets
+    print(f"{trials} bursts, {window_symbols}-symbol preamble, Eb/N0 {ebn0_db} dB, "
+          f"offsets up to {max_cfo * SAMP_RATE / 1e3:.1f} kHz at {SAMP_RATE / 1e6:g} Msps")
+    print(f"- Frequency error: {rms(cfo_err) * SAMP_RATE:.1f} Hz rms, {max(map(abs, cfo_err)) * SAMP_RATE:.1f} Hz max")
+    print(f"- Timing error: {rms(timing_err):.3f} samples rms, {max(map(abs, timing_err)):.3f} max (sps {sps})")
+    print(f"- Phase error: {np.degrees(rms(phase_err)):.1f} deg rms, {np.degrees(max(map(abs, phase_err))):.1f} max")
+    print(f"- Packets decoded: {decoded}/{sent} corrected, {raw}/{sent} uncorrected")
+    print(f"- Preamble: {preamble_len(sps, window_symbols)} bytes for two windows, against {burst_preamble_len(sps)} "
+          f"for loop settling in burst mode and {PROFILES[DEFAULT_PROFILE].preamble_len} in the {DEFAULT_PROFILE} profile")
+    return max(map(abs, cfo_err)) < PULL_IN_CFO / sps and max(map(abs, timing_err)) < PULL_IN_TIMING * sps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coarse frequency, timing and phase acquisition on the 0xAA preamble.")
+    parser.add_argument("--input_path", help="Raw complex64 recording; estimate on the window starting at --offset.")
+    parser.add_argument("--offset", type=int, default=0, help="First sample of the window in the recording.")
+    parser.add_argument("--self_test", type=int, metavar="N", help="Run N synthetic bursts with random offsets instead.")
+    parser.add_argument("--ebn0_db", type=float, default=10.0, help="Eb/N0 of the synthetic bursts.")
+    parser.add_argument("--window_symbols", type=int, default=WINDOW_SYMBOLS, help="Preamble symbols per estimate.")
+    parser.add_argument("--max_cfo_hz", type=float, help="Largest frequency offset to search for (or to simulate).")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol.")
+    parser.add_argument("--seed", type=int, help="Seed of the synthetic bursts.")
+    args = parser.parse_args()
+
+    max_cfo = args.max_cfo_hz / SAMP_RATE if args.max_cfo_hz is not None else None
+    if args.self_test:
+        raise SystemExit(0 if self_test(args.self_test, args.ebn0_db, args.window_symbols, max_cfo=max_cfo,
+                                        sps=args.sps, seed=args.seed) else 1)
+    elif args.input_path:
+        window = np.fromfile(args.input_path, dtype=np.complex64, count=args.window_symbols * args.sps,
+                             offset=args.offset * 8)
+        print(f"Preamble likeness {detect(window, args.sps):.2f}")
+        acq = estimate(window, args.sps, max_cfo)
+        print(f"Frequency offset {acq.cfo * SAMP_RATE:.1f} Hz, timing {acq.timing:.3f} samples, "
+              f"phase {np.degrees(acq.phase):.1f} deg, purity {acq.purity:.2f}")
+    else:
+        parser.error("give --input_path or --self_test")
@@ -1,27 +1,58 @@
 import os
 import argparse
 
+from framing import DEFAULT_PROFILE, PACKET_LEN, SPS, airtime_report, get_profile, profile_names
+
+# Size of the blocks streamed from the input file to the output file
+CHUNK_SIZE = 1024 * 1024
+
+# Write a byte repeated `count` times without building the whole run in memory
+def _write_repeated(output_file, value, count, chunk_size=CHUNK_SIZE):
+    block = memoryview(bytes([value]) * min(count, chunk_size))
+    while count > 0:
+        n = min(count, len(block))
+        output_file.write(block[:n])
+        count -= n
+
 # Add preamble to file content
-def add_preamble(input_path, output_path):
-    """Adds a preamble and detection sequence to the file content and saves to a new file."""
+def add_preamble(input_path, output_path, chunk_size=CHUNK_SIZE, profile=None, align=None):
+    """Adds a preamble and detection sequence to the file content and saves to a new file.
+
+    The input is streamed through in blocks of `chunk_size` bytes, so memory use
+    stays bounded regardless of the input size and the data is read only once.
+    The preamble and detection sequence lengths come from the framing `profile`.
+    With `align` (the flowgraph packet length) the leading preamble is lengthened
+    so the content starts on a packet boundary, keeping per-packet AES records
+    one to a packet.
+    """
     if not os.path.exists(input_path):
         print(f"Error: File '{input_path}' does not exist.")
         exit(1)
 
     # Define preamble and detection sequences
-    preamble = bytes([0b10101010]) * 200000  # Preamble sequence
-    detect_sequence = bytes([0b00110011]) * 5  # Detection sequence (16 bytes long)
-    
-    # Read the original file content
-    with open(input_path, 'rb') as input_file:
-        original_content = input_file.read()
+    profile = profile or get_profile(DEFAULT_PROFILE)
+    preamble_byte, preamble_len = profile.preamble_byte, profile.preamble_len  # Preamble sequence
+    detect_sequence = profile.detect_sequence  # Detection sequence
+    lead_len = preamble_len
+    if align:
+        lead_len += -(preamble_len + len(detect_sequence)) % align
     
     # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     
     # Write preamble, detection sequence, original content, detection sequence, and preamble
-    with open(output_path, 'wb') as output_file:
-        output_file.write(preamble + detect_sequence + original_content + detect_sequence + preamble)
+    with open(input_path, 'rb') as input_file, open(output_path, 'wb') as output_file:
+        _write_repeated(output_file, preamble_byte, lead_len, chunk_size)
+        output_file.write(detect_sequence)
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            n = input_file.readinto(buf)
+            if not n:
+                break
+            output_file.write(view[:n])
+        output_file.write(detect_sequence)
+        _write_repeated(output_file, preamble_byte, preamble_len, chunk_size)
     
     print(f"Preamble added and file saved to: {output_path}")
 
@@ -31,6 +62,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Add a preamble and detection sequence to a file.")
     parser.add_argument("--input_path_tx", required=True, help="Path to the input file.")
     parser.add_argument("--output_path_tx", required=True, help="Path to save the output file.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=profile_names(), help="Framing profile setting the preamble and detection sequence lengths.")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol of the transmitter; sizes the 'minimal' preamble.")
+    parser.add_argument("--packet_len", "--packet-len", dest="packet_len", type=int, default=PACKET_LEN, help="Payload bytes per flowgraph packet; sizes the 'minimal' preamble.")
+    parser.add_argument("--align", action="store_true", help="Pad the leading preamble so the content starts on a --packet_len boundary.")
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE, help="Block size in bytes used to stream the input file.")
     
     # Parse the arguments
     args = parser.parse_args()
@@ -41,5 +77,7 @@ if __name__ == "__main__":
     
     # Add the preamble and save the output
     print("Adding preamble and saving the output...")
-    add_preamble(input_path_tx, output_path_tx)
+    profile = get_profile(args.profile, args.sps, args.packet_len)
+    add_preamble(input_path_tx, output_path_tx, args.chunk_size, profile, args.packet_len if args.align else None)
+    print(airtime_report(profile, sps=args.sps, packet_len=args.packet_len))
     print("Process completed successfully.")
@@ -2,32 +2,189 @@ from Cryptodome.Cipher import AES
 from Cryptodome.Random import get_random_bytes
 from Cryptodome.Util.Padding import pad, unpad
 import argparse
+import io
 import os
+import time
+
+from aes_encryptor import (CHUNK_SIZE, HEADER, MAGIC, MODE_GCM, PACKET_HEADER, PACKET_LAST, PACKET_TAG_LEN,
+                           SEGMENT_SIZE, TAG_LEN, VERSION, iter_segments, make_pool, map_ordered, packet_nonce,
+                           packet_payload_len, read_ahead, segment_aad, segment_nonce)
 
 def unpad(data):
     pad_len = data[-1]
     return data[:-pad_len]
 
-def decrypt_file(input_path, output_path, key_path):
-    with open(key_path, 'rb') as f:
-        key = f.read()
+def _open_segment(key, header, nonce_prefix, index, final, record):
+    cipher = AES.new(key, AES.MODE_GCM, nonce=segment_nonce(nonce_prefix, index), mac_len=TAG_LEN)
+    cipher.update(segment_aad(header, index, final))
+    try:
+        return cipher.decrypt_and_verify(record[:-TAG_LEN], record[-TAG_LEN:])
+    except ValueError:
+        raise ValueError(f"AES-GCM segment {index} failed authentication (corrupted or truncated file)") from None
+
+def decrypt_stream_gcm(src, dst, key, header, workers=None):
+    """Decrypts the segments of an AES-GCM container in a process pool, writing them in order."""
+    magic, version, mode, segment_size, nonce_prefix = HEADER.unpack(header)
+    if version != VERSION or mode != MODE_GCM:
+        raise ValueError(f"Unsupported AES container (version {version}, mode {mode})")
+    workers = workers or os.cpu_count() or 1
+    with make_pool(workers) as pool:
+        jobs = ((key, header, nonce_prefix, index, final, record)
+                for index, final, record in iter_segments(src, segment_size + TAG_LEN))
+        for plaintext in map_ordered(pool, _open_segment, jobs, 2 * workers):
+            dst.write(plaintext)
+
+class PacketDecryptor:
+    """Recovers per-packet AES-GCM records from a received byte stream as it arrives.
+
+    Records are found by authenticating them, so the stream may contain preamble
+    bytes, and packets lost to the CRC check leave a gap without disturbing the
+    records around it. After a record fails to verify the decryptor slides forward
+    (straight to the next occurrence of the salt once it is known) until one
+    verifies again.
+    """
+
+    def __init__(self, key, packet_len):
+        self.key = key
+        self.packet_len = packet_len
+        self.payload_len = packet_payload_len(packet_len)
+        self.salt = None
+        self.last_seq = None
+        self.seen = bytearray()
+        self._buffer = bytearray()
+
+    def _open(self, record):
+        salt, seq, length = PACKET_HEADER.unpack_from(record)
+        if (length & ~PACKET_LAST) > self.payload_len or (self.salt is not None and salt != self.salt):
+            return None
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=packet_nonce(salt, seq), mac_len=PACKET_TAG_LEN)
+        cipher.update(record[:PACKET_HEADER.size])
+        try:
+            data = cipher.decrypt_and_verify(record[PACKET_HEADER.size:-PACKET_TAG_LEN], record[-PACKET_TAG_LEN:])
+        except ValueError:
+            return None
+        self.salt = salt
+        if length & PACKET_LAST:
+            self.last_seq = seq
+        if seq >= len(self.seen):
+            self.seen.extend(bytes(seq + 1 - len(self.seen)))
+        self.seen[seq] = 1
+        return seq, data[:length & ~PACKET_LAST]
+
+    def feed(self, data):
+        """Adds received bytes; returns (sequence number, plaintext) for every record they complete."""
+        self._buffer += data
+        buffer, pos, opened = self._buffer, 0, []
+        while len(buffer) - pos >= self.packet_len:
+            record = self._open(bytes(buffer[pos:pos + self.packet_len]))
+            if record is not None:
+                opened.append(record)
+                pos += self.packet_len
+            elif self.salt is not None:
+                found = buffer.find(self.salt, pos + 1)
+                pos = found if found != -1 else max(pos + 1, len(buffer) - len(self.salt) + 1)
+            else:
+                pos += 1
+        del buffer[:pos]
+        return opened
 
-    with open(input_path, 'rb') as f:
-        iv = f.read(16)
-        ciphertext = f.read()
+    def missing(self):
+        """Sequence numbers not received so far (up to the last record, once it has been seen)."""
+        end = len(self.seen) if self.last_seq is None else self.last_seq + 1
+        return [seq for seq in range(end) if seq >= len(self.seen) or not self.seen[seq]]
 
+    @property
+    def done(self):
+        return self.last_seq is not None and not self.missing()
+
+def decrypt_stream_packets(src, dst, key, packet_len, chunk_size=CHUNK_SIZE, follow=False, poll=0.05):
+    """Decrypts a received stream of packet records into the seekable file object `dst`.
+
+    Each plaintext is written at its own offset as soon as its record arrives, so
+    lost packets leave zero-filled gaps. With `follow`, `src` is read like a file
+    that is still being written (e.g. by the receiver) until the last record and
+    every record before it have arrived. Returns the PacketDecryptor.
+    """
+    decryptor = PacketDecryptor(key, packet_len)
+    size = 0
+    while True:
+        block = src.read(chunk_size)
+        if not block:
+            if follow and not decryptor.done:
+                time.sleep(poll)
+                continue
+            break
+        for seq, data in decryptor.feed(block):
+            dst.seek(seq * decryptor.payload_len)
+            dst.write(data)
+            size = max(size, seq * decryptor.payload_len + len(data))
+    dst.truncate(size)
+    return decryptor
+
+def decrypt_stream(src, dst, key, chunk_size=CHUNK_SIZE, workers=None):
+    """Decrypts the file object `src` into `dst`, block by block.
+
+    Files starting with the container header are segmented AES-GCM and are
+    decrypted in parallel; anything else is AES-CBC (IV + ciphertext). For CBC the
+    last cipher block is held back until the end of the input so the padding is
+    stripped from the final block only.
+    """
+    iv = src.read(16)
+    if iv.startswith(MAGIC):
+        decrypt_stream_gcm(src, dst, key, iv + src.read(HEADER.size - len(iv)), workers)
+        return
     cipher = AES.new(key, AES.MODE_CBC, iv)
-    plaintext = unpad(cipher.decrypt(ciphertext))
+    pending = b""
+    for block in read_ahead(src, chunk_size):
+        data = pending + block if pending else block
+        cut = len(data) - len(data) % 16
+        if cut == len(data):
+            cut -= 16
+        if cut > 0:
+            dst.write(cipher.decrypt(data[:cut]))
+            pending = data[cut:]
+        else:
+            pending = data
+    dst.write(unpad(cipher.decrypt(pending)))
+
+def decrypt_bytes(data, key, workers=None, packet_len=None):
+    """Decrypts a bytes-like object produced by encrypt_bytes()/encrypt_file() and returns the plaintext.
+
+    Pass `packet_len` for data encrypted in the packet mode.
+    """
+    dst = io.BytesIO()
+    if packet_len:
+        decrypt_stream_packets(io.BytesIO(data), dst, key, packet_len)
+        return dst.getvalue()
+    if workers is None and len(data) <= HEADER.size + SEGMENT_SIZE + TAG_LEN:
+        workers = 1
+    decrypt_stream(io.BytesIO(data), dst, key, workers=workers)
+    return dst.getvalue()
+
+def decrypt_file(input_path, output_path, key_path, chunk_size=CHUNK_SIZE, workers=None, packet_len=None, follow=False):
+    with open(key_path, 'rb') as f:
+        key = f.read()
 
-    with open(output_path, 'wb') as f:
-        f.write(plaintext)
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        if packet_len:
+            decryptor = decrypt_stream_packets(src, dst, key, packet_len, chunk_size, follow)
+        else:
+            decrypt_stream(src, dst, key, chunk_size, workers)
 
     print(f"AES decrypted file saved to: {output_path}")
+    if packet_len:
+        missing = decryptor.missing()
+        status = "complete" if decryptor.done else "last packet not received"
+        print(f"Packets decrypted: {sum(decryptor.seen)}, missing: {len(missing)} {missing[:20]}, {status}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--infile", required=True)
     parser.add_argument("--outfile", required=True)
     parser.add_argument("--keyfile", required=True)
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE, help="Block size in bytes (multiple of 16) streamed through the cipher.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for AES-GCM files [default: all cores].")
+    parser.add_argument("--packet_len", type=int, default=None, help="Record size of a packet-mode file; decrypts packet by packet.")
+    parser.add_argument("--follow", action="store_true", help="Packet mode: keep reading the growing input until the last packet arrives.")
     args = parser.parse_args()
-    decrypt_file(args.infile, args.outfile, args.keyfile)
+    decrypt_file(args.infile, args.outfile, args.keyfile, args.chunk_size, args.workers, args.packet_len, args.follow)
@@ -1,25 +1,210 @@
 from Cryptodome.Cipher import AES
 from Cryptodome.Random import get_random_bytes
 from Cryptodome.Util.Padding import pad, unpad
+from concurrent.futures import Future, ProcessPoolExecutor
 import argparse
+import collections
+import io
 import os
+import queue
+import struct
+import threading
+
+# Size of the blocks streamed through the cipher (a multiple of the AES block size)
+CHUNK_SIZE = 1024 * 1024
+
+# Container for the segmented (parallel) modes:
+# magic | version | mode | segment size | nonce prefix, then one ciphertext+tag record per segment.
+# CBC files keep the original layout (IV + ciphertext) and carry no header.
+MAGIC = b"SDTAES"
+VERSION = 1
+MODE_GCM = 1
+HEADER = struct.Struct(">6sBBI8s")
+SEGMENT_SIZE = 4 * 1024 * 1024
+TAG_LEN = 16
+
+# Per-packet mode: every record is exactly one packet long and is sealed on its own:
+# salt | sequence number | payload length (top bit marks the last record) | ciphertext | tag.
+# The salt and sequence number form the GCM nonce; the record header is authenticated.
+PACKET_SALT_LEN = 4
+PACKET_HEADER = struct.Struct(f">{PACKET_SALT_LEN}sIH")
+PACKET_TAG_LEN = 8
+PACKET_LEN = 64
+PACKET_LAST = 0x8000
+
+# Plaintext bytes carried by one record of `packet_len` bytes
+def packet_payload_len(packet_len):
+    payload_len = packet_len - PACKET_HEADER.size - PACKET_TAG_LEN
+    if payload_len <= 0:
+        raise ValueError(f"Packet length must exceed {PACKET_HEADER.size + PACKET_TAG_LEN} bytes for per-packet encryption")
+    if payload_len >= PACKET_LAST:
+        # The length field's top bit is the last-record flag
+        raise ValueError(f"Packet length must be at most {PACKET_LAST - 1 + PACKET_HEADER.size + PACKET_TAG_LEN} bytes for per-packet encryption")
+    return payload_len
+
+def packet_nonce(salt, seq):
+    return salt + struct.pack(">Q", seq)
 
 def pad(data):
     pad_len = 16 - (len(data) % 16)
     return data + bytes([pad_len]) * pad_len
 
-def encrypt_file(input_path, output_path, key_path):
-    key = get_random_bytes(16)
+# Read a file in blocks on a background thread so disk reads overlap with the cipher work
+def read_ahead(f, chunk_size=CHUNK_SIZE, depth=2):
+    blocks = queue.Queue(maxsize=depth)
+
+    def reader():
+        try:
+            while True:
+                block = f.read(chunk_size)
+                blocks.put(block)
+                if not block:
+                    break
+        except BaseException as exc:
+            blocks.put(exc)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while True:
+        block = blocks.get()
+        if isinstance(block, BaseException):
+            raise block
+        if not block:
+            break
+        yield block
+    thread.join()
+
+# Split a file into numbered segments, flagging the last one
+def iter_segments(f, segment_size):
+    blocks = read_ahead(f, segment_size)
+    index, current = 0, next(blocks, b"")
+    for following in blocks:
+        yield index, False, current
+        index, current = index + 1, following
+    yield index, True, current
+
+# Stand-in for a process pool that runs each job in the calling process
+class InlinePool:
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+# A process pool, or an inline one when a single worker is asked for (no process start-up cost)
+def make_pool(workers):
+    return InlinePool() if workers == 1 else ProcessPoolExecutor(workers)
+
+# Run jobs in a pool with a bounded number in flight, yielding the results in submission order
+def map_ordered(pool, fn, jobs, window):
+    in_flight = collections.deque()
+    for job in jobs:
+        in_flight.append(pool.submit(fn, *job))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+# Nonce and associated data of one GCM segment; binding the index and the last-segment
+# flag means reordered, dropped or truncated segments fail authentication
+def segment_nonce(nonce_prefix, index):
+    return nonce_prefix + struct.pack(">I", index)
+
+def segment_aad(header, index, final):
+    return header + struct.pack(">Q?", index, final)
+
+def _seal_segment(key, header, nonce_prefix, index, final, data):
+    cipher = AES.new(key, AES.MODE_GCM, nonce=segment_nonce(nonce_prefix, index), mac_len=TAG_LEN)
+    cipher.update(segment_aad(header, index, final))
+    ciphertext, tag = cipher.encrypt_and_digest(data)
+    return ciphertext + tag
+
+def encrypt_stream_gcm(src, dst, key, segment_size=SEGMENT_SIZE, workers=None):
+    """Encrypts `src` into `dst` as independent AES-GCM segments sealed in a process pool.
+
+    Each segment has its own nonce (random prefix + segment index), so segments
+    are encrypted in parallel and written back in order.
+    """
+    workers = workers or os.cpu_count() or 1
+    nonce_prefix = get_random_bytes(8)
+    header = HEADER.pack(MAGIC, VERSION, MODE_GCM, segment_size, nonce_prefix)
+    dst.write(header)
+    with make_pool(workers) as pool:
+        jobs = ((key, header, nonce_prefix, index, final, data) for index, final, data in iter_segments(src, segment_size))
+        for record in map_ordered(pool, _seal_segment, jobs, 2 * workers):
+            dst.write(record)
+
+def seal_packet(key, salt, seq, data, payload_len, last=False):
+    """Returns one record of `payload_len` + overhead bytes carrying `data` (at most `payload_len` bytes)."""
+    header = PACKET_HEADER.pack(salt, seq, len(data) | (PACKET_LAST if last else 0))
+    cipher = AES.new(key, AES.MODE_GCM, nonce=packet_nonce(salt, seq), mac_len=PACKET_TAG_LEN)
+    cipher.update(header)
+    ciphertext, tag = cipher.encrypt_and_digest(data.ljust(payload_len, b"\0"))
+    return header + ciphertext + tag
+
+def encrypt_stream_packets(src, dst, key, packet_len=PACKET_LEN):
+    """Encrypts `src` into `dst` as fixed-size, independently authenticated packet records.
+
+    With `packet_len` equal to the flowgraph's packet length each record travels in
+    exactly one packet, so a packet dropped by the CRC check costs only its own
+    payload and the receiver can decrypt every other packet as it arrives.
+    """
+    payload_len = packet_payload_len(packet_len)
+    salt = get_random_bytes(PACKET_SALT_LEN)
+    for seq, last, data in iter_segments(src, payload_len):
+        dst.write(seal_packet(key, salt, seq, data, payload_len, last))
+
+def encrypt_stream_cbc(src, dst, key, chunk_size=CHUNK_SIZE):
+    """Encrypts the file object `src` into `dst` with AES-CBC, block by block.
+
+    Memory use is bounded by `chunk_size`; only the final block is padded.
+    """
     cipher = AES.new(key, AES.MODE_CBC)
-    iv = cipher.iv
+    dst.write(cipher.iv)
+    pending = b""
+    for block in read_ahead(src, chunk_size):
+        data = pending + block if pending else block
+        cut = len(data) - len(data) % 16
+        if cut:
+            dst.write(cipher.encrypt(data[:cut]))
+        pending = data[cut:]
+    dst.write(cipher.encrypt(pad(pending)))
+
+def encrypt_stream(src, dst, key, chunk_size=CHUNK_SIZE, mode="cbc", workers=None, packet_len=PACKET_LEN):
+    """Encrypts the readable file object `src` into the writable file object `dst`."""
+    if mode == "gcm":
+        encrypt_stream_gcm(src, dst, key, workers=workers)
+    elif mode == "packet":
+        encrypt_stream_packets(src, dst, key, packet_len)
+    elif mode == "cbc":
+        encrypt_stream_cbc(src, dst, key, chunk_size)
+    else:
+        raise ValueError(f"Unknown AES mode '{mode}'")
+
+def generate_key():
+    return get_random_bytes(16)
+
+def encrypt_bytes(data, key, mode="cbc", workers=None, packet_len=PACKET_LEN):
+    """Encrypts a bytes-like object (bytes, bytearray, memoryview, ...) in memory and returns the ciphertext."""
+    if mode == "gcm" and workers is None and len(data) <= SEGMENT_SIZE:
+        workers = 1
+    dst = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), dst, key, mode=mode, workers=workers, packet_len=packet_len)
+    return dst.getvalue()
 
-    with open(input_path, 'rb') as f:
-        data = f.read()
-    padded = pad(data)
-    ciphertext = cipher.encrypt(padded)
+def encrypt_file(input_path, output_path, key_path, chunk_size=CHUNK_SIZE, mode="cbc", workers=None, packet_len=PACKET_LEN):
+    key = generate_key()
 
-    with open(output_path, 'wb') as f:
-        f.write(iv + ciphertext)
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        encrypt_stream(src, dst, key, chunk_size, mode, workers, packet_len)
     
     with open(key_path, 'wb') as f:
         f.write(key)
@@ -32,5 +217,9 @@ if __name__ == "__main__":
     parser.add_argument("--infile", required=True)
     parser.add_argument("--outfile", required=True)
     parser.add_argument("--keyfile", required=True)
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE, help="Block size in bytes (multiple of 16) streamed through the cipher.")
+    parser.add_argument("--mode", choices=["cbc", "gcm", "packet"], default="cbc", help="cbc: serial AES-CBC; gcm: segmented AES-GCM encrypted on all cores; packet: one AES-GCM record per packet.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for the gcm mode [default: all cores].")
+    parser.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Record size in bytes for the packet mode (match the flowgraph packet length).")
     args = parser.parse_args()
-    encrypt_file(args.infile, args.outfile, args.keyfile)
+    encrypt_file(args.infile, args.outfile, args.keyfile, args.chunk_size, args.mode, args.workers, args.packet_len)
@@ -1,6 +1,30 @@
 import streamlit as st
+import json
+import os
 import subprocess
 
+import transceiverd
+from framing import DEFAULT_PROFILE, MAX_PACKET_LEN, PACKET_LEN, goodput, payload_efficiency, profile_names
+
+# Packet length input with the payload efficiency and goodput it gives
+def packet_len_input(sps, help=None):
+    packet_len = st.number_input("**Packet length (bytes):**", min_value=1, max_value=MAX_PACKET_LEN, value=PACKET_LEN, help=help)
+    st.caption(f"Payload efficiency {100 * payload_efficiency(packet_len):.1f}%, goodput {goodput(sps=sps, packet_len=packet_len) / 1e3:.0f} kb/s")
+    return packet_len
+
+# Offer the running transceiver daemon, if there is one, instead of starting a flowgraph per transfer
+def daemon_input():
+    return transceiverd.is_running() and st.checkbox("**Use running transceiver daemon**", value=True, help="Hand the transfer to transceiverd.py, which keeps the flowgraph and radio open.")
+
+# Run a flowgraph script, or hand the same job to the daemon; the result looks like subprocess.run's either way
+def run_flowgraph(command, daemon, cmd, **job):
+    if not daemon:
+        return subprocess.run(command, text=True, capture_output=True)
+    reply = transceiverd.request(cmd, **job)
+    if reply.pop("ok"):
+        return subprocess.CompletedProcess(command, 0, stdout=json.dumps(reply), stderr="")
+    return subprocess.CompletedProcess(command, 1, stdout="", stderr=reply["error"])
+
 # Transmitter Page
 def transmitter_page():
     st.title("🚀 **Transmitter**")
@@ -13,6 +37,10 @@ def transmitter_page():
     # Additional inputs
     samples_per_symbol = st.number_input("**Samples per symbol:**", min_value=1, value=2)
     multiply_constant = st.number_input("**Multiply constant:**", value=0.707,format="%.3f")
+    profile = st.selectbox("**Framing profile:**", profile_names(), index=profile_names().index(DEFAULT_PROFILE), help="Preamble and detection sequence lengths; 'minimal' uses the shortest preamble the receiver loops can settle on.")
+    packet_len = packet_len_input(samples_per_symbol, help="Payload bytes per packet; each packet also carries a 12-byte header and a 4-byte CRC32.")
+    daemon = daemon_input()
+    headless = not daemon and st.checkbox("**Headless (no GUI)**", help="Run the flowgraph without the Qt window; it stops once the whole file is sent.")
 
     # Start transmitting button
     if st.button("🦜 **Start Transmitting**"):
@@ -22,7 +50,10 @@ def transmitter_page():
                     "python",
                     "addPreamble.py",
                     "--input_path_tx", file_location1,
-                    "--output_path_tx", file_location2
+                    "--output_path_tx", file_location2,
+                    "--profile", profile,
+                    "--sps", str(samples_per_symbol),
+                    "--packet_len", str(packet_len)
                     ]
 
             try:
@@ -33,13 +64,15 @@ def transmitter_page():
                     st.text(f"Output:\n{result1.stdout}")
                     command2 = [
                             "python",
-                            "crctransmitter.py",
+                            "crctransmitter_headless.py" if headless else "crctransmitter.py",
                             "--filename-variable", file_location2,
                             "--spss", str(samples_per_symbol),
-                            "--multiplyconn", str(multiply_constant)
+                            "--multiplyconn", str(multiply_constant),
+                            "--packet-len", str(packet_len)
                             ]
 
-                    result2 = subprocess.run(command2, text=True, capture_output=True)
+                    result2 = run_flowgraph(command2, daemon, "send", path=os.path.abspath(file_location2),
+                                            sps=samples_per_symbol, mult=multiply_constant, packet_len=packet_len)
                     if result2.returncode == 0:
                         st.success("Transmission successfully!")
                         st.text(f"Output:\n{result2.stdout}")
@@ -69,30 +102,56 @@ def receiver_page():
     # Additional inputs
     samples_per_symbol = st.number_input("**Samples per symbol:**", min_value=1, value=2)
     multiply_constant = st.number_input("**Multiply constant:**", value=0.707,format="%.3f")
+    profile = st.selectbox("**Framing profile:**", profile_names(), index=profile_names().index(DEFAULT_PROFILE), help="Must match the profile used by the transmitter.")
+    packet_len = packet_len_input(samples_per_symbol, help="The packet length used by the transmitter; it also sizes the 'minimal' preamble.")
+    daemon = daemon_input()
+    headless = not daemon and st.checkbox("**Headless (no GUI)**", help="Run the flowgraph without the Qt window.")
+    duration = None
+    if headless or daemon:
+        duration = st.number_input("**Receive for at most (seconds):**" if headless else "**Receive for (seconds):**", min_value=1.0, value=60.0,
+                                   help="The flowgraph receiver also stops as soon as the end of the transmission arrives." if headless else
+                                   "The daemon cannot see the end of the transmission: it receives for the whole time and the preamble is removed afterwards.")
+    deframe = not daemon and st.checkbox("**Deframe in the flowgraph**", value=True, help="Write only the payload, straight to the destination, without a tmp file or a preamble removal pass.")
+    # Where the flowgraph writes
+    record_path = file_destination2 if deframe else file_destination1
 
     # Start receiving button
     if st.button("📥 **Start Receiving**"):
-        if file_destination1:
+        if record_path:
             # Build the command to execute the Python script
             command1 = [
                     "python",
-                    "crcreceiver.py",
-                    "--recfilename-variable", file_destination1,
+                    "crcreceiver_headless.py" if headless else "crcreceiver.py",
+                    "--recfilename-variable", record_path,
                     "--spss",str(samples_per_symbol),
-                    "--multiplyconn",str(multiply_constant)
+                    "--multiplyconn",str(multiply_constant),
+                    "--packet-len",str(packet_len),
+                    "--stop-on-eot",
+                    "--profile", profile
                     ]
+            if headless:
+                command1 += ["--duration", str(duration)]
+            if deframe:
+                command1.append("--deframe")
 
             try:
                 # Execute the external script
-                result1 = subprocess.run(command1, text=True, capture_output=True)
-                if result1.returncode == 0:
+                result1 = run_flowgraph(command1, daemon, "receive", path=os.path.abspath(file_destination1), duration=duration,
+                                        sps=samples_per_symbol, mult=multiply_constant, packet_len=packet_len)
+                if result1.returncode == 0 and deframe:
+                    st.success(f"Saved received file to **{file_destination2}**!")
+                    st.text(f"Output:\n{result1.stdout}")
+                elif result1.returncode == 0:
                     st.success(f"Saved received Tmp file to **{file_destination1}**!")
                     st.text(f"Output:\n{result1.stdout}")
                     command2 = [
                             "python",
                             "removePreamble.py",
                             "--input_path_rx", file_destination1,
-                            "--output_path", file_destination2
+                            "--output_path", file_destination2,
+                            "--profile", profile,
+                            "--sps", str(samples_per_symbol),
+                            "--packet_len", str(packet_len)
                             ]
 
                     result2 = subprocess.run(command2, text=True, capture_output=True)
@@ -1,8 +1,18 @@
 import streamlit as st
 import subprocess
 import zlib
+import contextlib
+import io
 from pathlib import Path
 
+from framing import MAX_PACKET_LEN, PACKET_LEN, goodput, payload_efficiency
+
+# NumPy modem for the simulated link; without NumPy the sim only appends and checks the CRC
+try:
+    import qpsk_sim
+except ImportError:
+    qpsk_sim = None
+
 # -----------------------------
 # Helpers for simulation
 # -----------------------------
@@ -20,27 +30,46 @@ def simulate_add_preamble(input_path: str, output_path: str) -> str:
     op.write_bytes(PREAMBLE + data)
     return f"Added preamble ({len(PREAMBLE)} bytes). Input={ip}, Output={op}, Size={op.stat().st_size} bytes"
 
-def simulate_crc_transmit(file_path: str, sps: int, mult: float) -> str:
+def _iq_path(fp: Path) -> Path:
+    # Samples 'on air' between the simulated TX and RX, next to the TMP file
+    return fp.with_suffix(fp.suffix + ".iq")
+
+def simulate_crc_transmit(file_path: str, sps: int, mult: float, packet_len: int = PACKET_LEN) -> str:
     fp = _norm(file_path)
     data = fp.read_bytes()
     crc = zlib.crc32(data) & 0xFFFFFFFF
     with fp.open("ab") as f:
         f.write(crc.to_bytes(4, "big"))
+    modem = ""
+    if qpsk_sim is not None:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            qpsk_sim.transmit_file(str(fp), str(_iq_path(fp)), sps, mult, packet_len)
+        modem = "\n" + out.getvalue().rstrip()
     return (
         "Sim TX complete.\n"
-        f"- SPS={sps}, Mult={mult}\n"
+        f"- SPS={sps}, Mult={mult}, PacketLen={packet_len}\n"
         f"- CRC32 appended=0x{crc:08X}\n"
         f"- File={fp}, NewSize={fp.stat().st_size} bytes"
+        + modem
     )
 
-def simulate_crc_receive(file_path: str, sps: int, mult: float) -> str:
+def simulate_crc_receive(file_path: str, sps: int, mult: float, ebn0_db: float = None, packet_len: int = PACKET_LEN) -> str:
     fp = _norm(file_path)
-    # In simulation we just report; in a real RX you’d write to fp
+    iq = _iq_path(fp)
+    modem = ""
+    if qpsk_sim is not None and iq.exists():
+        # Demodulate the samples written by the simulated TX into the RX TMP
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            qpsk_sim.receive_file(str(iq), str(fp), sps, mult, packet_len, ebn0_db=ebn0_db)
+        modem = "\n" + out.getvalue().rstrip()
     size = fp.stat().st_size if fp.exists() else 0
     return (
         "Sim RX complete.\n"
-        f"- SPS={sps}, Mult={mult}\n"
+        f"- SPS={sps}, Mult={mult}, PacketLen={packet_len}\n"
         f"- File={fp}, Size={size} bytes"
+        + modem
     )
 
 def simulate_remove_preamble(input_path: str, output_path: str) -> str:
@@ -78,6 +107,12 @@ def simulate_remove_preamble(input_path: str, output_path: str) -> str:
 # UI Pages
 # -----------------------------
 
+def packet_len_input(sps: int, key: str) -> int:
+    packet_len = st.number_input("**Packet length (bytes):**", min_value=1, max_value=MAX_PACKET_LEN, value=PACKET_LEN, key=key,
+                                 help="Payload bytes per packet; each packet also carries a 12-byte header and a 4-byte CRC32.")
+    st.caption(f"Payload efficiency {100 * payload_efficiency(packet_len):.1f}%, goodput {goodput(sps=sps, packet_len=packet_len) / 1e3:.0f} kb/s")
+    return packet_len
+
 def transmitter_page(mode: str):
     st.title("🚀 **Transmitter**")
     st.markdown("<hr style='border:1px solid #f63366;'>", unsafe_allow_html=True)
@@ -89,6 +124,7 @@ def transmitter_page(mode: str):
     # Additional inputs
     samples_per_symbol = st.number_input("**Samples per symbol (SPS):**", min_value=1, value=2)
     multiply_constant = st.number_input("**Multiply constant:**", value=0.707, format="%.3f")
+    packet_len = packet_len_input(samples_per_symbol, key="tx_packet_len")
 
     # Start transmitting button
     if st.button("🦜 **Start Transmitting**"):
@@ -104,7 +140,7 @@ def transmitter_page(mode: str):
                 st.code(out1)
 
                 # Step 2: append CRC and 'transmit'
-                out2 = simulate_crc_transmit(file_location2, samples_per_symbol, multiply_constant)
+                out2 = simulate_crc_transmit(file_location2, samples_per_symbol, multiply_constant, packet_len)
                 st.success("Transmission (simulated) complete!")
                 st.code(out2)
 
@@ -113,7 +149,9 @@ def transmitter_page(mode: str):
                 command1 = [
                     "python", "addPreamble.py",
                     "--input_path_tx", file_location1,
-                    "--output_path_tx", file_location2
+                    "--output_path_tx", file_location2,
+                    "--sps", str(samples_per_symbol),
+                    "--packet_len", str(packet_len)
                 ]
                 result1 = subprocess.run(command1, text=True, capture_output=True)
                 if result1.returncode == 0:
@@ -123,7 +161,8 @@ def transmitter_page(mode: str):
                         "python", "crctransmitter.py",
                         "--filename-variable", file_location2,
                         "--spss", str(samples_per_symbol),
-                        "--multiplyconn", str(multiply_constant)
+                        "--multiplyconn", str(multiply_constant),
+                        "--packet-len", str(packet_len)
                     ]
                     result2 = subprocess.run(command2, text=True, capture_output=True)
                     if result2.returncode == 0:
@@ -152,6 +191,10 @@ def receiver_page(mode: str):
     # Additional inputs
     samples_per_symbol = st.number_input("**Samples per symbol (SPS):**", min_value=1, value=2, key="rx_sps")
     multiply_constant = st.number_input("**Multiply constant:**", value=0.707, format="%.3f", key="rx_mult")
+    packet_len = packet_len_input(samples_per_symbol, key="rx_packet_len")
+    ebn0_db = None
+    if mode == "Simulated (No-RF)" and st.checkbox("Add channel noise (AWGN)", key="rx_awgn"):
+        ebn0_db = st.number_input("**Channel Eb/N0 (dB):**", value=10.0, format="%.1f", key="rx_ebn0")
 
     # Start receiving button
     if st.button("📥 **Start Receiving**"):
@@ -161,8 +204,8 @@ def receiver_page(mode: str):
 
         try:
             if mode == "Simulated (No-RF)":
-                # Step 1: "receive" (no change to file; assume TX TMP already exists)
-                out1 = simulate_crc_receive(file_destination1, samples_per_symbol, multiply_constant)
+                # Step 1: demodulate the TX samples (use the same TMP path as TX)
+                out1 = simulate_crc_receive(file_destination1, samples_per_symbol, multiply_constant, ebn0_db, packet_len)
                 st.success(f"Received TMP at **{file_destination1}**")
                 st.code(out1)
 
@@ -177,7 +220,8 @@ def receiver_page(mode: str):
                     "python", "crcreceiver.py",
                     "--recfilename-variable", file_destination1,
                     "--spss", str(samples_per_symbol),
-                    "--multiplyconn", str(multiply_constant)
+                    "--multiplyconn", str(multiply_constant),
+                    "--packet-len", str(packet_len)
                 ]
                 result1 = subprocess.run(command1, text=True, capture_output=True)
                 if result1.returncode == 0:
@@ -187,7 +231,9 @@ def receiver_page(mode: str):
                     command2 = [
                         "python", "removePreamble.py",
                         "--input_path_rx", file_destination1,
-                        "--output_path", file_destination2
+                        "--output_path", file_destination2,
+                        "--sps", str(samples_per_symbol),
+                        "--packet_len", str(packet_len)
                     ]
                     result2 = subprocess.run(command2, text=True, capture_output=True)
                     if result2.returncode == 0:
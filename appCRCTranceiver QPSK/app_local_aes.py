@@ -1,12 +1,31 @@
 import streamlit as st
 import subprocess
 import zlib
+import contextlib
+import io
 from pathlib import Path
 
+from framing import MAX_PACKET_LEN, PACKET_LEN, goodput, payload_efficiency
+
+# In-process AES; without PyCryptodome in this environment the scripts are run as subprocesses instead
+try:
+    import aes_encryptor
+    import aes_decryptor
+except ImportError:
+    aes_encryptor = aes_decryptor = None
+
+# NumPy modem for the simulated link; without NumPy the sim only appends and checks the CRC
+try:
+    import qpsk_sim
+except ImportError:
+    qpsk_sim = None
+
 # -----------------------------
 # Config & helpers
 # -----------------------------
 PREAMBLE = b"PREAMBLE::QPSK::"
+# Smallest flowgraph packet that holds a per-packet AES record (10-byte header, 8-byte tag, 1 byte of data)
+MIN_RECORD_LEN = 19
 
 def _p(path_str: str) -> Path:
     return Path(path_str).expanduser()
@@ -16,50 +35,74 @@ def _default_with_suffix(path_str: str, suffix: str) -> Path:
     return p.with_suffix(p.suffix + suffix)
 
 # ---- Simulation helpers (no-RF) ----
-def simulate_add_preamble(input_path: str, output_path: str) -> str:
+# The simulated preamble, padded with 0xAA to a multiple of `align` bytes so the data starts on a packet boundary
+def _sim_preamble(align: int = None) -> bytes:
+    return PREAMBLE + b"\xAA" * (-len(PREAMBLE) % align if align else 0)
+
+def simulate_add_preamble(input_path: str, output_path: str, align: int = None) -> str:
     ip, op = _p(input_path), _p(output_path)
     data = ip.read_bytes()
     op.parent.mkdir(parents=True, exist_ok=True)
-    op.write_bytes(PREAMBLE + data)
-    return f"Added preamble ({len(PREAMBLE)} bytes). Input={ip}, Output={op}, Size={op.stat().st_size} bytes"
+    preamble = _sim_preamble(align)
+    op.write_bytes(preamble + data)
+    return f"Added preamble ({len(preamble)} bytes). Input={ip}, Output={op}, Size={op.stat().st_size} bytes"
 
-def simulate_crc_append(file_path: str, sps: int, mult: float) -> str:
+def simulate_crc_append(file_path: str, sps: int, mult: float, frame_len: int = PACKET_LEN) -> str:
     fp = _p(file_path)
     data = fp.read_bytes()
     crc = zlib.crc32(data) & 0xFFFFFFFF
     with fp.open("ab") as f:
         f.write(crc.to_bytes(4, "big"))
+    modem = ""
+    if qpsk_sim is not None:
+        # Modulate the TMP into the samples 'on air', next to it
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            qpsk_sim.transmit_file(str(fp), str(_default_with_suffix(file_path, ".iq")), sps, mult, frame_len)
+        modem = "\n" + out.getvalue().rstrip()
     return (
         "Sim TX complete.\n"
-        f"- SPS={sps}, Mult={mult}\n"
+        f"- SPS={sps}, Mult={mult}, PacketLen={frame_len}\n"
         f"- CRC32 appended=0x{crc:08X}\n"
         f"- File={fp}, NewSize={fp.stat().st_size} bytes"
+        + modem
     )
 
-def simulate_crc_receive(file_path: str, sps: int, mult: float) -> str:
+def simulate_crc_receive(file_path: str, sps: int, mult: float, ebn0_db: float = None, frame_len: int = PACKET_LEN) -> str:
     fp = _p(file_path)
+    iq = _default_with_suffix(file_path, ".iq")
+    modem = ""
+    if qpsk_sim is not None and iq.exists():
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            qpsk_sim.receive_file(str(iq), str(fp), sps, mult, frame_len, ebn0_db=ebn0_db)
+        modem = "\n" + out.getvalue().rstrip()
     size = fp.stat().st_size if fp.exists() else 0
     return (
         "Sim RX complete.\n"
-        f"- SPS={sps}, Mult={mult}\n"
+        f"- SPS={sps}, Mult={mult}, PacketLen={frame_len}\n"
         f"- File={fp}, Size={size} bytes"
+        + modem
     )
 
-def simulate_remove_preamble_and_check_crc(input_path: str, output_path: str) -> str:
+def simulate_remove_preamble_and_check_crc(input_path: str, output_path: str, align: int = None, check_crc: bool = True) -> str:
     ip, op = _p(input_path), _p(output_path)
     blob = ip.read_bytes()
-    if len(blob) < len(PREAMBLE) + 4:
+    preamble = _sim_preamble(align)
+    if not check_crc:
+        return _simulate_remove_preamble_lossy(ip, op, blob, preamble)
+    if len(blob) < len(preamble) + 4:
         raise ValueError("File too small to contain preamble and CRC.")
     data_wo_crc = blob[:-4]
     given_crc = int.from_bytes(blob[-4:], "big")
 
-    if not data_wo_crc.startswith(PREAMBLE):
+    if not data_wo_crc.startswith(preamble):
         raise ValueError("Preamble not found at start of file.")
     calc_crc = zlib.crc32(data_wo_crc) & 0xFFFFFFFF
     if calc_crc != given_crc:
         raise ValueError(f"CRC mismatch: expected 0x{given_crc:08X}, got 0x{calc_crc:08X}")
 
-    payload = data_wo_crc[len(PREAMBLE):]
+    payload = data_wo_crc[len(preamble):]
     op.parent.mkdir(parents=True, exist_ok=True)
     op.write_bytes(payload)
     return (
@@ -68,26 +111,55 @@ def simulate_remove_preamble_and_check_crc(input_path: str, output_path: str) ->
         f"- CRC OK=0x{given_crc:08X}"
     )
 
-# ---- AES helpers (via your scripts) ----
-def aes_encrypt(infile: str, outfile: str, keyfile: str) -> str:
+# Per-packet GCM records are authenticated one by one, so packets lost on the way only cost their own records:
+# keep whatever arrived and leave the preamble remains and the trailing CRC for the decryptor to skip
+def _simulate_remove_preamble_lossy(ip: Path, op: Path, blob: bytes, preamble: bytes) -> str:
+    found = blob.startswith(preamble)
+    payload = blob[len(preamble):] if found else blob
+    op.parent.mkdir(parents=True, exist_ok=True)
+    op.write_bytes(payload)
+    return (
+        "Preamble removed; whole-file CRC not checked (per-packet GCM authenticates every record).\n"
+        f"- Input={ip}\n- Output={op}\n- PayloadSize={len(payload)} bytes\n"
+        f"- Preamble {'found' if found else 'lost, kept the bytes as they are'}"
+    )
+
+# ---- AES helpers (in-process, falling back to your scripts) ----
+AES_MODES = {"CBC": "cbc", "GCM (parallel segments)": "gcm", "GCM per packet": "packet"}
+
+def aes_encrypt(infile: str, outfile: str, keyfile: str, aes_mode: str = "cbc", packet_len: int = 64) -> str:
+    if aes_encryptor is not None:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            aes_encryptor.encrypt_file(str(_p(infile)), str(_p(outfile)), str(_p(keyfile)), mode=aes_mode, packet_len=packet_len)
+        return out.getvalue() or "AES encryption done."
     cmd = [
         "python", "aes_encryptor.py",
         "--infile", str(_p(infile)),
         "--outfile", str(_p(outfile)),
         "--keyfile", str(_p(keyfile)),
+        "--mode", aes_mode,
+        "--packet_len", str(packet_len),
     ]
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
         raise RuntimeError(f"AES encrypt failed:\n{res.stderr}")
     return res.stdout or "AES encryption done."
 
-def aes_decrypt(infile: str, outfile: str, keyfile: str) -> str:
+def aes_decrypt(infile: str, outfile: str, keyfile: str, aes_mode: str = "cbc", packet_len: int = 64) -> str:
+    # CBC and GCM files are told apart from their header; packet records need the record size
+    record_len = packet_len if aes_mode == "packet" else None
+    if aes_decryptor is not None:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            aes_decryptor.decrypt_file(str(_p(infile)), str(_p(outfile)), str(_p(keyfile)), packet_len=record_len)
+        return out.getvalue() or "AES decryption done."
     cmd = [
         "python", "aes_decryptor.py",
         "--infile", str(_p(infile)),
         "--outfile", str(_p(outfile)),
         "--keyfile", str(_p(keyfile)),
-    ]
+    ] + (["--packet_len", str(record_len)] if record_len else [])
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
         raise RuntimeError(f"AES decrypt failed:\n{res.stderr}")
@@ -96,7 +168,17 @@ def aes_decrypt(infile: str, outfile: str, keyfile: str) -> str:
 # -----------------------------
 # UI Pages
 # -----------------------------
-def transmitter_page(mode: str, use_aes: bool, key_path: str):
+def frame_len_input(sps: int, key: str, records: bool = False) -> int:
+    # Per-packet AES records are exactly one flowgraph packet long, so the packet must fit a record
+    help_text = "Payload bytes per flowgraph packet; each packet also carries a 12-byte header and a 4-byte CRC32."
+    if records:
+        help_text += " With GCM per packet this is also the AES record size."
+    frame_len = st.number_input("**Packet length (bytes):**", min_value=MIN_RECORD_LEN if records else 1, max_value=MAX_PACKET_LEN,
+                                value=max(PACKET_LEN, MIN_RECORD_LEN) if records else PACKET_LEN, key=key, help=help_text)
+    st.caption(f"Payload efficiency {100 * payload_efficiency(frame_len):.1f}%, goodput {goodput(sps=sps, packet_len=frame_len) / 1e3:.0f} kb/s")
+    return frame_len
+
+def transmitter_page(mode: str, use_aes: bool, key_path: str, aes_mode: str = "cbc"):
     st.title("🚀 **Transmitter**")
     st.markdown("<hr style='border:1px solid #f63366;'>", unsafe_allow_html=True)
 
@@ -105,6 +187,9 @@ def transmitter_page(mode: str, use_aes: bool, key_path: str):
     enc_tmp = st.text_input("🔒 (Optional) Encrypted intermediate path", help="Leave empty to auto-derive")
     sps = st.number_input("**Samples per symbol (SPS):**", min_value=1, value=2)
     mult = st.number_input("**Multiply constant:**", value=0.707, format="%.3f")
+    records = use_aes and aes_mode == "packet"
+    frame_len = frame_len_input(sps, key="tx_frame_len", records=records)
+    align = frame_len if records else None
 
     if st.button("🦜 **Start Transmitting**"):
         try:
@@ -119,26 +204,26 @@ def transmitter_page(mode: str, use_aes: bool, key_path: str):
                     return
                 enc_path = enc_tmp.strip() or str(_default_with_suffix(tx_tmp, ".enc"))
                 # 1) Encrypt plaintext -> enc_path
-                out = aes_encrypt(in_file, enc_path, key_path)
+                out = aes_encrypt(in_file, enc_path, key_path, aes_mode, frame_len)
                 st.success("AES encryption complete.")
                 st.code(out)
                 # 2) Add preamble on ciphertext -> tx_tmp
-                out = simulate_add_preamble(enc_path, tx_tmp) if mode == "Simulated (No-RF)" else run_add_preamble(enc_path, tx_tmp)
+                out = simulate_add_preamble(enc_path, tx_tmp, align) if mode == "Simulated (No-RF)" else run_add_preamble(enc_path, tx_tmp, sps, frame_len, align)
                 st.success(f"Preamble added → {tx_tmp}")
                 st.code(out)
             else:
                 # No AES: add preamble directly on plaintext
-                out = simulate_add_preamble(in_file, tx_tmp) if mode == "Simulated (No-RF)" else run_add_preamble(in_file, tx_tmp)
+                out = simulate_add_preamble(in_file, tx_tmp) if mode == "Simulated (No-RF)" else run_add_preamble(in_file, tx_tmp, sps, frame_len)
                 st.success(f"Preamble added → {tx_tmp}")
                 st.code(out)
 
             # 3) Transmit
             if mode == "Simulated (No-RF)":
-                out = simulate_crc_append(tx_tmp, sps, mult)
+                out = simulate_crc_append(tx_tmp, sps, mult, frame_len)
                 st.success("Transmission (simulated) complete!")
                 st.code(out)
             else:
-                out = run_hw_tx(tx_tmp, sps, mult)
+                out = run_hw_tx(tx_tmp, sps, mult, frame_len)
                 st.success("Transmission (hardware) complete!")
                 st.code(out)
 
@@ -147,7 +232,7 @@ def transmitter_page(mode: str, use_aes: bool, key_path: str):
 
     st.markdown("<p style='color:gray; font-size:12px;'>Hardware mode uses your BladeRF scripts. Sim mode uses local files only.</p>", unsafe_allow_html=True)
 
-def receiver_page(mode: str, use_aes: bool, key_path: str):
+def receiver_page(mode: str, use_aes: bool, key_path: str, aes_mode: str = "cbc"):
     st.title("📡 **Receiver**")
     st.markdown("<hr style='border:1px solid #2c75c1;'>", unsafe_allow_html=True)
 
@@ -156,6 +241,11 @@ def receiver_page(mode: str, use_aes: bool, key_path: str):
     final_out = st.text_input("🏁 **Final output file (plaintext):**", help=r"e.g. C:\Users\You\Desktop\decoded.bin")
     sps = st.number_input("**Samples per symbol (SPS):**", min_value=1, value=2, key="rx_sps")
     mult = st.number_input("**Multiply constant:**", value=0.707, format="%.3f", key="rx_mult")
+    records = use_aes and aes_mode == "packet"
+    frame_len = frame_len_input(sps, key="rx_frame_len", records=records)
+    ebn0_db = None
+    if mode == "Simulated (No-RF)" and st.checkbox("Add channel noise (AWGN)", key="rx_awgn"):
+        ebn0_db = st.number_input("**Channel Eb/N0 (dB):**", value=10.0, format="%.1f", key="rx_ebn0")
 
     if st.button("📥 **Start Receiving**"):
         try:
@@ -165,20 +255,21 @@ def receiver_page(mode: str, use_aes: bool, key_path: str):
 
             # 1) Receive
             if mode == "Simulated (No-RF)":
-                out = simulate_crc_receive(rx_tmp, sps, mult)
+                out = simulate_crc_receive(rx_tmp, sps, mult, ebn0_db, frame_len)
                 st.success(f"Received TMP at {rx_tmp}")
                 st.code(out)
             else:
-                out = run_hw_rx(rx_tmp, sps, mult)
+                out = run_hw_rx(rx_tmp, sps, mult, frame_len)
                 st.success(f"Hardware RX wrote TMP at {rx_tmp}")
                 st.code(out)
 
             # 2) Remove preamble (+CRC check in Sim) -> cipher_or_plain
             cipher_or_plain = cip_out.strip() or str(_default_with_suffix(rx_tmp, ".nopreamble"))
             if mode == "Simulated (No-RF)":
-                out = simulate_remove_preamble_and_check_crc(rx_tmp, cipher_or_plain)
+                out = simulate_remove_preamble_and_check_crc(rx_tmp, cipher_or_plain, frame_len if records else None,
+                                                             check_crc=not records)
             else:
-                out = run_remove_preamble(rx_tmp, cipher_or_plain)
+                out = run_remove_preamble(rx_tmp, cipher_or_plain, sps, frame_len)
             st.success("Preamble removed.")
             st.code(out)
 
@@ -187,9 +278,11 @@ def receiver_page(mode: str, use_aes: bool, key_path: str):
                 if not key_path:
                     st.error("AES is enabled — please provide the same Key file path used at TX in the sidebar.")
                     return
-                out = aes_decrypt(cipher_or_plain, final_out, key_path)
+                out = aes_decrypt(cipher_or_plain, final_out, key_path, aes_mode, frame_len)
                 st.success("AES decryption complete.")
                 st.code(out)
+                if records and ", complete" not in out:
+                    st.warning("Some packets were lost: their records are missing from the output (see the report above).")
             else:
                 # No AES: the content after preamble removal is already plaintext
                 # Copy file (avoid overwrite issues by reading/writing)
@@ -207,29 +300,31 @@ def receiver_page(mode: str, use_aes: bool, key_path: str):
 # -----------------------------
 # Hardware wrappers (unchanged scripts)
 # -----------------------------
-def run_add_preamble(in_path: str, out_path: str) -> str:
-    cmd = ["python", "addPreamble.py", "--input_path_tx", str(_p(in_path)), "--output_path_tx", str(_p(out_path))]
+def run_add_preamble(in_path: str, out_path: str, sps: int = 2, frame_len: int = PACKET_LEN, align: int = None) -> str:
+    cmd = ["python", "addPreamble.py", "--input_path_tx", str(_p(in_path)), "--output_path_tx", str(_p(out_path)),
+           "--sps", str(sps), "--packet_len", str(frame_len)] + (["--align"] if align else [])
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
         raise RuntimeError(f"addPreamble.py failed:\n{res.stderr}")
     return res.stdout or "(addPreamble.py OK)"
 
-def run_hw_tx(tmp_path: str, sps: int, mult: float) -> str:
-    cmd = ["python", "crctransmitter.py", "--filename-variable", str(_p(tmp_path)), "--spss", str(sps), "--multiplyconn", str(mult)]
+def run_hw_tx(tmp_path: str, sps: int, mult: float, frame_len: int = PACKET_LEN) -> str:
+    cmd = ["python", "crctransmitter.py", "--filename-variable", str(_p(tmp_path)), "--spss", str(sps), "--multiplyconn", str(mult), "--packet-len", str(frame_len)]
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
         raise RuntimeError(f"crctransmitter.py failed:\n{res.stderr}")
     return res.stdout or "(crctransmitter.py OK)"
 
-def run_hw_rx(rx_tmp: str, sps: int, mult: float) -> str:
-    cmd = ["python", "crcreceiver.py", "--recfilename-variable", str(_p(rx_tmp)), "--spss", str(sps), "--multiplyconn", str(mult)]
+def run_hw_rx(rx_tmp: str, sps: int, mult: float, frame_len: int = PACKET_LEN) -> str:
+    cmd = ["python", "crcreceiver.py", "--recfilename-variable", str(_p(rx_tmp)), "--spss", str(sps), "--multiplyconn", str(mult), "--packet-len", str(frame_len)]
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
         raise RuntimeError(f"crcreceiver.py failed:\n{res.stderr}")
     return res.stdout or "(crcreceiver.py OK)"
 
-def run_remove_preamble(in_path: str, out_path: str) -> str:
-    cmd = ["python", "removePreamble.py", "--input_path_rx", str(_p(in_path)), "--output_path", str(_p(out_path))]
+def run_remove_preamble(in_path: str, out_path: str, sps: int = 2, frame_len: int = PACKET_LEN) -> str:
+    cmd = ["python", "removePreamble.py", "--input_path_rx", str(_p(in_path)), "--output_path", str(_p(out_path)),
+           "--sps", str(sps), "--packet_len", str(frame_len)]
     res = subprocess.run(cmd, text=True, capture_output=True)
     if res.returncode != 0:
         raise RuntimeError(f"removePreamble.py failed:\n{res.stderr}")
@@ -242,15 +337,16 @@ def main():
     st.sidebar.title("QPSK Transceiver")
     mode = st.sidebar.selectbox("Backend", ["Simulated (No-RF)", "Hardware (BladeRF scripts)"])
 
-    st.sidebar.markdown("### 🔒 AES (CBC) encryption")
-    use_aes = st.sidebar.checkbox("Enable AES (CBC) encryption/decryption")
+    st.sidebar.markdown("### 🔒 AES encryption")
+    use_aes = st.sidebar.checkbox("Enable AES encryption/decryption")
     key_path = st.sidebar.text_input("Key file path (required if AES on)", help="Same file for TX (save) and RX (load)")
+    aes_mode = AES_MODES[st.sidebar.selectbox("AES mode", list(AES_MODES), help="GCM per packet lets RX decrypt every packet that arrives even if others are lost; each flowgraph packet carries one record.")]
 
     page = st.sidebar.radio("Choose:", ["🡵 Transmitter", "🡷 Receiver"])
     if page == "🡵 Transmitter":
-        transmitter_page(mode, use_aes, key_path)
+        transmitter_page(mode, use_aes, key_path, aes_mode)
     else:
-        receiver_page(mode, use_aes, key_path)
+        receiver_page(mode, use_aes, key_path, aes_mode)
 
 if __name__ == "__main__":
     main()
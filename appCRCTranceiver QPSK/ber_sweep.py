@@ -0,0 +1,132 @@
+import argparse
+import concurrent.futures
+import csv
+import os
+import time
+
+import numpy as np
+
+from framing import SAMP_RATE, samples_per_byte
+from qpsk_sim import MULTIPLY_CONST, PACKET_LEN, SPS, Demodulator, Modulator, awgn
+
+# A point stops once both error counts are reached (100 bit errors put the BER within about +-20 % at 95 %)...
+MIN_BIT_ERRORS = 100
+MIN_PACKET_ERRORS = 20
+# ...or once this many bits were sent
+MAX_BITS = 10_000_000
+PACKETS_PER_TRIAL = 1000
+
+FIELDS = ["ebn0_db", "bits", "bit_errors", "ber", "packets", "packet_errors", "per", "goodput_bps", "trials", "seconds"]
+
+
+# Send one batch of random packets through the modem and an AWGN channel
+def run_trial(ebn0_db, rng, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, differential=True,
+              packets=PACKETS_PER_TRIAL):
+    """Returns (bits sent, bit errors, packets lost or failing CRC).
+
+    Eb/N0 is referenced to the default Multiply_Const, so a smaller constant shows
+    up as transmit back-off.
+    """
+    rows = rng.integers(0, 256, (packets, packet_len), dtype=np.uint8)
+    mod = Modulator(sps, mult, packet_len, differential=differential)
+    iq = np.concatenate((mod.process(rows.tobytes()), mod.flush()))
+    iq = awgn(iq, ebn0_db, sps, MULTIPLY_CONST, rng)
+    demod = Demodulator(sps, mult, packet_len, differential=differential)
+    bits = np.concatenate((demod.demap(iq), demod.drain()))
+    sent = np.unpackbits(Modulator.frames(rows), axis=1).reshape(-1)
+    bit_errors = int(np.count_nonzero(bits[:len(sent)] != sent))
+    demod.deframe(bits)
+    return len(sent), bit_errors, packets - (demod.packets - demod.crc_failures)
+
+
+# Run trials at one Eb/N0 until the error counts are reached
+def run_point(ebn0_db, seed=None, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, differential=True,
+              packets_per_trial=PACKETS_PER_TRIAL, min_bit_errors=MIN_BIT_ERRORS,
+              min_packet_errors=MIN_PACKET_ERRORS, max_bits=MAX_BITS, samp_rate=SAMP_RATE):
+    rng = np.random.default_rng(seed)
+    bits = bit_errors = packets = packet_errors = trials = 0
+    start = time.perf_counter()
+    while bits < max_bits and (bit_errors < min_bit_errors or packet_errors < min_packet_errors):
+        n, errors, lost = run_trial(ebn0_db, rng, sps, mult, packet_len, differential, packets_per_trial)
+        bits += n
+        bit_errors += errors
+        packets += packets_per_trial
+        packet_errors += lost
+        trials += 1
+    per = packet_errors / packets
+    return {
+        "ebn0_db": ebn0_db,
+        "bits": bits,
+        "bit_errors": bit_errors,
+        "ber": bit_errors / bits,
+        "packets": packets,
+        "packet_errors": packet_errors,
+        "per": per,
+        "goodput_bps": (1 - per) * 8 * samp_rate / samples_per_byte(sps, packet_len),
+        "trials": trials,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# Run every Eb/N0 point, one point per worker process
+def sweep(points, workers=None, seed=None, **settings):
+    """Returns one result row per point, in the order of `points`.
+
+    Each point gets its own random stream spawned from `seed`, so results do not
+    depend on the number of workers.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(points))
+    if workers == 1:
+        return [run_point(p, s, **settings) for p, s in zip(points, seeds)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_point, p, s, **settings) for p, s in zip(points, seeds)]
+        return [f.result() for f in futures]
+
+
+# Print the results as an aligned table
+def print_table(rows):
+    print(f"{'Eb/N0':>6} {'bits':>10} {'BER':>10} {'packets':>8} {'PER':>10} {'goodput':>12} {'time':>7}")
+    for r in rows:
+        print(f"{r['ebn0_db']:>6.2f} {r['bits']:>10} {r['ber']:>10.3e} {r['packets']:>8} {r['per']:>10.3e} "
+              f"{r['goodput_bps'] / 1e3:>8.1f} kb/s {r['seconds']:>6.1f}s")
+
+
+def write_table(rows, output_path):
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Table written to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo BER/PER sweep of the CRC QPSK link over Eb/N0.")
+    parser.add_argument("--ebn0_start", type=float, default=0.0, help="First Eb/N0 point in dB.")
+    parser.add_argument("--ebn0_stop", type=float, default=10.0, help="Last Eb/N0 point in dB.")
+    parser.add_argument("--ebn0_step", type=float, default=0.5, help="Eb/N0 step in dB.")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol.")
+    parser.add_argument("--mult", type=float, default=MULTIPLY_CONST, help="Multiply constant.")
+    parser.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Payload bytes per packet.")
+    parser.add_argument("--no_differential", action="store_true", help="Use plain instead of differential QPSK.")
+    parser.add_argument("--samp_rate", type=float, default=SAMP_RATE, help="Sample rate used for the goodput.")
+    parser.add_argument("--packets_per_trial", type=int, default=PACKETS_PER_TRIAL, help="Packets sent per trial.")
+    parser.add_argument("--min_bit_errors", type=int, default=MIN_BIT_ERRORS, help="Bit errors needed to stop a point.")
+    parser.add_argument("--min_packet_errors", type=int, default=MIN_PACKET_ERRORS, help="Packet errors needed to stop a point.")
+    parser.add_argument("--max_bits", type=int, default=MAX_BITS, help="Bits after which a point stops regardless.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible sweeps.")
+    parser.add_argument("--output_path", help="CSV file for the BER/PER/goodput table.")
+    args = parser.parse_args()
+
+    points = [round(x, 3) for x in np.arange(args.ebn0_start, args.ebn0_stop + args.ebn0_step / 2, args.ebn0_step)]
+    start = time.perf_counter()
+    rows = sweep(
+        points, args.workers, args.seed,
+        sps=args.sps, mult=args.mult, packet_len=args.packet_len, differential=not args.no_differential,
+        packets_per_trial=args.packets_per_trial, min_bit_errors=args.min_bit_errors,
+        min_packet_errors=args.min_packet_errors, max_bits=args.max_bits, samp_rate=args.samp_rate,
+    )
+    print_table(rows)
+    print(f"{len(points)} points in {time.perf_counter() - start:.1f} s")
+    if args.output_path:
+        write_table(rows, args.output_path)
@@ -0,0 +1,180 @@
+import collections
+import functools
+
+import numpy as np
+
+# Number of set bits in every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Number of pattern bytes checked together before candidates are collected
+_PRUNE_BYTES = 3
+
+# Size of the blocks scanned at a time (bytes)
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# View any bytes-like object (bytes, mmap, numpy array) as a flat uint8 array without copying
+def as_bytes_array(buffer):
+    if isinstance(buffer, np.ndarray):
+        return buffer.reshape(-1).view(np.uint8)
+    return np.frombuffer(buffer, dtype=np.uint8)
+
+# Bit stream starting `shift` bits into `data`, one byte shorter than `data`
+def _shifted(data, shift):
+    if shift == 0:
+        return data[:-1]
+    return (data[:-1] << shift) | (data[1:] >> (8 - shift))
+
+# Per-shift, per-pattern-byte distance tables indexed by a 16-bit window of the input
+@functools.lru_cache(maxsize=8)
+def _distance_tables(pattern):
+    """tables[shift, k, w] = bit errors between pattern byte k and the byte that starts
+    `shift` bits into the 16-bit window w, so a shift, an XOR and a popcount become a
+    single table lookup."""
+    words = np.arange(1 << 16, dtype=np.uint32)
+    tables = np.empty((8, len(pattern), 1 << 16), dtype=np.uint8)
+    for shift in range(8):
+        aligned = ((words << shift) >> 8) & 0xFF
+        for k, value in enumerate(pattern):
+            tables[shift, k] = _POPCOUNT[aligned ^ value]
+    return tables
+
+# Bit offsets and Hamming distances of every match of `pattern` inside `data`
+def _matches(data, pattern, max_errors):
+    """Returns (bit_offsets, distances) of all positions within `max_errors` bit errors.
+
+    Every one of the 8 bit alignments is tested. The rarest pattern bytes are
+    checked first, together, so only a small fraction of positions survive to be
+    collected and finished off byte by byte.
+    """
+    pattern = bytes(pattern)
+    plen = len(pattern)
+    tables = _distance_tables(pattern)
+    counts = collections.Counter(pattern)
+    order = sorted(range(plen), key=lambda k: counts[pattern[k]])
+    head, rest = order[:_PRUNE_BYTES], order[_PRUNE_BYTES:]
+    words = (data[:-1].astype(np.uint16) << 8) | data[1:]
+    n = len(words) - plen + 1
+    if n <= 0:
+        return np.empty(0, np.int64), np.empty(0, np.uint16)
+    offsets, distances = [], []
+    for shift in range(8):
+        dist = tables[shift, head[0]][words[head[0]:head[0] + n]]
+        for k in head[1:]:
+            dist += tables[shift, k][words[k:k + n]]
+        cand = np.flatnonzero(dist <= max_errors)
+        dist = dist[cand].astype(np.uint16)
+        for k in rest:
+            if not len(cand):
+                break
+            dist += tables[shift, k][words[cand + k]]
+            keep = dist <= max_errors
+            cand, dist = cand[keep], dist[keep]
+        offsets.append(cand.astype(np.int64) * 8 + shift)
+        distances.append(dist)
+    offsets, distances = np.concatenate(offsets), np.concatenate(distances)
+    order = np.argsort(offsets, kind="stable")
+    return offsets[order], distances[order]
+
+# Best (lowest distance, earliest) match among the hits inside [lo, hi)
+def _best(offsets, distances, lo, hi):
+    sel = (offsets >= lo) & (offsets < hi)
+    offsets, distances = offsets[sel], distances[sel]
+    i = int(np.argmin(distances))
+    return int(offsets[i]), int(distances[i])
+
+# Scan a buffer forward for the first occurrence of a bit pattern
+def find_first(buffer, pattern, max_errors, start_bit=0, chunk_size=CHUNK_SIZE):
+    """Returns (bit_offset, distance) of the first match at or after `start_bit`, or None.
+
+    Hits closer together than the pattern length belong to the same match and the
+    best-scoring one is returned, so a periodic pattern does not lock onto a
+    partially shifted copy of itself.
+    """
+    data = as_bytes_array(buffer)
+    pattern = as_bytes_array(pattern)
+    plen_bits = len(pattern) * 8
+    lo = start_bit // 8
+    while lo < len(data):
+        hi = min(lo + chunk_size, len(data))
+        # Extend the window so a match cluster starting near `hi` is seen whole
+        window = data[lo:min(hi + 2 * len(pattern) + 1, len(data))]
+        window = np.append(window, np.uint8(0))
+        offsets, distances = _matches(window, pattern, max_errors)
+        offsets = offsets + lo * 8
+        valid = (offsets >= start_bit) & (offsets + plen_bits <= len(data) * 8)
+        offsets, distances = offsets[valid], distances[valid]
+        head = offsets[offsets < hi * 8]
+        if len(head):
+            return _best(offsets, distances, head[0], head[0] + plen_bits)
+        lo = hi
+    return None
+
+# Scan a buffer backward from the tail for the last occurrence of a bit pattern
+def find_last(buffer, pattern, max_errors, start_bit=0, chunk_size=CHUNK_SIZE):
+    """Returns (bit_offset, distance) of the last match at or after `start_bit`, or None."""
+    data = as_bytes_array(buffer)
+    pattern = as_bytes_array(pattern)
+    plen_bits = len(pattern) * 8
+    floor = start_bit // 8
+    hi = len(data)
+    while hi > floor:
+        lo = max(hi - chunk_size, floor)
+        # Extend the window backward so a match cluster ending near `lo` is seen whole
+        base = max(lo - 2 * len(pattern), floor)
+        window = np.append(data[base:min(hi + len(pattern) + 1, len(data))], np.uint8(0))
+        offsets, distances = _matches(window, pattern, max_errors)
+        offsets = offsets + base * 8
+        valid = (offsets >= start_bit) & (offsets + plen_bits <= len(data) * 8)
+        offsets, distances = offsets[valid], distances[valid]
+        tail = offsets[(offsets >= lo * 8) & (offsets < hi * 8)]
+        if len(tail):
+            return _best(offsets, distances, tail[-1] - plen_bits + 1, tail[-1] + 1)
+        hi = lo
+    return None
+
+# Every match of a bit pattern in a buffer that fits in memory
+def find_all(buffer, pattern, max_errors):
+    """Returns (bit_offsets, distances) arrays with the best hit of every match cluster.
+
+    Clusters are grouped the same way as in find_first: hits closer together than
+    the pattern length are one match.
+    """
+    data = as_bytes_array(buffer)
+    pattern = as_bytes_array(pattern)
+    plen_bits = len(pattern) * 8
+    offsets, distances = _matches(np.append(data, np.uint8(0)), pattern, max_errors)
+    valid = offsets + plen_bits <= len(data) * 8
+    offsets, distances = offsets[valid], distances[valid]
+    if not len(offsets):
+        return offsets, distances
+    # A new cluster starts wherever a hit lies a full pattern length past the previous cluster start
+    starts = [0]
+    cluster = int(offsets[0])
+    for i, offset in enumerate(offsets.tolist()):
+        if offset - cluster >= plen_bits:
+            starts.append(i)
+            cluster = offset
+    bounds = starts + [len(offsets)]
+    best = [lo + int(np.argmin(distances[lo:hi])) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    return offsets[best], distances[best]
+
+# Read the bit range [start_bit, end_bit) of a buffer as whole, realigned bytes
+def iter_bit_span(buffer, start_bit, end_bit, chunk_size=CHUNK_SIZE):
+    """Yields the bytes of a bit span in blocks, shifting them back onto byte boundaries.
+
+    Trailing bits that do not fill a whole byte are dropped.
+    """
+    data = as_bytes_array(buffer)
+    shift = start_bit % 8
+    first = start_bit // 8
+    nbytes = max(end_bit - start_bit, 0) // 8
+    for offset in range(0, nbytes, chunk_size):
+        n = min(chunk_size, nbytes - offset)
+        lo = first + offset
+        if shift == 0:
+            yield data[lo:lo + n]
+        else:
+            block = data[lo:lo + n + 1]
+            if len(block) < n + 1:
+                block = np.append(block, np.uint8(0))
+            yield _shifted(block, shift)
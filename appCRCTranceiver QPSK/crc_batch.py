@@ -0,0 +1,138 @@
+import argparse
+import functools
+import os
+import time
+import zlib
+
+import numpy as np
+
+from framing import CRC_LEN, PACKET_LEN
+
+# Reflected CRC-32 polynomial used by zlib and digital.crc32_bb
+POLY = 0xEDB88320
+# CRC-32 of any packet followed by its own little-endian CRC
+RESIDUE = 0x2144DF1C
+
+# Longer packets are faster through zlib one at a time than column by column
+BATCH_MAX_LEN = 48
+
+# Packets checked at a time when verifying a file
+CHUNK_PACKETS = 1024 * 1024
+
+
+# Slicing-by-4 lookup tables: tables[k][b] is the CRC register after byte b followed by k zero bytes
+@functools.lru_cache(maxsize=1)
+def crc32_tables():
+    tables = np.empty((4, 256), dtype=np.uint32)
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ (POLY if c & 1 else 0)
+        tables[0, i] = c
+    for k in range(1, 4):
+        tables[k] = (tables[k - 1] >> 8) ^ tables[0][tables[k - 1] & 0xFF]
+    return tables
+
+
+# CRC-32 of every row of a 2-D uint8 array of equal-length packets
+def crc32_rows(rows, max_len=BATCH_MAX_LEN):
+    """Returns a uint32 array with zlib.crc32 of each row.
+
+    The packets are processed column by column, four bytes per step, so the
+    Python loop runs once per 4 bytes of packet length whatever the number of
+    packets. That only pays off for short rows: rows longer than `max_len` bytes
+    (BATCH_MAX_LEN, i.e. packet_len 44 plus the CRC) are checked with one
+    zlib.crc32 call each. `max_len=None` runs slicing-by-4 over rows of any width.
+    """
+    rows = np.asarray(rows, dtype=np.uint8)
+    if max_len is not None and rows.shape[1] > max_len:
+        return np.fromiter((zlib.crc32(row) for row in rows), dtype=np.uint32, count=len(rows))
+    t0, t1, t2, t3 = crc32_tables()
+    crc = np.full(len(rows), 0xFFFFFFFF, dtype=np.uint32)
+    whole = rows.shape[1] // 4 * 4
+    words = np.ascontiguousarray(rows[:, :whole]).view("<u4")
+    for j in range(words.shape[1]):
+        crc ^= words[:, j]
+        crc = t3[crc & 0xFF] ^ t2[(crc >> 8) & 0xFF] ^ t1[(crc >> 16) & 0xFF] ^ t0[crc >> 24]
+    for j in range(whole, rows.shape[1]):
+        crc = t0[(crc ^ rows[:, j]) & 0xFF] ^ (crc >> 8)
+    return crc ^ np.uint32(0xFFFFFFFF)
+
+
+# Pass/fail mask of packets that end in the little-endian CRC-32 of their payload, as digital.crc32_bb appends it
+def check_rows(rows):
+    return crc32_rows(rows) == RESIDUE
+
+
+# Payload bytes of the packets that passed, in order
+def good_payloads(rows, mask):
+    return np.ascontiguousarray(rows[mask, :-CRC_LEN]).tobytes()
+
+
+# Check a recorded stream of back-to-back packets (payload + CRC32 each)
+def verify_file(input_path, packet_len=PACKET_LEN, output_path=None, mask_path=None, chunk_packets=CHUNK_PACKETS):
+    """Returns the pass/fail mask of every packet in the file.
+
+    Good payloads are written to `output_path` and the mask to `mask_path` (.npy)
+    when given. A partial packet at the end of the file is reported and ignored.
+    """
+    size = packet_len + CRC_LEN
+    total = os.path.getsize(input_path)
+    count, tail = divmod(total, size)
+    packets = np.memmap(input_path, dtype=np.uint8, mode="r", shape=(count, size)) if count else np.zeros((0, size), np.uint8)
+    mask = np.empty(count, dtype=bool)
+    start = time.perf_counter()
+    out = open(output_path, "wb") if output_path else None
+    try:
+        for lo in range(0, count, chunk_packets):
+            rows = np.asarray(packets[lo:lo + chunk_packets])
+            mask[lo:lo + len(rows)] = check_rows(rows)
+            if out:
+                out.write(good_payloads(rows, mask[lo:lo + len(rows)]))
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - start
+    passed = int(np.count_nonzero(mask))
+    print(f"Checked {count} packets of {packet_len} + {CRC_LEN} bytes: {passed} passed, {count - passed} failed")
+    if tail:
+        print(f"- Ignored {tail} trailing bytes (partial packet)")
+    print(f"- Took {elapsed:.3f} s ({count / max(elapsed, 1e-9) / 1e6:.2f} M packets/s)")
+    if mask_path:
+        np.save(mask_path, mask)
+        print(f"- Pass/fail mask saved to {mask_path}")
+    return mask
+
+
+# Time the batch CRC against a zlib.crc32 loop on random packets
+def benchmark(count=1_000_000, packet_len=PACKET_LEN):
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, 256, (count, packet_len), dtype=np.uint8)
+    start = time.perf_counter()
+    crc = crc32_rows(rows)
+    batch = time.perf_counter() - start
+    start = time.perf_counter()
+    # Same loop crc32_rows falls back to for long packets
+    expected = np.fromiter((zlib.crc32(row) for row in rows), dtype=np.uint32, count=count)
+    loop = time.perf_counter() - start
+    assert np.array_equal(crc, expected), "batch CRC differs from zlib.crc32"
+    print(f"{count} packets of {packet_len} bytes: batch {count / batch / 1e6:.2f} M packets/s, "
+          f"zlib loop {count / loop / 1e6:.2f} M packets/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the CRC32 of every packet in a recorded packet stream.")
+    parser.add_argument("--input_path", help="Back-to-back packets, each payload followed by its little-endian CRC32.")
+    parser.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Payload bytes per packet (without CRC).")
+    parser.add_argument("--output_path", help="Where to write the payloads of the packets that passed.")
+    parser.add_argument("--mask_path", help="Where to save the per-packet pass/fail mask (.npy).")
+    parser.add_argument("--chunk_packets", type=int, default=CHUNK_PACKETS, help="Packets checked at a time.")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time N random packets against zlib instead.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.packet_len)
+    elif args.input_path:
+        verify_file(args.input_path, args.packet_len, args.output_path, args.mask_path, args.chunk_packets)
+    else:
+        parser.error("give --input_path or --benchmark")
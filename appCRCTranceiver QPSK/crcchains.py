@@ -0,0 +1,558 @@
+#
+# SPDX-License-Identifier: GPL-3.0
+#
+# DSP chains shared by crctransmitter/crcreceiver and their headless builds.
+# Blocks are added to the given top block under the names GRC gave them, so the
+# GUI flowgraphs can tap them for their sinks.
+
+from gnuradio import analog
+from gnuradio import blocks
+from gnuradio import digital
+from gnuradio import gr
+from gnuradio import pdu
+from gnuradio.filter import firdes
+import collections
+import numpy as np
+import os
+import pmt
+import threading
+import zlib
+
+import acquisition
+from crc_batch import RESIDUE
+import sigmf_meta
+
+from framing import (ACCESS_CODE, ACCESS_CODE_THRESHOLD, AGC_RATE, BITS_PER_SYMBOL, CRC_LEN, LOOP_BW, PACKET_LEN,
+                     PREAMBLE_BYTE, SAMP_RATE, SPS, FrameTracker, burst_preamble_len, packet_on_air)
+
+MULTIPLY_CONST = 0.707
+EXCESS_BW = 0.35
+NFILTS = 32
+# Zero bytes sent after the last packet of a message. The modulator's RRC filter
+# (11 symbols) only releases the end of a packet once more symbols follow, and with
+# messages nothing may follow for a long time.
+TAIL_LEN = 4
+# Bytes standing in for the tail (and in burst mode the training preamble) between
+# the packets of a message: the mux needs a piece on every input for every packet
+FILLER_LEN = 1
+# Samples whose mean power the energy gate compares with its threshold
+GATE_BLOCK_LEN = 256
+# Symbols the energy gate stays open after the last loud block, so the receive
+# filters and loops push the end of a burst out before the gate closes
+GATE_HANGOVER_SYMBOLS = 256
+
+
+# Variables of the CRC QPSK flowgraphs, set on the top block the way GRC generates them
+def set_link_variables(tb, sps=SPS, Multiply_Const=MULTIPLY_CONST):
+    tb.sps = sps
+    tb.qpsk = digital.constellation_rect([0.707+0.707j, -0.707+0.707j, -0.707-0.707j, 0.707-0.707j], [0, 1, 2, 3],
+        4, 2, 2, 1, 1).base()
+    tb.nfilts = NFILTS
+    tb.variable_adaptive_algorithm_0 = digital.adaptive_algorithm_cma(tb.qpsk, .0001, 4).base()
+    tb.samp_rate = SAMP_RATE
+    tb.rrc_taps = firdes.root_raised_cosine(tb.nfilts, tb.nfilts, 1.0/float(sps), EXCESS_BW, 11*sps*tb.nfilts)
+    tb.phase_bw = LOOP_BW
+    tb.hdr_format = digital.header_format_default(ACCESS_CODE, ACCESS_CODE_THRESHOLD, 1)
+    tb.excess_bw = EXCESS_BW
+    tb.Multiply_Const = Multiply_Const
+
+
+class BurstTagger(gr.sync_block):
+    """Turns every message of the modulated stream into one burst for the radio.
+
+    send_pdu() announces the number of packets in each message with expect().
+    tx_sob goes on the first sample of the message's first packet (which starts
+    with the training preamble) and tx_eob on the last sample of its last packet
+    (which ends with the tail), so the packets in between go back to back. Packets
+    are taken from their "packet_len" tags, counted in bytes before the modulator,
+    hence `scale` samples per byte. The radio transmits nothing between an end of
+    burst and the next start of burst.
+    """
+
+    def __init__(self, scale, len_tag_key="packet_len"):
+        gr.sync_block.__init__(self, name="Burst Tagger", in_sig=[np.complex64], out_sig=[np.complex64])
+        self.scale = scale
+        self.len_tag_key = pmt.intern(len_tag_key)
+        # Packets in each message announced but not started yet
+        self._messages = collections.deque()
+        # Packets of the current burst still to come, and its first sample
+        self._left = 0
+        self._start = 0
+        # End-of-burst offsets not reached yet
+        self._eob = []
+        # (first sample, length) of every burst so far
+        self.bursts = []
+
+    # The next message not announced yet is `packets` packets long
+    def expect(self, packets):
+        self._messages.append(packets)
+
+    def work(self, input_items, output_items):
+        n = len(output_items[0])
+        output_items[0][:] = input_items[0]
+        end = self.nitems_written(0) + n
+        for tag in self.get_tags_in_window(0, 0, n, self.len_tag_key):
+            if not self._left:
+                # A packet nobody announced is a message of its own
+                self._left = self._messages.popleft() if self._messages else 1
+                self._start = tag.offset
+                self.add_item_tag(0, tag.offset, pmt.intern("tx_sob"), pmt.PMT_T)
+            self._left -= 1
+            if not self._left:
+                eob = tag.offset + pmt.to_long(tag.value) * self.scale - 1
+                self._eob.append(eob)
+                self.bursts.append((self._start, eob + 1 - self._start))
+        while self._eob and self._eob[0] < end:
+            self.add_item_tag(0, self._eob.pop(0), pmt.intern("tx_eob"), pmt.PMT_T)
+        return n
+
+
+# Packetizer, CRC32, header, modulator and Multiply_Const of crctransmitter
+def build_tx_chain(tb, packet_len=PACKET_LEN, pdu_input=False, burst=False):
+    """Adds the transmit blocks to `tb` and connects them.
+
+    Returns (first, last): bytes go into `first`, baseband samples come out of `last`.
+    With `pdu_input` there is no stream input; `first` is None and messages are
+    handed in with send_pdu(). `burst` (which needs `pdu_input`) sends every
+    message as one tx_sob/tx_eob tagged burst, a short training preamble followed
+    by the message's packets back to back, instead of a continuous stream. Call
+    set_link_variables() first.
+    """
+    if burst and not pdu_input:
+        raise ValueError("burst mode needs the PDU input")
+    if burst:
+        tb.burst_preamble_len = burst_preamble_len(tb.sps)
+        tb.pdu_pdu_to_tagged_stream_2 = pdu.pdu_to_tagged_stream(gr.types.byte_t, "packet_len")
+    if pdu_input:
+        # Keeps the pieces of one message together on the mux inputs
+        tb.pdu_lock = threading.Lock()
+        tb.pdu_pdu_to_tagged_stream_0 = pdu.pdu_to_tagged_stream(gr.types.byte_t, "packet_len")
+        tb.pdu_pdu_to_tagged_stream_1 = pdu.pdu_to_tagged_stream(gr.types.byte_t, "packet_len")
+        payload = tb.pdu_pdu_to_tagged_stream_0
+    else:
+        tb.blocks_stream_to_tagged_stream_0 = blocks.stream_to_tagged_stream(gr.sizeof_char, 1, packet_len, "packet_len")
+        payload = tb.blocks_stream_to_tagged_stream_0
+    tb.digital_crc32_bb_0 = digital.crc32_bb(False, "packet_len", True)
+    tb.digital_protocol_formatter_bb_0 = digital.protocol_formatter_bb(tb.hdr_format, "packet_len")
+    tb.blocks_tagged_stream_mux_0 = blocks.tagged_stream_mux(gr.sizeof_char*1, 'packet_len', 0)
+    tb.digital_constellation_modulator_0 = digital.generic_mod(
+        constellation=tb.qpsk,
+        differential=True,
+        samples_per_symbol=tb.sps,
+        pre_diff_code=True,
+        excess_bw=tb.excess_bw,
+        verbose=False,
+        log=False,
+        truncate=False)
+    tb.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(tb.Multiply_Const)
+
+    tb.connect((payload, 0), (tb.digital_crc32_bb_0, 0))
+    tb.connect((tb.digital_crc32_bb_0, 0), (tb.digital_protocol_formatter_bb_0, 0))
+    # The mux sends its inputs one after the other: training preamble, header, payload + CRC, tail
+    parts = [tb.digital_protocol_formatter_bb_0, tb.digital_crc32_bb_0]
+    if burst:
+        parts.insert(0, tb.pdu_pdu_to_tagged_stream_2)
+    if pdu_input:
+        parts.append(tb.pdu_pdu_to_tagged_stream_1)
+    for i, part in enumerate(parts):
+        tb.connect((part, 0), (tb.blocks_tagged_stream_mux_0, i))
+    tb.connect((tb.blocks_tagged_stream_mux_0, 0), (tb.digital_constellation_modulator_0, 0))
+    tb.connect((tb.digital_constellation_modulator_0, 0), (tb.blocks_multiply_const_vxx_0, 0))
+    last = tb.blocks_multiply_const_vxx_0
+    if burst:
+        tb.burst_tagger_0 = BurstTagger(8 // BITS_PER_SYMBOL * tb.sps)
+        tb.connect((tb.blocks_multiply_const_vxx_0, 0), (tb.burst_tagger_0, 0))
+        last = tb.burst_tagger_0
+    return (None if pdu_input else payload), last
+
+
+def _u8_pdu(data):
+    return pmt.cons(pmt.PMT_NIL, pmt.init_u8vector(len(data), list(data)))
+
+
+# Queue a message on a TX chain built with pdu_input, one packet per packet_len bytes
+def send_pdu(tb, data, packet_len=PACKET_LEN):
+    """Posts `data` to the chain's PDU input and returns the bytes it takes on air.
+
+    The packets of the message go back to back and only the last one is followed
+    by the tail; in burst mode the training preamble goes once in front of the
+    first, and the whole message is one burst. In between, the packets carry
+    FILLER_LEN bytes in those places. Safe to call from any thread while the
+    flowgraph runs; the packets are on their way as soon as the scheduler picks
+    the messages up.
+    """
+    data = bytes(data)
+    chunks = [data[i:i + packet_len] for i in range(0, len(data), packet_len)]
+    training = getattr(tb, "burst_preamble_len", 0)
+    port = pmt.intern("pdus")
+    on_air = 0
+    with tb.pdu_lock:
+        if training and chunks:
+            tb.burst_tagger_0.expect(len(chunks))
+        for k, chunk in enumerate(chunks):
+            if training:
+                lead = training if k == 0 else FILLER_LEN
+                tb.pdu_pdu_to_tagged_stream_2._post(port, _u8_pdu(bytes([PREAMBLE_BYTE]) * lead))
+                on_air += lead
+            tail = TAIL_LEN if k == len(chunks) - 1 else FILLER_LEN
+            tb.pdu_pdu_to_tagged_stream_0._post(port, _u8_pdu(chunk))
+            tb.pdu_pdu_to_tagged_stream_1._post(port, _u8_pdu(bytes(tail)))
+            on_air += packet_on_air(len(chunk)) + tail
+    return on_air
+
+
+class FrameGate(gr.basic_block):
+    """Passes the received bytes on until the end of the transmission.
+
+    The bytes are followed through the framing profile's preamble, payload and
+    closing marker (detection sequence + preamble head, as written by
+    addPreamble). Everything up to the end of the closing marker goes out, or
+    with `payload_only` just the payload between the markers, so the file sink
+    gets the finished file. Then the block finishes, which closes the file sink,
+    and sets `eot`.
+    """
+
+    def __init__(self, profile, payload_only=False):
+        gr.basic_block.__init__(self, name="Frame Gate", in_sig=[np.uint8], out_sig=[np.uint8])
+        self.tracker = FrameTracker(profile)
+        self.payload_only = payload_only
+        self.eot = threading.Event()
+
+    def general_work(self, input_items, output_items):
+        if self.tracker.done:
+            return -1
+        n = len(input_items[0])
+        if self.payload_only:
+            # feed() may also return bytes it held back from the previous call
+            n = min(n, len(output_items[0]) - len(self.tracker.closing))
+        else:
+            n = min(n, len(output_items[0]))
+        if n <= 0:
+            return 0
+        payload = self.tracker.feed(input_items[0][:n].tobytes())
+        if self.payload_only:
+            produced = len(payload)
+            output_items[0][:produced] = np.frombuffer(payload, dtype=np.uint8)
+        else:
+            produced = n - self.tracker.overrun
+            output_items[0][:produced] = input_items[0][:produced]
+        self.consume(0, n)
+        if self.tracker.done:
+            self.eot.set()
+        return produced
+
+
+class SampleIndexTagger(gr.sync_block):
+    """Tags every `every`-th sample with its index in the recording ("rx_sample").
+
+    The tags ride through the receive chain, so positions in the decoded bit
+    stream can be mapped back to the samples they came from.
+    """
+
+    def __init__(self, start=0, every=1024):
+        gr.sync_block.__init__(self, name="Sample Index Tagger", in_sig=[np.complex64], out_sig=[np.complex64])
+        self.start = start
+        self.every = every
+        self.key = pmt.intern("rx_sample")
+
+    def work(self, input_items, output_items):
+        n = len(output_items[0])
+        output_items[0][:] = input_items[0]
+        first = self.nitems_written(0)
+        for offset in range(-(-first // self.every) * self.every, first + n, self.every):
+            self.add_item_tag(0, offset, self.key, pmt.from_uint64(self.start + offset))
+        return n
+
+
+class RingCapture(gr.sync_block):
+    """Keeps the last `capacity` samples in a memory-mapped ring file.
+
+    In the steady state every sample is only copied into the ring, so disk and
+    memory use stay at `capacity` samples however long the receiver runs.
+    trigger() freezes a window around the current sample: once `post` more
+    samples have arrived, the `capacity - guard - post` samples before the
+    trigger and the `post` after it are exported as a raw recording with a
+    .sigmf-meta file, ready for --replay or parallel_decode.py. Triggers are
+    ignored while a window is pending and until the ring has been refilled after it.
+
+    The export is written straight from the ring by a background thread, oldest
+    samples first, so work() never copies the window. The `guard` oldest samples
+    of the ring are left out of it: they are what the receiver overwrites while
+    the writer catches up.
+    """
+
+    def __init__(self, path, capacity, post, samp_rate, guard=None, **settings):
+        gr.sync_block.__init__(self, name="Ring Capture", in_sig=[np.complex64], out_sig=None)
+        guard = capacity // 10 if guard is None else guard
+        if not 0 < post < capacity - guard:
+            raise ValueError("the post-trigger window must be shorter than the ring less its guard")
+        self.path = path
+        self.capacity = capacity
+        self.post = post
+        self.guard = guard
+        self.samp_rate = samp_rate
+        self.settings = settings
+        self.ring = np.memmap(path, dtype=np.complex64, mode="w+", shape=(capacity,))
+        # Paths of the windows exported so far
+        self.exports = []
+        self._requested = None
+        self._pending = None
+        self._holdoff = 0
+
+    # Ask for a window around the current sample; `reason` ends up in the export's name
+    def trigger(self, reason):
+        self._requested = reason
+
+    def _export(self, reason, at, head):
+        first = max(0, head - (self.capacity - self.guard))
+        stem = os.path.splitext(self.path)[0]
+        path = f"{stem}-{len(self.exports) + 1}-{reason}.sigmf-data"
+        threading.Thread(target=self._write, args=(path, first, head, reason, at - first)).start()
+        self.exports.append(path)
+
+    # Write the absolute sample range [first, head) of the ring, in order
+    def _write(self, path, first, head, reason, trigger_sample):
+        start, stop = first % self.capacity, head % self.capacity or self.capacity
+        with open(path, "wb") as f:
+            if stop <= start:
+                self.ring[start:].tofile(f)
+                start = 0
+            self.ring[start:stop].tofile(f)
+        sigmf_meta.write_meta(path, self.samp_rate, trigger=reason, trigger_sample=trigger_sample, **self.settings)
+
+    # Copy samples that start at absolute index `head` into the ring
+    def _store(self, data, head):
+        n = min(len(data), self.capacity)
+        start = (head + len(data) - n) % self.capacity
+        split = min(n, self.capacity - start)
+        self.ring[start:start + split] = data[len(data) - n:len(data) - n + split]
+        self.ring[:n - split] = data[len(data) - n + split:]
+
+    def work(self, input_items, output_items):
+        data = input_items[0]
+        head = self.nitems_read(0)
+        if self._requested is not None:
+            if self._pending is None and head >= self._holdoff:
+                self._pending = (self._requested, head)
+            self._requested = None
+        if self._pending is not None and head + len(data) >= self._pending[1] + self.post:
+            # Export exactly `post` samples after the trigger, then carry on with the rest
+            reason, at = self._pending
+            split = at + self.post - head
+            self._store(data[:split], head)
+            self._export(reason, at, at + self.post)
+            self._pending = None
+            self._holdoff = at + self.capacity
+            data, head = data[split:], head + split
+        self._store(data, head)
+        return len(input_items[0])
+
+
+class PacketWatch(gr.sync_block):
+    """Checks the CRC of every packet the access code search passes on and
+    triggers a RingCapture when the access code is found (`on_detect`) and on
+    bursts of CRC failures.
+
+    Takes the packed packets ahead of digital.crc32_bb, with their "packet_len"
+    tags. A burst is `crc_burst` failures among the last `crc_window` packets.
+    The capture's hold-off keeps a long transfer to one window per ring length.
+    """
+
+    def __init__(self, capture, on_detect=True, crc_burst=3, crc_window=8, len_tag_key="packet_len"):
+        gr.sync_block.__init__(self, name="Packet Watch", in_sig=[np.uint8], out_sig=None)
+        self.capture = capture
+        self.on_detect = on_detect
+        self.crc_burst = crc_burst
+        self.len_tag_key = pmt.intern(len_tag_key)
+        self.packets = 0
+        self.crc_failures = 0
+        self._recent = collections.deque(maxlen=crc_window)
+        # Bytes from the first incomplete packet on, and (offset, length) of the packets in them
+        self._buf = b""
+        self._buf_start = 0
+        self._open = collections.deque()
+
+    def _check(self, packet):
+        ok = zlib.crc32(packet) == RESIDUE
+        self.packets += 1
+        self.crc_failures += not ok
+        self._recent.append(not ok)
+        if self.on_detect:
+            self.capture.trigger("access_code")
+        if self.crc_burst and sum(self._recent) >= self.crc_burst:
+            self.capture.trigger("crc_burst")
+            self._recent.clear()
+
+    def work(self, input_items, output_items):
+        data = input_items[0]
+        first = self.nitems_read(0)
+        for tag in self.get_tags_in_window(0, 0, len(data), self.len_tag_key):
+            self._open.append((tag.offset, pmt.to_long(tag.value)))
+        if not self._open:
+            self._buf, self._buf_start = b"", first + len(data)
+            return len(data)
+        if not self._buf:
+            self._buf_start = max(first, self._open[0][0])
+        self._buf += data[self._buf_start + len(self._buf) - first:].tobytes()
+        end = self._buf_start + len(self._buf)
+        while self._open and sum(self._open[0]) <= end:
+            offset, length = self._open.popleft()
+            self._check(self._buf[offset - self._buf_start:offset - self._buf_start + length])
+        keep = self._open[0][0] if self._open else end
+        self._buf, self._buf_start = self._buf[keep - self._buf_start:], keep
+        return len(data)
+
+
+class EnergyGate(gr.basic_block):
+    """Drops the samples of an empty channel ahead of the receive loops.
+
+    The input is cut into blocks of `block_len` samples. A block whose mean power
+    reaches `threshold_db` (dB relative to 1, after Multiply_Const is undone) is
+    passed on, and so is everything up to `hangover` samples after it; the rest
+    is dropped, so AGC, FLL, symbol sync, equalizer and Costas loop only run on
+    bursts. The loops restart from their last state on every burst, which the
+    training preamble of burst mode is there to cover.
+    """
+
+    def __init__(self, threshold_db, hangover, block_len=GATE_BLOCK_LEN):
+        gr.basic_block.__init__(self, name="Energy Gate", in_sig=[np.complex64], out_sig=[np.complex64])
+        self.set_threshold(threshold_db)
+        self.hangover = hangover
+        self.block_len = block_len
+        # Input sample up to which the gate stays open
+        self._open_until = 0
+        self.passed = 0
+
+    def set_threshold(self, threshold_db):
+        self.threshold_db = threshold_db
+        self._threshold = 10 ** (threshold_db / 10)
+
+    def general_work(self, input_items, output_items):
+        n = min(len(input_items[0]), len(output_items[0]))
+        if n <= 0:
+            return 0
+        x = input_items[0][:n]
+        first = self.nitems_read(0)
+        starts = np.arange(0, n, self.block_len)
+        lens = np.diff(np.append(starts, n))
+        loud = np.add.reduceat(x.real * x.real + x.imag * x.imag, starts) >= self._threshold * lens
+        # Open until hangover samples after the last loud block so far, block by block
+        open_until = np.maximum.accumulate(np.where(loud, first + starts + lens + self.hangover, 0))
+        before = np.maximum(self._open_until, np.concatenate(([0], open_until[:-1])))
+        passing = np.repeat(loud | (first + starts < before), lens)
+        self._open_until = max(self._open_until, int(open_until[-1]))
+        out = x[passing]
+        output_items[0][:len(out)] = out
+        self.consume(0, n)
+        self.passed += len(out)
+        return len(out)
+
+
+class AcquisitionSeeder(gr.sync_block):
+    """Starts the band-edge FLL at the frequency offset of each burst's preamble.
+
+    The input is cut into windows of acquisition.WINDOW_SYMBOLS symbols. The
+    first window that looks like the 0xAA preamble gets an FFT estimate, and the
+    FLL is set to it, so the loops start near lock instead of pulling in over the
+    preamble. The seeder re-arms once a window no longer looks like preamble.
+    It runs beside the chain, so the estimate lands a little after the window;
+    the preamble must last a few windows longer than the scheduler's buffers.
+    """
+
+    def __init__(self, fll, sps, window_symbols=acquisition.WINDOW_SYMBOLS, threshold=acquisition.DETECT_THRESHOLD):
+        gr.sync_block.__init__(self, name="Acquisition Seeder", in_sig=[np.complex64], out_sig=None)
+        self.fll = fll
+        self.sps = sps
+        self.window = window_symbols * sps
+        self.threshold = threshold
+        self.armed = True
+        self._carry = np.zeros(0, dtype=np.complex64)
+        # (first sample of the window, Acquisition) of every seed so far
+        self.seeds = []
+
+    def work(self, input_items, output_items):
+        buf = np.concatenate((self._carry, input_items[0]))
+        count = len(buf) // self.window
+        windows = buf[:count * self.window].reshape(count, self.window)
+        first = self.nitems_read(0) - len(self._carry)
+        for i, likeness in enumerate(acquisition.detect(windows, self.sps)):
+            if likeness >= self.threshold and self.armed:
+                acq = acquisition.estimate(windows[i], self.sps)
+                # The FLL multiplies by exp(j*phase), so it cancels +cfo running at -cfo
+                self.fll.set_frequency(-2 * np.pi * acq.cfo)
+                self.seeds.append((first + i * self.window, acq))
+                self.armed = False
+            elif likeness < self.threshold / 2:
+                self.armed = True
+        self._carry = buf[count * self.window:]
+        return len(input_items[0])
+
+
+# Synchronisation, demodulation, access code search and CRC check of crcreceiver
+def build_rx_chain(tb, packet_len=PACKET_LEN, bits_only=False, squelch_db=None, hangover=None, acquire=False):
+    """Adds the receive blocks to `tb` and connects them.
+
+    Returns (first, last): baseband samples go into `first`, payload bytes of the
+    packets that pass the CRC come out of `last`. With `bits_only` the chain ends
+    at the hard-decision bits, one per byte, ahead of the access code search.
+    With `squelch_db` an EnergyGate ahead of the AGC drops the samples of an empty
+    channel; `hangover` defaults to GATE_HANGOVER_SYMBOLS symbols. With `acquire`
+    an AcquisitionSeeder starts the FLL at each preamble's frequency offset.
+    Call set_link_variables() first.
+    """
+    tb.blocks_multiply_const_vxx_1 = blocks.multiply_const_cc(1/tb.Multiply_Const)
+    if squelch_db is not None:
+        hangover = GATE_HANGOVER_SYMBOLS * tb.sps if hangover is None else hangover
+        tb.energy_gate_0 = EnergyGate(squelch_db, hangover)
+    tb.analog_agc_xx_0 = analog.agc_cc(AGC_RATE, 1.0, 1.0, 2.0)
+    tb.digital_fll_band_edge_cc_0 = digital.fll_band_edge_cc(tb.sps, tb.excess_bw, 44, tb.phase_bw)
+    tb.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
+        digital.TED_SIGNAL_TIMES_SLOPE_ML,
+        tb.sps,
+        tb.phase_bw,
+        1.4,
+        1.0,
+        1.5,
+        2,
+        digital.constellation_qpsk().base(),
+        digital.IR_PFB_MF,
+        tb.nfilts,
+        tb.rrc_taps)
+    tb.digital_linear_equalizer_0 = digital.linear_equalizer(15, 2, tb.variable_adaptive_algorithm_0, True, [ ], 'corr_est')
+    tb.digital_costas_loop_cc_0 = digital.costas_loop_cc(tb.phase_bw, 4, False)
+    tb.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(tb.qpsk)
+    tb.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(4, digital.DIFF_DIFFERENTIAL)
+    tb.digital_map_bb_0 = digital.map_bb([0,1,2,3])
+    tb.blocks_unpack_k_bits_bb_0 = blocks.unpack_k_bits_bb(2)
+
+    if squelch_db is not None:
+        tb.connect((tb.blocks_multiply_const_vxx_1, 0), (tb.energy_gate_0, 0))
+        tb.connect((tb.energy_gate_0, 0), (tb.analog_agc_xx_0, 0))
+    else:
+        tb.connect((tb.blocks_multiply_const_vxx_1, 0), (tb.analog_agc_xx_0, 0))
+    if acquire:
+        tb.acquisition_seeder_0 = AcquisitionSeeder(tb.digital_fll_band_edge_cc_0, tb.sps)
+        tb.connect((tb.energy_gate_0 if squelch_db is not None else tb.blocks_multiply_const_vxx_1, 0),
+                   (tb.acquisition_seeder_0, 0))
+    tb.connect((tb.analog_agc_xx_0, 0), (tb.digital_fll_band_edge_cc_0, 0))
+    tb.connect((tb.digital_fll_band_edge_cc_0, 0), (tb.digital_symbol_sync_xx_0, 0))
+    tb.connect((tb.digital_symbol_sync_xx_0, 0), (tb.digital_linear_equalizer_0, 0))
+    tb.connect((tb.digital_linear_equalizer_0, 0), (tb.digital_costas_loop_cc_0, 0))
+    tb.connect((tb.digital_costas_loop_cc_0, 0), (tb.digital_constellation_decoder_cb_0, 0))
+    tb.connect((tb.digital_constellation_decoder_cb_0, 0), (tb.digital_diff_decoder_bb_0, 0))
+    tb.connect((tb.digital_diff_decoder_bb_0, 0), (tb.digital_map_bb_0, 0))
+    tb.connect((tb.digital_map_bb_0, 0), (tb.blocks_unpack_k_bits_bb_0, 0))
+    if bits_only:
+        return tb.blocks_multiply_const_vxx_1, tb.blocks_unpack_k_bits_bb_0
+
+    tb.digital_correlate_access_code_xx_ts_0 = digital.correlate_access_code_bb_ts(ACCESS_CODE,
+      ACCESS_CODE_THRESHOLD, "packet_len")
+    # Room for two whole packets (payload + CRC32, one bit per byte) in the tagged-stream buffers
+    tb.digital_correlate_access_code_xx_ts_0.set_min_output_buffer(2 * 8 * (packet_len + CRC_LEN))
+    tb.blocks_repack_bits_bb_1_0 = blocks.repack_bits_bb(1, 8, "packet_len", False, gr.GR_MSB_FIRST)
+    tb.digital_crc32_bb_0_0 = digital.crc32_bb(True, "packet_len", True)
+
+    tb.connect((tb.blocks_unpack_k_bits_bb_0, 0), (tb.digital_correlate_access_code_xx_ts_0, 0))
+    tb.connect((tb.digital_correlate_access_code_xx_ts_0, 0), (tb.blocks_repack_bits_bb_1_0, 0))
+    tb.connect((tb.blocks_repack_bits_bb_1_0, 0), (tb.digital_crc32_bb_0_0, 0))
+    return tb.blocks_multiply_const_vxx_1, tb.digital_crc32_bb_0_0
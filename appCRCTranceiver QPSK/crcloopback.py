@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#
+# SPDX-License-Identifier: GPL-3.0
+#
+# GNU Radio Python Flow Graph
+# Title: CRCLoopback
+# GNU Radio version: 3.10.10.0
+
+from gnuradio import blocks
+import pmt
+from gnuradio import channels
+from gnuradio import gr
+import sys
+import signal
+from argparse import ArgumentParser
+from gnuradio.eng_arg import eng_float, intx
+import os
+import time
+
+from crcchains import build_rx_chain, build_tx_chain, send_pdu, set_link_variables
+from framing import BITS_PER_SYMBOL
+
+
+class crcloopback(gr.top_block):
+    """crctransmitter -> channel model -> crcreceiver in one flowgraph.
+
+    There is no throttle anywhere, so the flowgraph runs as fast as the CPU
+    allows and stops once the input file has been sent. In burst mode the file
+    goes in through the PDU input instead, as tx_sob/tx_eob bursts, and the
+    flowgraph runs until stopped; `iq_path` then records what the radio would get.
+    """
+
+    def __init__(self, filename_variable='gui.txt', recfilename_variable='ui.txt', packet_len=8, sps=2, Multiply_Const=0.707,
+                 noise_volt=0.0, freq_offset=0.0, time_offset=1.0, taps=[1.0], burst=False, iq_path=None):
+        gr.top_block.__init__(self, "CRCLoopback", catch_exceptions=True)
+
+        ##################################################
+        # Parameters
+        ##################################################
+        self.filename_variable = filename_variable
+        self.recfilename_variable = recfilename_variable
+        self.packet_len = packet_len
+        self.noise_volt = noise_volt
+        self.freq_offset = freq_offset
+        self.time_offset = time_offset
+        self.taps = taps
+        self.burst = burst
+
+        ##################################################
+        # Variables
+        ##################################################
+        set_link_variables(self, sps, Multiply_Const)
+
+        ##################################################
+        # Blocks
+        ##################################################
+
+        if not burst:
+            self.blocks_file_source_0 = blocks.file_source(gr.sizeof_char*1, filename_variable, False, 0, 0)
+            self.blocks_file_source_0.set_begin_tag(pmt.PMT_NIL)
+        tx_in, tx_out = build_tx_chain(self, packet_len, pdu_input=burst, burst=burst)
+        if iq_path:
+            # Stands in for the radio
+            self.blocks_file_sink_1 = blocks.file_sink(gr.sizeof_gr_complex*1, iq_path, False)
+            self.blocks_file_sink_1.set_unbuffered(False)
+        self.channels_channel_model_0 = channels.channel_model(
+            noise_voltage=noise_volt,
+            frequency_offset=freq_offset,
+            epsilon=time_offset,
+            taps=taps,
+            noise_seed=0,
+            block_tags=False)
+        rx_in, rx_out = build_rx_chain(self, packet_len)
+        self.blocks_file_sink_0 = blocks.file_sink(gr.sizeof_char*1, recfilename_variable, False)
+        self.blocks_file_sink_0.set_unbuffered(False)
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        if not burst:
+            self.connect((self.blocks_file_source_0, 0), (tx_in, 0))
+        self.connect((tx_out, 0), (self.channels_channel_model_0, 0))
+        if iq_path:
+            self.connect((tx_out, 0), (self.blocks_file_sink_1, 0))
+        self.connect((self.channels_channel_model_0, 0), (rx_in, 0))
+        self.connect((rx_out, 0), (self.blocks_file_sink_0, 0))
+
+
+    def get_noise_volt(self):
+        return self.noise_volt
+
+    def set_noise_volt(self, noise_volt):
+        self.noise_volt = noise_volt
+        self.channels_channel_model_0.set_noise_voltage(self.noise_volt)
+
+    def get_freq_offset(self):
+        return self.freq_offset
+
+    def set_freq_offset(self, freq_offset):
+        self.freq_offset = freq_offset
+        self.channels_channel_model_0.set_frequency_offset(self.freq_offset)
+
+    def get_time_offset(self):
+        return self.time_offset
+
+    def set_time_offset(self, time_offset):
+        self.time_offset = time_offset
+        self.channels_channel_model_0.set_timing_offset(self.time_offset)
+
+    def get_taps(self):
+        return self.taps
+
+    def set_taps(self, taps):
+        self.taps = taps
+        self.channels_channel_model_0.set_taps(self.taps)
+
+    # Samples that went through the channel and payload bytes written so far
+    def counters(self):
+        return self.channels_channel_model_0.nitems_written(0), self.blocks_file_sink_0.nitems_read(0)
+
+    # Burst mode: send bytes as one message, which goes out as one burst; returns the samples it takes
+    def send(self, data):
+        return send_pdu(self, data, self.packet_len) * 8 // BITS_PER_SYMBOL * self.sps
+
+
+
+def argument_parser():
+    parser = ArgumentParser(description="Run the CRC QPSK transmitter and receiver back to back, unthrottled, as a CPU benchmark.")
+    parser.add_argument(
+        "--filename-variable", dest="filename_variable", type=str, required=True,
+        help="File to transmit")
+    parser.add_argument(
+        "--recfilename-variable", dest="recfilename_variable", type=str, required=True,
+        help="Where to write the received payloads")
+    parser.add_argument(
+        "--packet-len", dest="packet_len", type=intx, default=8,
+        help="Set payload bytes per packet (packet_len) [default=%(default)r]")
+    parser.add_argument(
+        "--spss", dest="spss", type=int, default=2,
+        help="Set samples per symbol (sps) [default=%(default)r]")
+    parser.add_argument(
+        "--multiplyconn", dest="multiplyconn", type=float, default=0.707,
+        help="Set Multiply Constant [default=%(default)r]")
+    # FEC_QPSK.grc uses noise 0.1, frequency offset 0.001, time offset 1 and taps [1.0, 0.25-0.25j, 0.50 + 0.10j, -0.3 + 0.2j]
+    parser.add_argument(
+        "--noise-volt", dest="noise_volt", type=eng_float, default=0.0,
+        help="Set channel noise voltage [default=%(default)r]")
+    parser.add_argument(
+        "--freq-offset", dest="freq_offset", type=eng_float, default=0.0,
+        help="Set channel frequency offset, normalised to the sample rate [default=%(default)r]")
+    parser.add_argument(
+        "--time-offset", dest="time_offset", type=eng_float, default=1.0,
+        help="Set channel timing offset ratio (epsilon) [default=%(default)r]")
+    parser.add_argument(
+        "--multipath", dest="multipath", action="store_true",
+        help="Use the multipath taps of FEC_QPSK.grc instead of a clean channel")
+    parser.add_argument(
+        "--burst", dest="burst", action="store_true",
+        help="Send the file as tx_sob/tx_eob bursts through the PDU input and check the bursts and the received bytes")
+    parser.add_argument(
+        "--iq-path", dest="iq_path", type=str, default=None,
+        help="Record the transmitted samples, as the radio would get them, to this file")
+    parser.add_argument(
+        "--timeout", dest="timeout", type=eng_float, default=60.0,
+        help="Give up waiting for the received bytes in burst mode after this many seconds [default=%(default)r]")
+    return parser
+
+
+# Burst-mode loopback: send the file as one message and check what comes out
+def run_burst(tb, data, timeout):
+    """Returns True when every byte came back and the file went out as one burst
+    covering exactly the samples it was sent in.
+
+    The receive filters hold back the end of the burst until more samples arrive,
+    so a one-packet message is sent after the file as a second burst and ignored.
+    """
+    packets = -(-len(data) // tb.packet_len)
+    samples = tb.send(data)
+    tb.send(bytes(tb.packet_len))
+    deadline = time.monotonic() + timeout
+    while tb.blocks_file_sink_0.nitems_read(0) < len(data) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    tb.stop()
+    tb.wait()
+
+    bursts = tb.burst_tagger_0.bursts
+    ok = True
+    if len(bursts) != 2:
+        print(f"- Expected 2 bursts (the file and the flush), tagged {len(bursts)}")
+        ok = False
+    elif bursts[0] != (0, samples) or bursts[1][0] != samples:
+        print(f"- Bursts {bursts} do not match the {samples} samples of the file")
+        ok = False
+    with open(tb.recfilename_variable, "rb") as f:
+        received = f.read()
+    if received[:len(data)] != data:
+        print(f"- Received {min(len(received), len(data))} of {len(data)} bytes, "
+              f"{'content differs' if len(received) >= len(data) else 'some missing'}")
+        ok = False
+    print(f"Burst loopback: one burst of {tb.burst_preamble_len} preamble bytes + {packets} packets, "
+          f"{samples} samples, {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+def main(top_block_cls=crcloopback, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    taps = [1.0, 0.25-0.25j, 0.50 + 0.10j, -0.3 + 0.2j] if options.multipath else [1.0]
+    tb = top_block_cls(filename_variable=options.filename_variable, recfilename_variable=options.recfilename_variable,
+                       packet_len=options.packet_len, sps=options.spss, Multiply_Const=options.multiplyconn,
+                       noise_volt=options.noise_volt, freq_offset=options.freq_offset,
+                       time_offset=options.time_offset, taps=taps, burst=options.burst, iq_path=options.iq_path)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    start = time.perf_counter()
+    tb.start()
+    if options.burst:
+        with open(options.filename_variable, "rb") as f:
+            ok = run_burst(tb, f.read(), options.timeout)
+    else:
+        tb.wait()
+    elapsed = time.perf_counter() - start
+
+    samples, received = tb.counters()
+    sent = os.path.getsize(options.filename_variable)
+    print(f"Looped back {sent} bytes in {elapsed:.3f} s")
+    print(f"- {samples} samples through the channel ({samples / elapsed / 1e6:.2f} Msps)")
+    print(f"- {received} payload bytes received ({sent / elapsed / 1e3:.1f} kB/s sent, {received / elapsed / 1e3:.1f} kB/s received)")
+    if options.burst and not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
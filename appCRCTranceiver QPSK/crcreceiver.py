@@ -10,30 +10,30 @@
 
 from PyQt5 import Qt
 from gnuradio import qtgui
-from gnuradio import analog
 from gnuradio import blocks
-from gnuradio import digital
-from gnuradio import filter
 from gnuradio import eng_notation
 from gnuradio import fec
 from gnuradio import gr
-from gnuradio.filter import firdes
-from gnuradio.fft import window
 import sys
 import signal
 from PyQt5 import Qt
-from argparse import ArgumentParser
-from gnuradio.eng_arg import eng_float, intx
-import osmosdr
-import time
 import sip
 
+import crcreceiver_headless
+from crcreceiver_headless import crcreceiver_headless as crcreceiver_base
 
 
-class crcreceiver(gr.top_block, Qt.QWidget):
 
-    def __init__(self, puncpat='11', recfilename_variable='C:\\Users\\Thisuka Inol\\Desktop\\ui.txt'):
-        gr.top_block.__init__(self, "CRCReceiver", catch_exceptions=True)
+class crcreceiver(crcreceiver_base, Qt.QWidget):
+
+    def __init__(self, packet_len=8, puncpat='11', recfilename_variable='C:\\Users\\Thisuka Inol\\Desktop\\ui.txt', sps=2, Multiply_Const=0.707, eot_profile=None, deframe=False,
+                 record_path=None, replay_path=None, capture_path=None, capture_seconds=3.0, capture_on="both",
+                 squelch_db=None, squelch_hangover=None, acquire=False):
+        # Same DSP chain as the headless build; this class only adds the Qt sinks
+        crcreceiver_base.__init__(self, packet_len, puncpat, recfilename_variable, sps, Multiply_Const, eot_profile, deframe,
+                                  record_path, replay_path, capture_path, capture_seconds, capture_on,
+                                  squelch_db, squelch_hangover, acquire)
+
         Qt.QWidget.__init__(self)
         self.setWindowTitle("CRCReceiver")
         qtgui.util.check_set_qss()
@@ -62,28 +62,13 @@ class crcreceiver(gr.top_block, Qt.QWidget):
         except BaseException as exc:
             print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
 
-        ##################################################
-        # Parameters
-        ##################################################
-        self.puncpat = puncpat
-        self.recfilename_variable = recfilename_variable
 
         ##################################################
         # Variables
         ##################################################
-        self.sps = sps = 2
-        self.qpsk = qpsk = digital.constellation_rect([0.707+0.707j, -0.707+0.707j, -0.707-0.707j, 0.707-0.707j], [0, 1, 2, 3],
-        4, 2, 2, 1, 1).base()
-        self.nfilts = nfilts = 32
-        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_cma( qpsk, .0001, 4).base()
-        self.samp_rate = samp_rate = 1500000
-        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(nfilts, nfilts, 1.0/float(sps), 0.35, 11*sps*nfilts)
-        self.phase_bw = phase_bw = 0.0628
+        samp_rate = self.samp_rate
         self.ldpc_encoder = ldpc_encoder = fec.ldpc_encoder_make(gr.prefix() + "/share/gnuradio/fec/ldpc/" + "n_0100_k_0042_gap_02.alist")
         self.ldpc_decoder = ldpc_decoder = fec.ldpc_decoder.make(gr.prefix() + "/share/gnuradio/fec/ldpc/" + "n_0100_k_0042_gap_02.alist", 50)
-        self.hdr_format = hdr_format = digital.header_format_default('111111011011001110010110001000011010110011001010101011010100011\n',2, 1)
-        self.excess_bw = excess_bw = 0.35
-        self.Multiply_Const = Multiply_Const = 0.707
 
         ##################################################
         # Blocks
@@ -260,76 +245,18 @@ class crcreceiver(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(2, 4):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.osmosdr_source_0 = osmosdr.source(
-            args="numchan=" + str(1) + " " + "bladerf=0,nchan=1"
-        )
-        self.osmosdr_source_0.set_time_unknown_pps(osmosdr.time_spec_t())
-        self.osmosdr_source_0.set_sample_rate(samp_rate)
-        self.osmosdr_source_0.set_center_freq(2.42e9, 0)
-        self.osmosdr_source_0.set_freq_corr(0, 0)
-        self.osmosdr_source_0.set_dc_offset_mode(0, 0)
-        self.osmosdr_source_0.set_iq_balance_mode(0, 0)
-        self.osmosdr_source_0.set_gain_mode(True, 0)
-        self.osmosdr_source_0.set_gain(80, 0)
-        self.osmosdr_source_0.set_if_gain(0, 0)
-        self.osmosdr_source_0.set_bb_gain(0, 0)
-        self.osmosdr_source_0.set_antenna("RX2", 0)
-        self.osmosdr_source_0.set_bandwidth(25000, 0)
-        self.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
-            digital.TED_SIGNAL_TIMES_SLOPE_ML,
-            sps,
-            phase_bw,
-            1.4,
-            1.0,
-            1.5,
-            2,
-            digital.constellation_qpsk().base(),
-            digital.IR_PFB_MF,
-            32,
-            rrc_taps)
-        self.digital_map_bb_0 = digital.map_bb([0,1,2,3])
-        self.digital_linear_equalizer_0 = digital.linear_equalizer(15, 2, variable_adaptive_algorithm_0, True, [ ], 'corr_est')
-        self.digital_fll_band_edge_cc_0 = digital.fll_band_edge_cc(sps, excess_bw, 44, phase_bw)
-        self.digital_diff_decoder_bb_0 = digital.diff_decoder_bb(4, digital.DIFF_DIFFERENTIAL)
-        self.digital_crc32_bb_0_0 = digital.crc32_bb(True, "packet_len", True)
-        self.digital_costas_loop_cc_0 = digital.costas_loop_cc(phase_bw, 4, False)
-        self.digital_correlate_access_code_xx_ts_0 = digital.correlate_access_code_bb_ts('111111011011001110010110001000011010110011001010101011010100011\n',
-          2, "packet_len")
-        self.digital_constellation_decoder_cb_0 = digital.constellation_decoder_cb(qpsk)
-        self.blocks_unpack_k_bits_bb_0 = blocks.unpack_k_bits_bb(2)
         self.blocks_uchar_to_float_0_0_0 = blocks.uchar_to_float()
         self.blocks_uchar_to_float_0_0 = blocks.uchar_to_float()
-        self.blocks_throttle2_0 = blocks.throttle( gr.sizeof_gr_complex*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
-        self.blocks_repack_bits_bb_1_0 = blocks.repack_bits_bb(1, 8, "packet_len", False, gr.GR_MSB_FIRST)
-        self.blocks_multiply_const_vxx_1 = blocks.multiply_const_cc(1/Multiply_Const)
-        self.blocks_file_sink_0 = blocks.file_sink(gr.sizeof_char*1, recfilename_variable, False)
-        self.blocks_file_sink_0.set_unbuffered(True)
-        self.analog_agc_xx_0 = analog.agc_cc((1e-4), 1.0, 1.0, 2.0)
 
 
         ##################################################
         # Connections
         ##################################################
-        self.connect((self.analog_agc_xx_0, 0), (self.digital_fll_band_edge_cc_0, 0))
-        self.connect((self.blocks_multiply_const_vxx_1, 0), (self.analog_agc_xx_0, 0))
-        self.connect((self.blocks_repack_bits_bb_1_0, 0), (self.digital_crc32_bb_0_0, 0))
-        self.connect((self.blocks_throttle2_0, 0), (self.blocks_multiply_const_vxx_1, 0))
         self.connect((self.blocks_uchar_to_float_0_0, 0), (self.qtgui_time_sink_x_0_2, 0))
         self.connect((self.blocks_uchar_to_float_0_0_0, 0), (self.qtgui_time_sink_x_0_0, 0))
         self.connect((self.blocks_unpack_k_bits_bb_0, 0), (self.blocks_uchar_to_float_0_0, 0))
-        self.connect((self.blocks_unpack_k_bits_bb_0, 0), (self.digital_correlate_access_code_xx_ts_0, 0))
-        self.connect((self.digital_constellation_decoder_cb_0, 0), (self.digital_diff_decoder_bb_0, 0))
-        self.connect((self.digital_correlate_access_code_xx_ts_0, 0), (self.blocks_repack_bits_bb_1_0, 0))
         self.connect((self.digital_correlate_access_code_xx_ts_0, 0), (self.blocks_uchar_to_float_0_0_0, 0))
-        self.connect((self.digital_costas_loop_cc_0, 0), (self.digital_constellation_decoder_cb_0, 0))
         self.connect((self.digital_costas_loop_cc_0, 0), (self.qtgui_const_sink_x_0, 0))
-        self.connect((self.digital_crc32_bb_0_0, 0), (self.blocks_file_sink_0, 0))
-        self.connect((self.digital_diff_decoder_bb_0, 0), (self.digital_map_bb_0, 0))
-        self.connect((self.digital_fll_band_edge_cc_0, 0), (self.digital_symbol_sync_xx_0, 0))
-        self.connect((self.digital_linear_equalizer_0, 0), (self.digital_costas_loop_cc_0, 0))
-        self.connect((self.digital_map_bb_0, 0), (self.blocks_unpack_k_bits_bb_0, 0))
-        self.connect((self.digital_symbol_sync_xx_0, 0), (self.digital_linear_equalizer_0, 0))
-        self.connect((self.osmosdr_source_0, 0), (self.blocks_throttle2_0, 0))
 
 
     def closeEvent(self, event):
@@ -340,73 +267,15 @@ class crcreceiver(gr.top_block, Qt.QWidget):
 
         event.accept()
 
-    def get_puncpat(self):
-        return self.puncpat
-
-    def set_puncpat(self, puncpat):
-        self.puncpat = puncpat
-
-    def get_recfilename_variable(self):
-        return self.recfilename_variable
-
-    def set_recfilename_variable(self, recfilename_variable):
-        self.recfilename_variable = recfilename_variable
-        self.blocks_file_sink_0.open(self.recfilename_variable)
-
-    def get_sps(self):
-        return self.sps
-
     def set_sps(self, sps):
-        self.sps = sps
-        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
+        crcreceiver_base.set_sps(self, sps)
         Qt.QMetaObject.invokeMethod(self._sps_label, "setText", Qt.Q_ARG("QString", str(self._sps_formatter(self.sps))))
-        self.digital_symbol_sync_xx_0.set_sps(self.sps)
-
-    def get_qpsk(self):
-        return self.qpsk
-
-    def set_qpsk(self, qpsk):
-        self.qpsk = qpsk
-        self.digital_constellation_decoder_cb_0.set_constellation(self.qpsk)
-
-    def get_nfilts(self):
-        return self.nfilts
-
-    def set_nfilts(self, nfilts):
-        self.nfilts = nfilts
-        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
-
-    def get_variable_adaptive_algorithm_0(self):
-        return self.variable_adaptive_algorithm_0
-
-    def set_variable_adaptive_algorithm_0(self, variable_adaptive_algorithm_0):
-        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0
-
-    def get_samp_rate(self):
-        return self.samp_rate
 
     def set_samp_rate(self, samp_rate):
-        self.samp_rate = samp_rate
-        self.blocks_throttle2_0.set_sample_rate(self.samp_rate)
-        self.osmosdr_source_0.set_sample_rate(self.samp_rate)
+        crcreceiver_base.set_samp_rate(self, samp_rate)
         self.qtgui_time_sink_x_0_0.set_samp_rate(self.samp_rate)
         self.qtgui_time_sink_x_0_2.set_samp_rate(self.samp_rate)
 
-    def get_rrc_taps(self):
-        return self.rrc_taps
-
-    def set_rrc_taps(self, rrc_taps):
-        self.rrc_taps = rrc_taps
-
-    def get_phase_bw(self):
-        return self.phase_bw
-
-    def set_phase_bw(self, phase_bw):
-        self.phase_bw = phase_bw
-        self.digital_costas_loop_cc_0.set_loop_bandwidth(self.phase_bw)
-        self.digital_fll_band_edge_cc_0.set_loop_bandwidth(self.phase_bw)
-        self.digital_symbol_sync_xx_0.set_loop_bandwidth(self.phase_bw)
-
     def get_ldpc_encoder(self):
         return self.ldpc_encoder
 
@@ -419,60 +288,36 @@ class crcreceiver(gr.top_block, Qt.QWidget):
     def set_ldpc_decoder(self, ldpc_decoder):
         self.ldpc_decoder = ldpc_decoder
 
-    def get_hdr_format(self):
-        return self.hdr_format
-
-    def set_hdr_format(self, hdr_format):
-        self.hdr_format = hdr_format
-
-    def get_excess_bw(self):
-        return self.excess_bw
-
-    def set_excess_bw(self, excess_bw):
-        self.excess_bw = excess_bw
-
-    def get_Multiply_Const(self):
-        return self.Multiply_Const
-
     def set_Multiply_Const(self, Multiply_Const):
-        self.Multiply_Const = Multiply_Const
+        crcreceiver_base.set_Multiply_Const(self, Multiply_Const)
         Qt.QMetaObject.invokeMethod(self._Multiply_Const_label, "setText", Qt.Q_ARG("QString", str(self._Multiply_Const_formatter(self.Multiply_Const))))
-        self.blocks_multiply_const_vxx_1.set_k(1/self.Multiply_Const)
 
 
 
 def argument_parser():
-    parser = ArgumentParser()
-    parser.add_argument(
-        "--recfilename-variable", dest="recfilename_variable", type=str, default='C:\\Users\\Thisuka Inol\\Desktop\\ui.txt',
-        help="Set recfilename_variable [default=%(default)r]")
+    parser = crcreceiver_headless.argument_parser()
     parser.add_argument(
-        "--spss",
-        dest="spss",
-        type=int,
-        default=2,
-        help="Set samples per symbol (sps) [default=%(default)r]"
-    )
-    parser.add_argument(
-        "--multiplyconn",
-        dest="multiplyconn",
-        type=float,
-        default=0.707,
-        help="Set Multiply Constant [default=%(default)r]"
-    )
+        "--no-gui", dest="no_gui", action="store_true",
+        help="Run the headless build without Qt sinks or a window")
     return parser
 
 
+
 def main(top_block_cls=crcreceiver, options=None):
     if options is None:
         options = argument_parser().parse_args()
 
+    if options.no_gui:
+        return crcreceiver_headless.main(options=options)
+
     qapp = Qt.QApplication(sys.argv)
 
-    tb = top_block_cls(recfilename_variable=options.recfilename_variable)
-    tb.set_sps(options.spss)
-    tb.set_Multiply_Const(options.multiplyconn)
-    
+    tb = top_block_cls(recfilename_variable=options.recfilename_variable, packet_len=options.packet_len,
+                       sps=options.spss, Multiply_Const=options.multiplyconn,
+                       eot_profile=crcreceiver_headless.eot_profile(options), deframe=options.deframe,
+                       record_path=options.record, replay_path=options.replay,
+                       capture_path=options.capture, capture_seconds=options.capture_seconds, capture_on=options.capture_on,
+                       squelch_db=options.squelch_db, squelch_hangover=options.squelch_hangover, acquire=options.acquire)
 
     tb.start()
 
@@ -489,9 +334,13 @@ def main(top_block_cls=crcreceiver, options=None):
 
     timer = Qt.QTimer()
     timer.start(500)
-    timer.timeout.connect(lambda: None)
+    # Close the window once the end of transmission has been received
+    timer.timeout.connect(lambda: tb.eot_reached() and sig_handler())
 
     qapp.exec_()
+    for path in tb.captures():
+        print(f"Captured {path}")
+    crcreceiver_headless.finalize(options)
 
 if __name__ == '__main__':
     main()
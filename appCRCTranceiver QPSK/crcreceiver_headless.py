@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#
+# SPDX-License-Identifier: GPL-3.0
+#
+# GNU Radio Python Flow Graph
+# Title: CRCReceiver (no GUI)
+# GNU Radio version: 3.10.10.0
+
+from gnuradio import blocks
+from gnuradio import gr
+from gnuradio.filter import firdes
+import sys
+import signal
+from argparse import ArgumentParser
+from gnuradio.eng_arg import eng_float, intx
+# Replaying a recording does not need gr-osmosdr
+try:
+    import osmosdr
+except ImportError:
+    osmosdr = None
+import time
+
+from crcchains import FrameGate, PacketWatch, RingCapture, build_rx_chain, set_link_variables
+from framing import DEFAULT_PROFILE, get_profile, profile_names
+import sigmf_meta
+
+# What makes the ring capture export a window
+CAPTURE_TRIGGERS = ("access_code", "crc_burst", "both")
+# CRC failures among the last 8 packets that count as a burst
+CRC_BURST = 3
+
+
+class crcreceiver_headless(gr.top_block):
+
+    def __init__(self, packet_len=8, puncpat='11', recfilename_variable='C:\\Users\\Thisuka Inol\\Desktop\\ui.txt', sps=2, Multiply_Const=0.707, eot_profile=None, deframe=False,
+                 record_path=None, replay_path=None, capture_path=None, capture_seconds=3.0, capture_on="both",
+                 squelch_db=None, squelch_hangover=None, acquire=False):
+        gr.top_block.__init__(self, "CRCReceiver", catch_exceptions=True)
+
+        ##################################################
+        # Parameters
+        ##################################################
+        self.packet_len = packet_len
+        self.puncpat = puncpat
+        self.recfilename_variable = recfilename_variable
+        self.eot_profile = eot_profile
+        self.deframe = deframe
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.capture_path = capture_path
+        self.squelch_db = squelch_db
+
+        ##################################################
+        # Variables
+        ##################################################
+        set_link_variables(self, sps, Multiply_Const)
+        samp_rate = self.samp_rate
+
+        ##################################################
+        # Blocks
+        ##################################################
+
+        if record_path and replay_path:
+            raise ValueError("record from the radio or replay a recording, not both")
+        if not replay_path and osmosdr is None:
+            raise ValueError("receiving from the radio needs gr-osmosdr; replay a recording instead")
+        if replay_path:
+            # A recording in place of the radio, decoded as fast as the CPU allows
+            self.blocks_file_source_1 = blocks.file_source(gr.sizeof_gr_complex*1, replay_path, False, 0, 0)
+        else:
+            self.osmosdr_source_0 = osmosdr.source(
+                args="numchan=" + str(1) + " " + "bladerf=0,nchan=1"
+            )
+            self.osmosdr_source_0.set_time_unknown_pps(osmosdr.time_spec_t())
+            self.osmosdr_source_0.set_sample_rate(samp_rate)
+            self.osmosdr_source_0.set_center_freq(2.42e9, 0)
+            self.osmosdr_source_0.set_freq_corr(0, 0)
+            self.osmosdr_source_0.set_dc_offset_mode(0, 0)
+            self.osmosdr_source_0.set_iq_balance_mode(0, 0)
+            self.osmosdr_source_0.set_gain_mode(True, 0)
+            self.osmosdr_source_0.set_gain(80, 0)
+            self.osmosdr_source_0.set_if_gain(0, 0)
+            self.osmosdr_source_0.set_bb_gain(0, 0)
+            self.osmosdr_source_0.set_antenna("RX2", 0)
+            self.osmosdr_source_0.set_bandwidth(25000, 0)
+            self.blocks_throttle2_0 = blocks.throttle( gr.sizeof_gr_complex*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
+        if record_path:
+            # Raw samples straight from the radio, ahead of any processing
+            self.blocks_file_sink_2 = blocks.file_sink(gr.sizeof_gr_complex*1, record_path, False)
+            self.blocks_file_sink_2.set_unbuffered(False)
+            # The radio settings are only known with a source to ask
+            source = getattr(self, "osmosdr_source_0", None)
+            sigmf_meta.write_meta(
+                record_path, samp_rate,
+                center_freq=source.get_center_freq(0) if source is not None else None,
+                gain=source.get_gain(0) if source is not None else None,
+                hw="bladeRF via gr-osmosdr" if source is not None else None,
+                sps=sps, Multiply_Const=Multiply_Const, packet_len=packet_len)
+        self.blocks_file_sink_0 = blocks.file_sink(gr.sizeof_char*1, recfilename_variable, False)
+        self.blocks_file_sink_0.set_unbuffered(True)
+        rx_in, rx_out = build_rx_chain(self, packet_len, squelch_db=squelch_db, hangover=squelch_hangover,
+                                       acquire=acquire)
+        if deframe and eot_profile is None:
+            raise ValueError("deframing needs the framing profile (eot_profile)")
+        if eot_profile is not None:
+            # Ends the capture at the closing marker of the framing profile, and with
+            # `deframe` drops the preamble and detection sequences on the way
+            self.frame_gate_0 = FrameGate(eot_profile, payload_only=deframe)
+        if capture_path:
+            if capture_on not in CAPTURE_TRIGGERS:
+                raise ValueError(f"capture_on must be one of {CAPTURE_TRIGGERS}")
+            # The last capture_seconds of samples, exported around access code detections
+            # and CRC failure bursts; a third of the window follows the trigger
+            ring = int(capture_seconds * samp_rate)
+            self.ring_capture_0 = RingCapture(capture_path, ring, ring // 3, samp_rate,
+                                              sps=sps, Multiply_Const=Multiply_Const, packet_len=packet_len)
+            self.packet_watch_0 = PacketWatch(self.ring_capture_0, on_detect=capture_on in ("access_code", "both"),
+                                              crc_burst=CRC_BURST if capture_on in ("crc_burst", "both") else 0)
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        if replay_path:
+            self.connect((self.blocks_file_source_1, 0), (rx_in, 0))
+        else:
+            self.connect((self.osmosdr_source_0, 0), (self.blocks_throttle2_0, 0))
+            self.connect((self.blocks_throttle2_0, 0), (rx_in, 0))
+        if record_path:
+            self.connect((self.osmosdr_source_0, 0), (self.blocks_file_sink_2, 0))
+        if capture_path:
+            self.connect((self.blocks_file_source_1 if replay_path else self.osmosdr_source_0, 0), (self.ring_capture_0, 0))
+            self.connect((self.blocks_repack_bits_bb_1_0, 0), (self.packet_watch_0, 0))
+        if eot_profile is not None:
+            self.connect((rx_out, 0), (self.frame_gate_0, 0))
+            rx_out = self.frame_gate_0
+        self.connect((rx_out, 0), (self.blocks_file_sink_0, 0))
+
+
+    # True once the end-of-transmission marker was received (only with an eot_profile)
+    def eot_reached(self):
+        return self.eot_profile is not None and self.frame_gate_0.eot.is_set()
+
+    # Windows exported by the ring capture so far
+    def captures(self):
+        return self.ring_capture_0.exports if self.capture_path else []
+
+    # Wait for the end-of-transmission marker; False if `timeout` seconds passed first
+    def wait_eot(self, timeout=None):
+        return self.frame_gate_0.eot.wait(timeout)
+
+    def get_packet_len(self):
+        return self.packet_len
+
+    def set_packet_len(self, packet_len):
+        self.packet_len = packet_len
+
+    def get_puncpat(self):
+        return self.puncpat
+
+    def set_puncpat(self, puncpat):
+        self.puncpat = puncpat
+
+    def get_recfilename_variable(self):
+        return self.recfilename_variable
+
+    def set_recfilename_variable(self, recfilename_variable):
+        self.recfilename_variable = recfilename_variable
+        self.blocks_file_sink_0.open(self.recfilename_variable)
+
+    def get_sps(self):
+        return self.sps
+
+    def set_sps(self, sps):
+        self.sps = sps
+        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
+        self.digital_symbol_sync_xx_0.set_sps(self.sps)
+
+    def get_qpsk(self):
+        return self.qpsk
+
+    def set_qpsk(self, qpsk):
+        self.qpsk = qpsk
+        self.digital_constellation_decoder_cb_0.set_constellation(self.qpsk)
+
+    def get_nfilts(self):
+        return self.nfilts
+
+    def set_nfilts(self, nfilts):
+        self.nfilts = nfilts
+        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
+
+    def get_variable_adaptive_algorithm_0(self):
+        return self.variable_adaptive_algorithm_0
+
+    def set_variable_adaptive_algorithm_0(self, variable_adaptive_algorithm_0):
+        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0
+
+    def get_samp_rate(self):
+        return self.samp_rate
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+        if not self.replay_path:
+            self.blocks_throttle2_0.set_sample_rate(self.samp_rate)
+            self.osmosdr_source_0.set_sample_rate(self.samp_rate)
+
+    def get_rrc_taps(self):
+        return self.rrc_taps
+
+    def set_rrc_taps(self, rrc_taps):
+        self.rrc_taps = rrc_taps
+
+    def get_phase_bw(self):
+        return self.phase_bw
+
+    def set_phase_bw(self, phase_bw):
+        self.phase_bw = phase_bw
+        self.digital_costas_loop_cc_0.set_loop_bandwidth(self.phase_bw)
+        self.digital_fll_band_edge_cc_0.set_loop_bandwidth(self.phase_bw)
+        self.digital_symbol_sync_xx_0.set_loop_bandwidth(self.phase_bw)
+
+    def get_hdr_format(self):
+        return self.hdr_format
+
+    def set_hdr_format(self, hdr_format):
+        self.hdr_format = hdr_format
+
+    def get_excess_bw(self):
+        return self.excess_bw
+
+    def set_excess_bw(self, excess_bw):
+        self.excess_bw = excess_bw
+
+    def get_squelch_db(self):
+        return self.squelch_db
+
+    def set_squelch_db(self, squelch_db):
+        self.squelch_db = squelch_db
+        self.energy_gate_0.set_threshold(self.squelch_db)
+
+    def get_Multiply_Const(self):
+        return self.Multiply_Const
+
+    def set_Multiply_Const(self, Multiply_Const):
+        self.Multiply_Const = Multiply_Const
+        self.blocks_multiply_const_vxx_1.set_k(1/self.Multiply_Const)
+
+
+
+def argument_parser():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--recfilename-variable", dest="recfilename_variable", type=str, default='C:\\Users\\Thisuka Inol\\Desktop\\ui.txt',
+        help="Set recfilename_variable [default=%(default)r]")
+    parser.add_argument(
+        "--packet-len", dest="packet_len", type=intx, default=8,
+        help="Set largest payload bytes per packet (packet_len) [default=%(default)r]")
+    parser.add_argument(
+        "--spss",
+        dest="spss",
+        type=int,
+        default=2,
+        help="Set samples per symbol (sps) [default=%(default)r]"
+    )
+    parser.add_argument(
+        "--multiplyconn",
+        dest="multiplyconn",
+        type=float,
+        default=0.707,
+        help="Set Multiply Constant [default=%(default)r]"
+    )
+    parser.add_argument(
+        "--duration", dest="duration", type=eng_float, default=None,
+        help="Stop receiving after this many seconds without a GUI (default: until interrupted)")
+    parser.add_argument(
+        "--stop-on-eot", dest="stop_on_eot", action="store_true",
+        help="Stop once the closing detection sequence of the framing profile has been received")
+    parser.add_argument(
+        "--profile", dest="profile", type=str, default=DEFAULT_PROFILE, choices=profile_names(),
+        help="Framing profile used by the transmitter [default=%(default)r]")
+    parser.add_argument(
+        "--record", dest="record", type=str, default=None,
+        help="Also save the raw samples from the radio to this file, with a .sigmf-meta file next to it")
+    parser.add_argument(
+        "--replay", dest="replay", type=str, default=None,
+        help="Decode this raw sample recording instead of the radio, unthrottled")
+    parser.add_argument(
+        "--capture", dest="capture", type=str, default=None,
+        help="Keep the last --capture-seconds of radio samples in this memory-mapped ring file and export a window "
+             "around each trigger next to it")
+    parser.add_argument(
+        "--capture-seconds", dest="capture_seconds", type=eng_float, default=3.0,
+        help="Length of the ring and of each exported window, a third of it after the trigger [default=%(default)r]")
+    parser.add_argument(
+        "--capture-on", dest="capture_on", type=str, default="both", choices=CAPTURE_TRIGGERS,
+        help="Export on access code detections, on bursts of CRC failures, or both [default=%(default)r]")
+    parser.add_argument(
+        "--squelch-db", dest="squelch_db", type=eng_float, default=None,
+        help="Only run the receive loops on sample blocks whose mean power reaches this level in dB "
+             "(default: process every sample)")
+    parser.add_argument(
+        "--squelch-hangover", dest="squelch_hangover", type=intx, default=None,
+        help="Samples the squelch stays open after the last loud block (default: 256 symbols)")
+    parser.add_argument(
+        "--acquire", dest="acquire", action="store_true",
+        help="Start the FLL at the frequency offset estimated from each burst's 0xAA preamble, "
+             "so a short training preamble is enough")
+    parser.add_argument(
+        "--deframe", dest="deframe", action="store_true",
+        help="Write only the payload between the detection sequences, so no removePreamble.py step is needed")
+    parser.add_argument(
+        "--remove-preamble-to", dest="remove_preamble_to", type=str, default=None,
+        help="After stopping, strip the preamble from the capture and save the payload here")
+    return parser
+
+
+# Framing profile tracked in the flowgraph, or None without --stop-on-eot / --deframe
+def eot_profile(options):
+    if not (options.stop_on_eot or options.deframe):
+        return None
+    return get_profile(options.profile, options.spss, options.packet_len)
+
+
+# Warn when a recording was made with other link settings than it is replayed with
+def check_recording(options):
+    recorded = sigmf_meta.recorded_settings(sigmf_meta.read_meta(options.replay))
+    used = {"sps": options.spss, "Multiply_Const": options.multiplyconn, "packet_len": options.packet_len}
+    for key, value in used.items():
+        if key in recorded and recorded[key] != value:
+            print(f"Warning: {options.replay} was recorded with {key}={recorded[key]}, replaying with {value}")
+
+
+# Strip the preamble from the finished capture, as removePreamble.py would
+def finalize(options):
+    if options.remove_preamble_to and options.deframe:
+        print("Capture was deframed in the flowgraph; --remove-preamble-to ignored")
+    elif options.remove_preamble_to:
+        from removePreamble import remove_preamble
+        remove_preamble(options.recfilename_variable, options.remove_preamble_to,
+                        profile=get_profile(options.profile, options.spss, options.packet_len))
+
+
+def main(top_block_cls=crcreceiver_headless, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    tb = top_block_cls(recfilename_variable=options.recfilename_variable, packet_len=options.packet_len,
+                       sps=options.spss, Multiply_Const=options.multiplyconn, eot_profile=eot_profile(options),
+                       deframe=options.deframe, record_path=options.record, replay_path=options.replay,
+                       capture_path=options.capture, capture_seconds=options.capture_seconds, capture_on=options.capture_on,
+                       squelch_db=options.squelch_db, squelch_hangover=options.squelch_hangover, acquire=options.acquire)
+    if options.replay:
+        check_recording(options)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    start = time.perf_counter()
+    tb.start()
+
+    if options.replay:
+        # Runs to the end of the recording (or up to the end of transmission)
+        tb.wait()
+        elapsed = time.perf_counter() - start
+        samples = tb.blocks_file_source_1.nitems_written(0)
+        print(f"Replayed {samples} samples in {elapsed:.3f} s ({samples / max(elapsed, 1e-9) / 1e6:.2f} Msps)")
+        if options.acquire:
+            print(f"- FLL seeded {len(tb.acquisition_seeder_0.seeds)} times")
+        if options.squelch_db is not None:
+            print(f"- Squelch passed {tb.energy_gate_0.passed} samples ({tb.energy_gate_0.passed / max(samples, 1):.1%})")
+        if tb.eot_reached():
+            print("End of transmission received")
+    elif options.stop_on_eot:
+        # --duration is then the longest to wait for the marker
+        if tb.wait_eot(options.duration):
+            print("End of transmission received")
+        else:
+            print("No end of transmission before the time limit")
+        tb.stop()
+        tb.wait()
+    elif options.duration is None:
+        tb.wait()
+    else:
+        time.sleep(options.duration)
+        tb.stop()
+        tb.wait()
+    for path in tb.captures():
+        print(f"Captured {path}")
+    finalize(options)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,28 +11,26 @@
 from PyQt5 import Qt
 from gnuradio import qtgui
 from gnuradio import blocks
-import pmt
-from gnuradio import digital
 from gnuradio import eng_notation
 from gnuradio import fec
 from gnuradio import gr
-from gnuradio.filter import firdes
 from gnuradio.fft import window
 import sys
 import signal
 from PyQt5 import Qt
-from argparse import ArgumentParser
-from gnuradio.eng_arg import eng_float, intx
-import osmosdr
-import time
 import sip
 
+import crctransmitter_headless
+from crctransmitter_headless import crctransmitter_headless as crctransmitter_base
 
 
-class crctransmitter(gr.top_block, Qt.QWidget):
 
-    def __init__(self, filename_variable='C:\\Users\\Thisuka Inol\\Desktop\\gui.txt', puncpat='11'):
-        gr.top_block.__init__(self, "CRCTransmitter", catch_exceptions=True)
+class crctransmitter(crctransmitter_base, Qt.QWidget):
+
+    def __init__(self, filename_variable='C:\\Users\\Thisuka Inol\\Desktop\\gui.txt', packet_len=8, puncpat='11', sps=2, Multiply_Const=0.707):
+        # Same DSP chain as the headless build; this class only adds the Qt sinks
+        crctransmitter_base.__init__(self, filename_variable, packet_len, puncpat, sps, Multiply_Const)
+
         Qt.QWidget.__init__(self)
         self.setWindowTitle("CRCTransmitter")
         qtgui.util.check_set_qss()
@@ -61,28 +59,13 @@ class crctransmitter(gr.top_block, Qt.QWidget):
         except BaseException as exc:
             print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
 
-        ##################################################
-        # Parameters
-        ##################################################
-        self.filename_variable = filename_variable
-        self.puncpat = puncpat
 
         ##################################################
         # Variables
         ##################################################
-        self.sps = sps = 2
-        self.qpsk = qpsk = digital.constellation_rect([0.707+0.707j, -0.707+0.707j, -0.707-0.707j, 0.707-0.707j], [0, 1, 2, 3],
-        4, 2, 2, 1, 1).base()
-        self.nfilts = nfilts = 32
-        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0 = digital.adaptive_algorithm_cma( qpsk, .0001, 4).base()
-        self.samp_rate = samp_rate = 1500000
-        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(nfilts, nfilts, 1.0/float(sps), 0.35, 11*sps*nfilts)
-        self.phase_bw = phase_bw = 0.0628
+        samp_rate = self.samp_rate
         self.ldpc_encoder = ldpc_encoder = fec.ldpc_encoder_make(gr.prefix() + "/share/gnuradio/fec/ldpc/" + "n_0100_k_0042_gap_02.alist")
         self.ldpc_decoder = ldpc_decoder = fec.ldpc_decoder.make(gr.prefix() + "/share/gnuradio/fec/ldpc/" + "n_0100_k_0042_gap_02.alist", 50)
-        self.hdr_format = hdr_format = digital.header_format_default('111111011011001110010110001000011010110011001010101011010100011\n',2, 1)
-        self.excess_bw = excess_bw = 0.35
-        self.Multiply_Const = Multiply_Const = 0.707
 
         ##################################################
         # Blocks
@@ -249,58 +232,18 @@ class crctransmitter(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(0, 2):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.osmosdr_sink_0 = osmosdr.sink(
-            args="numchan=" + str(1) + " " + "bladerf=0,nchan=1"
-        )
-        self.osmosdr_sink_0.set_time_unknown_pps(osmosdr.time_spec_t())
-        self.osmosdr_sink_0.set_sample_rate(samp_rate)
-        self.osmosdr_sink_0.set_center_freq(2.42e9, 0)
-        self.osmosdr_sink_0.set_freq_corr(0, 0)
-        self.osmosdr_sink_0.set_gain(80, 0)
-        self.osmosdr_sink_0.set_if_gain(0, 0)
-        self.osmosdr_sink_0.set_bb_gain(0, 0)
-        self.osmosdr_sink_0.set_antenna("TX1", 0)
-        self.osmosdr_sink_0.set_bandwidth(25000, 0)
-        self.digital_protocol_formatter_bb_0 = digital.protocol_formatter_bb(hdr_format, "packet_len")
-        self.digital_crc32_bb_0 = digital.crc32_bb(False, "packet_len", True)
-        self.digital_constellation_modulator_0 = digital.generic_mod(
-            constellation=qpsk,
-            differential=True,
-            samples_per_symbol=sps,
-            pre_diff_code=True,
-            excess_bw=excess_bw,
-            verbose=False,
-            log=False,
-            truncate=False)
         self.blocks_uchar_to_float_0_0_0_0 = blocks.uchar_to_float()
-        self.blocks_throttle2_1 = blocks.throttle( gr.sizeof_char*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
-        self.blocks_throttle2_0_0 = blocks.throttle( gr.sizeof_gr_complex*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
-        self.blocks_tagged_stream_mux_0 = blocks.tagged_stream_mux(gr.sizeof_char*1, 'packet_len', 0)
-        self.blocks_stream_to_tagged_stream_0 = blocks.stream_to_tagged_stream(gr.sizeof_char, 1, 8, "packet_len")
         self.blocks_repack_bits_bb_0_0 = blocks.repack_bits_bb(8, 1, "packet_len", False, gr.GR_MSB_FIRST)
-        self.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(Multiply_Const)
-        self.blocks_file_source_0 = blocks.file_source(gr.sizeof_char*1, filename_variable, False, 0, 0)
-        self.blocks_file_source_0.set_begin_tag(pmt.PMT_NIL)
 
 
         ##################################################
         # Connections
         ##################################################
-        self.connect((self.blocks_file_source_0, 0), (self.blocks_throttle2_1, 0))
-        self.connect((self.blocks_multiply_const_vxx_0, 0), (self.osmosdr_sink_0, 0))
         self.connect((self.blocks_multiply_const_vxx_0, 0), (self.qtgui_freq_sink_x_0_0, 0))
         self.connect((self.blocks_repack_bits_bb_0_0, 0), (self.blocks_uchar_to_float_0_0_0_0, 0))
-        self.connect((self.blocks_stream_to_tagged_stream_0, 0), (self.digital_crc32_bb_0, 0))
         self.connect((self.blocks_tagged_stream_mux_0, 0), (self.blocks_repack_bits_bb_0_0, 0))
-        self.connect((self.blocks_tagged_stream_mux_0, 0), (self.digital_constellation_modulator_0, 0))
-        self.connect((self.blocks_throttle2_0_0, 0), (self.blocks_multiply_const_vxx_0, 0))
-        self.connect((self.blocks_throttle2_1, 0), (self.blocks_stream_to_tagged_stream_0, 0))
         self.connect((self.blocks_uchar_to_float_0_0_0_0, 0), (self.qtgui_time_sink_x_0, 0))
-        self.connect((self.digital_constellation_modulator_0, 0), (self.blocks_throttle2_0_0, 0))
         self.connect((self.digital_constellation_modulator_0, 0), (self.qtgui_const_sink_x_0_0, 0))
-        self.connect((self.digital_crc32_bb_0, 0), (self.blocks_tagged_stream_mux_0, 1))
-        self.connect((self.digital_crc32_bb_0, 0), (self.digital_protocol_formatter_bb_0, 0))
-        self.connect((self.digital_protocol_formatter_bb_0, 0), (self.blocks_tagged_stream_mux_0, 0))
 
 
     def closeEvent(self, event):
@@ -311,69 +254,15 @@ class crctransmitter(gr.top_block, Qt.QWidget):
 
         event.accept()
 
-    def get_filename_variable(self):
-        return self.filename_variable
-
-    def set_filename_variable(self, filename_variable):
-        self.filename_variable = filename_variable
-        self.blocks_file_source_0.open(self.filename_variable, False)
-
-    def get_puncpat(self):
-        return self.puncpat
-
-    def set_puncpat(self, puncpat):
-        self.puncpat = puncpat
-
-    def get_sps(self):
-        return self.sps
-
     def set_sps(self, sps):
-        self.sps = sps
-        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
+        crctransmitter_base.set_sps(self, sps)
         Qt.QMetaObject.invokeMethod(self._sps_label, "setText", Qt.Q_ARG("QString", str(self._sps_formatter(self.sps))))
 
-    def get_qpsk(self):
-        return self.qpsk
-
-    def set_qpsk(self, qpsk):
-        self.qpsk = qpsk
-
-    def get_nfilts(self):
-        return self.nfilts
-
-    def set_nfilts(self, nfilts):
-        self.nfilts = nfilts
-        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
-
-    def get_variable_adaptive_algorithm_0(self):
-        return self.variable_adaptive_algorithm_0
-
-    def set_variable_adaptive_algorithm_0(self, variable_adaptive_algorithm_0):
-        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0
-
-    def get_samp_rate(self):
-        return self.samp_rate
-
     def set_samp_rate(self, samp_rate):
-        self.samp_rate = samp_rate
-        self.blocks_throttle2_0_0.set_sample_rate(self.samp_rate)
-        self.blocks_throttle2_1.set_sample_rate(self.samp_rate)
-        self.osmosdr_sink_0.set_sample_rate(self.samp_rate)
+        crctransmitter_base.set_samp_rate(self, samp_rate)
         self.qtgui_freq_sink_x_0_0.set_frequency_range(0, self.samp_rate)
         self.qtgui_time_sink_x_0.set_samp_rate(self.samp_rate)
 
-    def get_rrc_taps(self):
-        return self.rrc_taps
-
-    def set_rrc_taps(self, rrc_taps):
-        self.rrc_taps = rrc_taps
-
-    def get_phase_bw(self):
-        return self.phase_bw
-
-    def set_phase_bw(self, phase_bw):
-        self.phase_bw = phase_bw
-
     def get_ldpc_encoder(self):
         return self.ldpc_encoder
 
@@ -386,61 +275,32 @@ class crctransmitter(gr.top_block, Qt.QWidget):
     def set_ldpc_decoder(self, ldpc_decoder):
         self.ldpc_decoder = ldpc_decoder
 
-    def get_hdr_format(self):
-        return self.hdr_format
-
-    def set_hdr_format(self, hdr_format):
-        self.hdr_format = hdr_format
-        self.digital_protocol_formatter_bb_0.set_header_format(self.hdr_format)
-
-    def get_excess_bw(self):
-        return self.excess_bw
-
-    def set_excess_bw(self, excess_bw):
-        self.excess_bw = excess_bw
-
-    def get_Multiply_Const(self):
-        return self.Multiply_Const
-
     def set_Multiply_Const(self, Multiply_Const):
-        self.Multiply_Const = Multiply_Const
+        crctransmitter_base.set_Multiply_Const(self, Multiply_Const)
         Qt.QMetaObject.invokeMethod(self._Multiply_Const_label, "setText", Qt.Q_ARG("QString", str(self._Multiply_Const_formatter(self.Multiply_Const))))
-        self.blocks_multiply_const_vxx_0.set_k(self.Multiply_Const)
 
 
 
 def argument_parser():
-    parser = ArgumentParser()
-    parser.add_argument(
-        "--filename-variable", dest="filename_variable", type=str, default='C:\\Users\\Thisuka Inol\\Desktop\\gui.txt',
-        help="Set filename_variable [default=%(default)r]")
+    parser = crctransmitter_headless.argument_parser()
     parser.add_argument(
-        "--spss",
-        dest="spss",
-        type=int,
-        default=2,
-        help="Set samples per symbol (sps) [default=%(default)r]"
-    )
-    parser.add_argument(
-        "--multiplyconn",
-        dest="multiplyconn",
-        type=float,
-        default=0.707,
-        help="Set Multiply Constant [default=%(default)r]"
-    )
+        "--no-gui", dest="no_gui", action="store_true",
+        help="Run the headless build without Qt sinks or a window")
     return parser
 
 
+
 def main(top_block_cls=crctransmitter, options=None):
     if options is None:
         options = argument_parser().parse_args()
 
+    if options.no_gui or options.pdu or options.burst:
+        return crctransmitter_headless.main(options=options)
+
     qapp = Qt.QApplication(sys.argv)
 
-    tb = top_block_cls(filename_variable=options.filename_variable)
-    tb.set_sps(options.spss)
-    tb.set_Multiply_Const(options.multiplyconn)
-    
+    tb = top_block_cls(filename_variable=options.filename_variable, packet_len=options.packet_len,
+                       sps=options.spss, Multiply_Const=options.multiplyconn)
 
     tb.start()
 
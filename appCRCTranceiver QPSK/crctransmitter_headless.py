@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#
+# SPDX-License-Identifier: GPL-3.0
+#
+# GNU Radio Python Flow Graph
+# Title: CRCTransmitter (no GUI)
+# GNU Radio version: 3.10.10.0
+
+from gnuradio import blocks
+import pmt
+from gnuradio import gr
+from gnuradio.filter import firdes
+import sys
+import signal
+from argparse import ArgumentParser
+from gnuradio.eng_arg import intx
+import osmosdr
+import time
+
+from crcchains import build_tx_chain, send_pdu, set_link_variables
+from framing import BITS_PER_SYMBOL
+
+
+class crctransmitter_headless(gr.top_block):
+
+    def __init__(self, filename_variable='C:\\Users\\Thisuka Inol\\Desktop\\gui.txt', packet_len=8, puncpat='11', sps=2, Multiply_Const=0.707, pdu_input=False, burst=False):
+        gr.top_block.__init__(self, "CRCTransmitter", catch_exceptions=True)
+
+        ##################################################
+        # Parameters
+        ##################################################
+        self.filename_variable = filename_variable
+        self.packet_len = packet_len
+        self.puncpat = puncpat
+        self.pdu_input = pdu_input = pdu_input or burst
+        self.burst = burst
+
+        ##################################################
+        # Variables
+        ##################################################
+        set_link_variables(self, sps, Multiply_Const)
+        samp_rate = self.samp_rate
+
+        ##################################################
+        # Blocks
+        ##################################################
+
+        self.osmosdr_sink_0 = osmosdr.sink(
+            args="numchan=" + str(1) + " " + "bladerf=0,nchan=1"
+        )
+        self.osmosdr_sink_0.set_time_unknown_pps(osmosdr.time_spec_t())
+        self.osmosdr_sink_0.set_sample_rate(samp_rate)
+        self.osmosdr_sink_0.set_center_freq(2.42e9, 0)
+        self.osmosdr_sink_0.set_freq_corr(0, 0)
+        self.osmosdr_sink_0.set_gain(80, 0)
+        self.osmosdr_sink_0.set_if_gain(0, 0)
+        self.osmosdr_sink_0.set_bb_gain(0, 0)
+        self.osmosdr_sink_0.set_antenna("TX1", 0)
+        self.osmosdr_sink_0.set_bandwidth(25000, 0)
+        self.blocks_throttle2_0_0 = blocks.throttle( gr.sizeof_gr_complex*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
+        # Messages come in through send() instead of the file source
+        tx_in, tx_out = build_tx_chain(self, packet_len, pdu_input, burst)
+        # Samples the messages queued so far take on air
+        self.pdu_samples = 0
+        if not pdu_input:
+            self.blocks_throttle2_1 = blocks.throttle( gr.sizeof_char*1, samp_rate, True, 0 if "auto" == "auto" else max( int(float(0.1) * samp_rate) if "auto" == "time" else int(0.1), 1) )
+            self.blocks_file_source_0 = blocks.file_source(gr.sizeof_char*1, filename_variable, False, 0, 0)
+            self.blocks_file_source_0.set_begin_tag(pmt.PMT_NIL)
+
+
+        ##################################################
+        # Connections
+        ##################################################
+        if not pdu_input:
+            self.connect((self.blocks_file_source_0, 0), (self.blocks_throttle2_1, 0))
+            self.connect((self.blocks_throttle2_1, 0), (tx_in, 0))
+        self.connect((tx_out, 0), (self.blocks_throttle2_0_0, 0))
+        self.connect((self.blocks_throttle2_0_0, 0), (self.osmosdr_sink_0, 0))
+
+
+    # Transmit a message right away; needs pdu_input and a running flowgraph
+    def send(self, data):
+        self.pdu_samples += send_pdu(self, data, self.packet_len) * 8 // BITS_PER_SYMBOL * self.sps
+        return -(-len(data) // self.packet_len)
+
+    # Block until every queued message has left the transmitter, or `timeout` seconds passed
+    def wait_sent(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.blocks_throttle2_0_0.nitems_written(0) < self.pdu_samples:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_filename_variable(self):
+        return self.filename_variable
+
+    def set_filename_variable(self, filename_variable):
+        self.filename_variable = filename_variable
+        if not self.pdu_input:
+            self.blocks_file_source_0.open(self.filename_variable, False)
+
+    def get_packet_len(self):
+        return self.packet_len
+
+    def set_packet_len(self, packet_len):
+        self.packet_len = packet_len
+        if not self.pdu_input:
+            self.blocks_stream_to_tagged_stream_0.set_packet_len(self.packet_len)
+
+    def get_puncpat(self):
+        return self.puncpat
+
+    def set_puncpat(self, puncpat):
+        self.puncpat = puncpat
+
+    def get_sps(self):
+        return self.sps
+
+    def set_sps(self, sps):
+        self.sps = sps
+        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
+
+    def get_qpsk(self):
+        return self.qpsk
+
+    def set_qpsk(self, qpsk):
+        self.qpsk = qpsk
+
+    def get_nfilts(self):
+        return self.nfilts
+
+    def set_nfilts(self, nfilts):
+        self.nfilts = nfilts
+        self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts, 1.0/float(self.sps), 0.35, 11*self.sps*self.nfilts))
+
+    def get_variable_adaptive_algorithm_0(self):
+        return self.variable_adaptive_algorithm_0
+
+    def set_variable_adaptive_algorithm_0(self, variable_adaptive_algorithm_0):
+        self.variable_adaptive_algorithm_0 = variable_adaptive_algorithm_0
+
+    def get_samp_rate(self):
+        return self.samp_rate
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+        self.blocks_throttle2_0_0.set_sample_rate(self.samp_rate)
+        if not self.pdu_input:
+            self.blocks_throttle2_1.set_sample_rate(self.samp_rate)
+        self.osmosdr_sink_0.set_sample_rate(self.samp_rate)
+
+    def get_rrc_taps(self):
+        return self.rrc_taps
+
+    def set_rrc_taps(self, rrc_taps):
+        self.rrc_taps = rrc_taps
+
+    def get_phase_bw(self):
+        return self.phase_bw
+
+    def set_phase_bw(self, phase_bw):
+        self.phase_bw = phase_bw
+
+    def get_hdr_format(self):
+        return self.hdr_format
+
+    def set_hdr_format(self, hdr_format):
+        self.hdr_format = hdr_format
+        self.digital_protocol_formatter_bb_0.set_header_format(self.hdr_format)
+
+    def get_excess_bw(self):
+        return self.excess_bw
+
+    def set_excess_bw(self, excess_bw):
+        self.excess_bw = excess_bw
+
+    def get_Multiply_Const(self):
+        return self.Multiply_Const
+
+    def set_Multiply_Const(self, Multiply_Const):
+        self.Multiply_Const = Multiply_Const
+        self.blocks_multiply_const_vxx_0.set_k(self.Multiply_Const)
+
+
+
+def argument_parser():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--filename-variable", dest="filename_variable", type=str, default='C:\\Users\\Thisuka Inol\\Desktop\\gui.txt',
+        help="Set filename_variable [default=%(default)r]")
+    parser.add_argument(
+        "--packet-len", dest="packet_len", type=intx, default=8,
+        help="Set payload bytes per packet (packet_len) [default=%(default)r]")
+    parser.add_argument(
+        "--spss",
+        dest="spss",
+        type=int,
+        default=2,
+        help="Set samples per symbol (sps) [default=%(default)r]"
+    )
+    parser.add_argument(
+        "--multiplyconn",
+        dest="multiplyconn",
+        type=float,
+        default=0.707,
+        help="Set Multiply Constant [default=%(default)r]"
+    )
+    parser.add_argument(
+        "--pdu", dest="pdu", action="store_true",
+        help="Send each line read from stdin as a message instead of the file (always headless)")
+    parser.add_argument(
+        "--burst", dest="burst", action="store_true",
+        help="Like --pdu, but send every message as one tx_sob/tx_eob burst behind a short training preamble")
+    return parser
+
+
+def main(top_block_cls=crctransmitter_headless, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    tb = top_block_cls(filename_variable=options.filename_variable, packet_len=options.packet_len,
+                       sps=options.spss, Multiply_Const=options.multiplyconn, pdu_input=options.pdu, burst=options.burst)
+
+    def sig_handler(sig=None, frame=None):
+        tb.stop()
+        tb.wait()
+
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, sig_handler)
+    signal.signal(signal.SIGTERM, sig_handler)
+
+    tb.start()
+
+    if options.pdu or options.burst:
+        for line in sys.stdin.buffer:
+            tb.send(line)
+        tb.wait_sent()
+        tb.stop()
+    # Runs until the whole file has been sent, or until stopped
+    tb.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import math
+from dataclasses import dataclass
+
+# Byte repeated in the preamble (alternating bits keep the receiver loops busy)
+PREAMBLE_BYTE = 0b10101010
+# Byte repeated in the detection sequence that marks the start and end of the payload
+DETECT_BYTE = 0b00110011
+# Number of preamble bytes that must sit next to a detection sequence for it to count as a frame edge
+GUARD_LEN = 8
+
+# Link defaults, matching crctransmitter/crcreceiver
+SAMP_RATE = 1500000
+SPS = 2
+BITS_PER_SYMBOL = 2        # QPSK
+PACKET_LEN = 8             # bytes per packet from blocks_stream_to_tagged_stream_0
+CRC_LEN = 4                # digital_crc32_bb_0
+# Access code of header_format_default / correlate_access_code_bb_ts and its bit-error threshold.
+# GNU Radio takes the low bit of every character, so the trailing newline is a 64th, zero bit.
+ACCESS_CODE = '111111011011001110010110001000011010110011001010101011010100011\n'
+ACCESS_CODE_BITS = "".join(str(ord(c) & 1) for c in ACCESS_CODE)
+ACCESS_CODE_THRESHOLD = 2
+HEADER_BITS = len(ACCESS_CODE_BITS) + 2 * 16  # access code + two 16-bit length fields
+# correlate_access_code_bb_ts reads 12 bits of the length field, which also counts the CRC
+MAX_PACKET_LEN = 0x0FFF - CRC_LEN
+
+# Receiver loop parameters, matching crcreceiver
+AGC_RATE = 1e-4
+LOOP_BW = 0.0628
+LOOP_DAMPING = 0.707
+
+
+@dataclass(frozen=True)
+class FramingProfile:
+    """Preamble and detection sequence lengths used to frame a file for transmission."""
+    name: str
+    preamble_len: int
+    detect_len: int
+
+    @property
+    def preamble_byte(self):
+        return PREAMBLE_BYTE
+
+    @property
+    def detect_sequence(self):
+        return bytes([DETECT_BYTE]) * self.detect_len
+
+    @property
+    def guard_len(self):
+        return min(GUARD_LEN, self.preamble_len)
+
+    # Preamble tail followed by the detection sequence: the start of a payload
+    def opening_marker(self):
+        return bytes([PREAMBLE_BYTE]) * self.guard_len + self.detect_sequence
+
+    # Detection sequence followed by the preamble head: the end of a payload
+    def closing_marker(self):
+        return self.detect_sequence + bytes([PREAMBLE_BYTE]) * self.guard_len
+
+    # Bytes added around a payload by add_preamble
+    @property
+    def overhead(self):
+        return 2 * (self.preamble_len + self.detect_len)
+
+
+PROFILES = {
+    # appCRCTranceiver QPSK scripts
+    "crc_qpsk": FramingProfile("crc_qpsk", 200000, 5),
+    # stand-alone preamble/ scripts
+    "preamble": FramingProfile("preamble", 3000, 16),
+}
+DEFAULT_PROFILE = "crc_qpsk"
+
+
+# Samples needed by the receiver loops to settle, chained AGC -> FLL -> symbol sync -> Costas
+def settle_samples(sps=SPS, agc_rate=AGC_RATE, loop_bw=LOOP_BW, damping=LOOP_DAMPING):
+    """Estimates how many samples the receiver needs before it decodes reliably.
+
+    The AGC settles in about 1/rate samples. The second-order loops settle in
+    about 4/(damping * wn), with wn derived from the loop bandwidth the same way
+    GNU Radio's control_loop does. The FLL runs per sample; the symbol sync and
+    Costas loops run per symbol.
+    """
+    wn = loop_bw / (damping + 1.0 / (4.0 * damping))
+    loop_settle = 4.0 / (damping * wn)
+    return 1.0 / agc_rate + loop_settle + 2 * loop_settle * sps
+
+
+# Bytes sent on air for one packet of `packet_len` payload bytes
+def packet_on_air(packet_len=PACKET_LEN):
+    return packet_len + CRC_LEN + math.ceil(HEADER_BITS / 8)
+
+
+# Transmitted samples per byte of framed file, including packet header and CRC
+def samples_per_byte(sps=SPS, packet_len=PACKET_LEN):
+    return packet_on_air(packet_len) / packet_len * 8 / BITS_PER_SYMBOL * sps
+
+
+# Fraction of the airtime that carries payload
+def payload_efficiency(packet_len=PACKET_LEN):
+    return packet_len / packet_on_air(packet_len)
+
+
+# Payload bits per second at the given link settings, before preamble and packet losses
+def goodput(samp_rate=SAMP_RATE, sps=SPS, packet_len=PACKET_LEN):
+    return 8 * samp_rate / samples_per_byte(sps, packet_len)
+
+
+def check_packet_len(packet_len):
+    if not 1 <= packet_len <= MAX_PACKET_LEN:
+        raise ValueError(f"Packet length must be between 1 and {MAX_PACKET_LEN} bytes, got {packet_len}")
+    return packet_len
+
+
+# Airtime in seconds to send `nbytes` bytes of framed file
+def airtime(nbytes, samp_rate=SAMP_RATE, sps=SPS, packet_len=PACKET_LEN):
+    return nbytes * samples_per_byte(sps, packet_len) / samp_rate
+
+
+# Shortest preamble that still lets the receiver loops settle
+def minimal_profile(sps=SPS, packet_len=PACKET_LEN, margin=4.0, detect_len=5):
+    """Returns a profile whose preamble lasts `margin` times the loop settling time.
+
+    This only covers loop acquisition: the receiver must already be running when
+    the transmission starts.
+    """
+    preamble_len = math.ceil(margin * settle_samples(sps) / samples_per_byte(sps, packet_len))
+    return FramingProfile("minimal", preamble_len, detect_len)
+
+
+# Training preamble bytes in front of each burst, long enough for the receiver loops to settle
+def burst_preamble_len(sps=SPS, margin=2.0):
+    return math.ceil(margin * settle_samples(sps) / (8 / BITS_PER_SYMBOL * sps))
+
+
+# Look up a profile by name ("minimal" is computed for the given link settings)
+def get_profile(name=DEFAULT_PROFILE, sps=SPS, packet_len=PACKET_LEN):
+    if name == "minimal":
+        return minimal_profile(sps, packet_len)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown framing profile '{name}' (choose from: {', '.join(profile_names())})")
+    return PROFILES[name]
+
+
+def profile_names():
+    return list(PROFILES) + ["minimal"]
+
+
+class FrameTracker:
+    """Follows a received byte stream through preamble, payload and closing marker.
+
+    Bytes are fed in as they arrive. feed() returns the payload bytes it can
+    already vouch for; up to one marker length is held back in case it is the
+    start of the closing marker. Once the closing marker has been seen, `done`
+    is set and `overrun` is the number of bytes of the last chunk after it. At
+    the end of a stream that never closed, flush() returns the held-back bytes.
+    """
+
+    def __init__(self, profile):
+        self.opening = profile.opening_marker()
+        self.closing = profile.closing_marker()
+        self.state = "preamble"
+        self.overrun = 0
+        self._carry = b""
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+    def feed(self, data):
+        if self.done:
+            self.overrun += len(data)
+            return b""
+        buf = self._carry + bytes(data)
+        if self.state == "preamble":
+            head = buf.find(self.opening)
+            if head == -1:
+                self._carry = buf[-(len(self.opening) - 1):]
+                return b""
+            buf = buf[head + len(self.opening):]
+            self.state = "payload"
+        tail = buf.find(self.closing)
+        if tail == -1:
+            keep = min(len(buf), len(self.closing) - 1)
+            self._carry = buf[len(buf) - keep:]
+            return buf[:len(buf) - keep]
+        self.state = "done"
+        self.overrun = len(buf) - tail - len(self.closing)
+        self._carry = b""
+        return buf[:tail]
+
+    # The payload bytes still held back, for when the stream ends without a closing marker
+    def flush(self):
+        carry, self._carry = self._carry, b""
+        return carry if self.state == "payload" else b""
+
+
+# Human-readable comparison of a profile's framing airtime against a baseline profile
+def airtime_report(profile, baseline=None, samp_rate=SAMP_RATE, sps=SPS, packet_len=PACKET_LEN):
+    baseline = baseline or PROFILES[DEFAULT_PROFILE]
+    used = airtime(profile.overhead, samp_rate, sps, packet_len)
+    base = airtime(baseline.overhead, samp_rate, sps, packet_len)
+    return (
+        f"Profile '{profile.name}': preamble {profile.preamble_len} bytes, detect {profile.detect_len} bytes\n"
+        f"- Framing airtime per file: {used:.3f} s (baseline '{baseline.name}': {base:.3f} s)\n"
+        f"- Airtime saved per file: {base - used:.3f} s"
+    )
+
+
+# Table of payload efficiency and goodput for a list of packet lengths
+def packet_report(packet_lens, samp_rate=SAMP_RATE, sps=SPS):
+    lines = [f"{'packet':>7} {'on air':>7} {'efficiency':>10} {'goodput':>13} {'per MB':>8}"]
+    for packet_len in packet_lens:
+        check_packet_len(packet_len)
+        lines.append(
+            f"{packet_len:>7} {packet_on_air(packet_len):>7} {100 * payload_efficiency(packet_len):>9.1f}% "
+            f"{goodput(samp_rate, sps, packet_len) / 1e3:>8.1f} kb/s {airtime(1e6, samp_rate, sps, packet_len):>7.2f}s"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report preamble airtime for the framing profiles.")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol.")
+    parser.add_argument("--samp_rate", type=float, default=SAMP_RATE, help="Sample rate in samples/s.")
+    parser.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Payload bytes per packet.")
+    parser.add_argument("--packet_lens", type=int, nargs="+", default=[PACKET_LEN, 256, 512, 1024, 2048],
+                        help="Packet lengths to compare in the efficiency/goodput table.")
+    args = parser.parse_args()
+
+    print(f"Receiver loops settle in about {settle_samples(args.sps):.0f} samples")
+    for name in profile_names():
+        print(airtime_report(get_profile(name, args.sps, args.packet_len), samp_rate=args.samp_rate, sps=args.sps, packet_len=args.packet_len))
+    print(packet_report(args.packet_lens, args.samp_rate, args.sps))
@@ -0,0 +1,171 @@
+import argparse
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+from gnuradio import blocks, gr
+import pmt
+
+import sigmf_meta
+from crcchains import MULTIPLY_CONST, SampleIndexTagger, build_rx_chain, set_link_variables
+from framing import (BITS_PER_SYMBOL, CRC_LEN, PACKET_LEN, SPS, FrameTracker, get_profile,
+                     packet_on_air, profile_names, settle_samples)
+from qpsk_sim import HEADER_BITS, check_packets, find_packets
+
+# Samples each segment owns
+SEGMENT_SAMPLES = 1 << 22
+# Lead-in decoded ahead of each segment so the receiver loops have converged when it starts
+OVERLAP_FACTOR = 4
+# Samples between sample-index tags
+TAG_EVERY = 1024
+# Symbols the receive chain still holds when the recording ends
+PIPELINE_SYMBOLS = 128
+
+
+# Split [0, total) into owned spans with a lead-in before and a lead-out after each
+def plan_segments(total, segment_samples, lead_in, lead_out):
+    """Returns [(start, stop, own_start, own_stop), ...] in sample order.
+
+    Each segment is decoded over [start, stop) but keeps only the packets that
+    start inside [own_start, own_stop). The lead-in lets the loops converge and
+    the lead-out lets a packet starting at the end of the span finish.
+    """
+    segments = []
+    for own_start in range(0, total, segment_samples):
+        own_stop = min(own_start + segment_samples, total)
+        segments.append((max(0, own_start - lead_in), min(total, own_stop + lead_out), own_start, own_stop))
+    return segments
+
+
+# Map bit positions in a segment's decoded bits to sample indices in the recording
+def bits_to_samples(bit_pos, tag_offsets, tag_samples, start, sps=SPS):
+    """Interpolates between the sample-index tags that rode through the chain.
+
+    Outside the tagged range the nominal sps / 2 samples per bit is used.
+    """
+    slope = sps / BITS_PER_SYMBOL
+    bit_pos = np.asarray(bit_pos, dtype=np.float64)
+    if not len(tag_offsets):
+        return start + bit_pos * slope
+    pos = np.interp(bit_pos, tag_offsets, tag_samples)
+    before, after = bit_pos < tag_offsets[0], bit_pos > tag_offsets[-1]
+    pos[before] = tag_samples[0] - (tag_offsets[0] - bit_pos[before]) * slope
+    pos[after] = tag_samples[-1] + (bit_pos[after] - tag_offsets[-1]) * slope
+    return pos
+
+
+# Closest two sightings of one packet can be; half the shortest packet on air
+def duplicate_gap(sps=SPS):
+    return packet_on_air(1) * 8 / BITS_PER_SYMBOL * sps / 2
+
+
+# Run the crcreceiver chain over one segment and return the good packets it owns
+def decode_segment(path, segment, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, tag_every=TAG_EVERY):
+    """Returns ([(sample index, payload), ...], packets found, CRC failures).
+
+    The chain runs up to the hard-decision bits; the access code search and CRC
+    check are done on the bits so each packet's position is known. Ownership
+    reaches half a duplicate_gap() past both ends of the span: neighbouring
+    segments estimate a boundary packet's position a few samples apart, so it
+    is better kept by both (stitch() drops the copy) than by neither.
+    """
+    start, stop, own_start, own_stop = segment
+    tb = gr.top_block("Segment decoder", catch_exceptions=True)
+    set_link_variables(tb, sps, mult)
+    tb.blocks_file_source_0 = blocks.file_source(gr.sizeof_gr_complex*1, path, False, start, stop - start)
+    tb.sample_index_tagger_0 = SampleIndexTagger(start, tag_every)
+    rx_in, rx_out = build_rx_chain(tb, packet_len, bits_only=True)
+    tb.blocks_vector_sink_0 = blocks.vector_sink_b(1, (stop - start) * BITS_PER_SYMBOL // sps)
+    tb.connect((tb.blocks_file_source_0, 0), (tb.sample_index_tagger_0, 0))
+    tb.connect((tb.sample_index_tagger_0, 0), (rx_in, 0))
+    tb.connect((rx_out, 0), (tb.blocks_vector_sink_0, 0))
+    tb.run()
+
+    bits = np.frombuffer(bytes(tb.blocks_vector_sink_0.data()), dtype=np.uint8)
+    tags = [t for t in tb.blocks_vector_sink_0.tags() if pmt.symbol_to_string(t.key) == "rx_sample"]
+    tag_offsets = np.array([t.offset for t in tags], dtype=np.float64)
+    tag_samples = np.array([pmt.to_uint64(t.value) for t in tags], dtype=np.float64)
+
+    packets, _ = find_packets(bits, max_len=packet_len + CRC_LEN)
+    payloads = check_packets(bits, packets)
+    positions = bits_to_samples([p - HEADER_BITS for p, _ in packets], tag_offsets, tag_samples, start, sps)
+    margin = duplicate_gap(sps) / 2
+    owned = [(int(pos), payload) for pos, payload in zip(positions, payloads)
+             if payload is not None and own_start - margin <= pos < own_stop + margin]
+    return owned, len(packets), sum(p is None for p in payloads)
+
+
+# Merge the per-segment packets into one ordered list without duplicates
+def stitch(segment_packets, sps=SPS):
+    """Packets are ordered by their sample index. A packet equal to the one before
+    it and closer than duplicate_gap() is the same packet seen by two segments
+    (their position estimates differ by a few samples).
+    """
+    min_gap = duplicate_gap(sps)
+    merged = []
+    for pos, payload in sorted((p for packets in segment_packets for p in packets), key=lambda p: p[0]):
+        if merged and pos - merged[-1][0] < min_gap and payload == merged[-1][1]:
+            continue
+        merged.append((pos, payload))
+    return merged
+
+
+# Decode a whole recording in overlapping segments on a process pool
+def decode_file(path, output_path, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN,
+                segment_samples=SEGMENT_SAMPLES, overlap=None, workers=None, profile=None):
+    total = os.path.getsize(path) // gr.sizeof_gr_complex
+    overlap = int(OVERLAP_FACTOR * settle_samples(sps)) if overlap is None else overlap
+    lead_out = (packet_on_air(packet_len) * 8 // BITS_PER_SYMBOL + PIPELINE_SYMBOLS) * sps
+    segments = plan_segments(total, segment_samples, overlap, lead_out)
+    settings = dict(sps=sps, mult=mult, packet_len=packet_len)
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [decode_segment(path, s, **settings) for s in segments]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(decode_segment, path, s, **settings) for s in segments]
+            results = [f.result() for f in futures]
+    packets = stitch([owned for owned, _, _ in results], sps)
+    elapsed = time.perf_counter() - start
+
+    data = b"".join(payload for _, payload in packets)
+    if profile is not None:
+        # Keep only the payload between the detection sequences, as removePreamble.py does;
+        # without a closing marker the payload runs to the end of the recording
+        tracker = FrameTracker(profile)
+        data = tracker.feed(data) + tracker.flush()
+    with open(output_path, "wb") as f:
+        f.write(data)
+
+    found = sum(n for _, n, _ in results)
+    failed = sum(n for _, _, n in results)
+    print(f"Decoded {total} samples in {len(segments)} segments of {segment_samples} (+{overlap} lead-in) -> {output_path}")
+    print(f"- Packets: {len(packets)} kept, {found - failed - len(packets)} duplicates or outside their segment, "
+          f"{failed} failed CRC")
+    print(f"- {len(data)} bytes written")
+    print(f"- Took {elapsed:.3f} s ({total / max(elapsed, 1e-9) / 1e6:.2f} Msps)")
+    return packets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode a raw IQ recording in parallel, overlapping segments.")
+    parser.add_argument("--input_path", required=True, help="Raw complex64 recording (e.g. from crcreceiver --record).")
+    parser.add_argument("--output_path", required=True, help="Where to write the payloads of the packets, in order.")
+    parser.add_argument("--sps", type=int, help="Samples per symbol (default: from the .sigmf-meta file, else 2).")
+    parser.add_argument("--mult", type=float, help="Multiply constant (default: from the .sigmf-meta file, else 0.707).")
+    parser.add_argument("--packet_len", type=int, help="Payload bytes per packet (default: from the .sigmf-meta file, else 8).")
+    parser.add_argument("--segment_samples", type=int, default=SEGMENT_SAMPLES, help="Samples owned by each segment.")
+    parser.add_argument("--overlap", type=int, help="Lead-in samples decoded ahead of each segment (default: 4x the loop settling time).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (1 decodes in this process).")
+    parser.add_argument("--profile", choices=profile_names(), help="Also strip the preamble and detection sequences of this framing profile.")
+    args = parser.parse_args()
+
+    recorded = sigmf_meta.recorded_settings(sigmf_meta.read_meta(args.input_path))
+    sps = args.sps or recorded.get("sps", SPS)
+    mult = args.mult or recorded.get("Multiply_Const", MULTIPLY_CONST)
+    packet_len = args.packet_len or recorded.get("packet_len", PACKET_LEN)
+    profile = get_profile(args.profile, sps, packet_len) if args.profile else None
+    decode_file(args.input_path, args.output_path, sps, mult, packet_len, args.segment_samples, args.overlap,
+                args.workers, profile)
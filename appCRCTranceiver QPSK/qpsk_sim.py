@@ -0,0 +1,360 @@
+import argparse
+import time
+
+import numpy as np
+
+from correlator import find_all
+from crc_batch import check_rows, crc32_rows
+from framing import ACCESS_CODE_BITS, ACCESS_CODE_THRESHOLD, BITS_PER_SYMBOL, CRC_LEN, PACKET_LEN, SAMP_RATE, SPS, check_packet_len
+
+# Modulator settings, matching crctransmitter/crcreceiver
+EXCESS_BW = 0.35
+NFILTS = 32          # polyphase arms of the GNU Radio RRC; the simulator samples at ideal timing and needs only one
+RRC_SPAN = 11        # symbols covered by the RRC (11*sps*nfilts taps over nfilts arms)
+MULTIPLY_CONST = 0.707
+# constellation_rect points, indexed by symbol value (pre-diff code [0, 1, 2, 3])
+CONSTELLATION = np.array([0.707 + 0.707j, -0.707 + 0.707j, -0.707 - 0.707j, 0.707 - 0.707j], dtype=np.complex64)
+
+# The 64 access code bits as they go on air
+SYNC_WORD = int(ACCESS_CODE_BITS, 2).to_bytes(len(ACCESS_CODE_BITS) // 8, "big")
+SYNC_BITS = len(SYNC_WORD) * 8
+HEADER_BITS = SYNC_BITS + 2 * 16
+
+# Bytes of file modulated at a time and IQ samples demodulated at a time
+CHUNK_SIZE = 64 * 1024
+IQ_CHUNK = 1024 * 1024
+
+# Symbol index (after differential encoding) of each quadrant, indexed by (I < 0) + 2 * (Q < 0)
+_QUADRANT = np.array([0, 1, 3, 2], dtype=np.uint8)
+_SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+
+
+# Root raised cosine taps spanning `span` symbols, normalised to unit energy
+def rrc_taps(sps=SPS, excess_bw=EXCESS_BW, span=RRC_SPAN):
+    """Same pulse as firdes.root_raised_cosine, sampled at `sps` samples per symbol.
+
+    An odd tap count keeps the peak on a sample, so the matched filter output is
+    sampled exactly at the symbol instants.
+    """
+    ntaps = 2 * (span * sps // 2) + 1
+    t = (np.arange(ntaps) - ntaps // 2) / sps
+    a = excess_bw
+    with np.errstate(divide="ignore", invalid="ignore"):
+        taps = (np.sin(np.pi * t * (1 - a)) + 4 * a * t * np.cos(np.pi * t * (1 + a))) / (
+            np.pi * t * (1 - (4 * a * t) ** 2))
+    taps[t == 0] = 1 - a + 4 * a / np.pi
+    edge = np.isclose(np.abs(t), 1 / (4 * a))
+    taps[edge] = a / np.sqrt(2) * ((1 + 2 / np.pi) * np.sin(np.pi / (4 * a)) + (1 - 2 / np.pi) * np.cos(np.pi / (4 * a)))
+    return (taps / np.sqrt(np.sum(taps ** 2))).astype(np.float32)
+
+
+# Header bytes (sync word and the two copies of the packet length) of header_format_default
+def packet_header(length):
+    return SYNC_WORD + length.to_bytes(2, "big") * 2
+
+
+# Energy-per-bit to noise density ratio (dB) to complex noise variance per sample
+def noise_variance(ebn0_db, sps=SPS, mult=MULTIPLY_CONST):
+    es = float(np.mean(np.abs(CONSTELLATION) ** 2)) * mult ** 2 * sps
+    return es / BITS_PER_SYMBOL / 10 ** (ebn0_db / 10)
+
+
+# Add white Gaussian noise for the given Eb/N0 to transmitted samples
+def awgn(iq, ebn0_db, sps=SPS, mult=MULTIPLY_CONST, rng=None):
+    if ebn0_db is None:
+        return iq
+    rng = rng or np.random.default_rng()
+    sigma = np.float32(np.sqrt(noise_variance(ebn0_db, sps, mult) / 2))
+    noise = rng.standard_normal(2 * len(iq), dtype=np.float32) * sigma
+    return iq + noise.view(np.complex64)
+
+
+class Modulator:
+    """Packetizer, CRC32, header, differential QPSK and RRC pulse shaping of crctransmitter.
+
+    Bytes are sent in packets of `packet_len`; a short final packet is sent as is
+    when the modulator is flushed.
+    """
+
+    def __init__(self, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, excess_bw=EXCESS_BW, differential=True):
+        self.sps = sps
+        self.mult = mult
+        self.packet_len = check_packet_len(packet_len)
+        self.differential = differential
+        taps = rrc_taps(sps, excess_bw) * np.float32(np.sqrt(sps))
+        # Polyphase bank: output phase p of every symbol is the symbols filtered by taps[p::sps]
+        self.width = -(-len(taps) // sps)
+        self.bank = np.zeros((sps, self.width), dtype=np.float32)
+        for p in range(sps):
+            phase = taps[p::sps]
+            self.bank[p, :len(phase)] = phase
+        self.history = np.zeros(self.width - 1, dtype=np.complex64)
+        self.state = 0
+        self.pending = b""
+        self.packets = 0
+        self.samples = 0
+
+    # Header, payload and CRC32 bytes of equal-length packets (one per row), as they go on air
+    @staticmethod
+    def frames(rows):
+        length = rows.shape[1] + CRC_LEN
+        crc = crc32_rows(rows).astype("<u4").view(np.uint8).reshape(-1, CRC_LEN)
+        header = np.frombuffer(packet_header(length), dtype=np.uint8)
+        return np.concatenate((np.broadcast_to(header, (len(rows), len(header))), rows, crc), axis=1)
+
+    # Frame equal-length packets into symbol values
+    def _symbols(self, rows):
+        self.packets += len(rows)
+        return ((self.frames(rows)[..., None] >> _SHIFTS) & 3).reshape(-1)
+
+    # Differential encoding, constellation mapping, pulse shaping and scaling
+    def _shape(self, symbols):
+        if not self.differential:
+            return self._interpolate(CONSTELLATION[symbols])
+        coded = np.cumsum(symbols, dtype=np.uint8) + np.uint8(self.state)
+        coded &= 3
+        if len(coded):
+            self.state = int(coded[-1])
+        return self._interpolate(CONSTELLATION[coded])
+
+    def _interpolate(self, points):
+        buf = np.concatenate((self.history, points))
+        self.history = buf[len(buf) - len(self.history):]
+        out = np.empty((len(points), self.sps), dtype=np.complex64)
+        for p in range(self.sps):
+            out[:, p] = np.convolve(buf, self.bank[p], "valid")
+        out = out.reshape(-1) * np.float32(self.mult)
+        self.samples += len(out)
+        return out
+
+    # Modulate the whole packets available after appending `data`
+    def process(self, data):
+        data = self.pending + bytes(data)
+        full = len(data) // self.packet_len * self.packet_len
+        self.pending = data[full:]
+        rows = np.frombuffer(data, dtype=np.uint8, count=full).reshape(-1, self.packet_len)
+        return self._shape(self._symbols(rows))
+
+    # Modulate bytes as they are, without packet framing (the training preamble of burst mode)
+    def raw(self, data):
+        symbols = ((np.frombuffer(bytes(data), dtype=np.uint8)[:, None] >> _SHIFTS) & 3).reshape(-1)
+        return self._shape(symbols)
+
+    # Send the short final packet, if any, and let the filter drain
+    def flush(self):
+        out = []
+        if self.pending:
+            rows = np.frombuffer(self.pending, dtype=np.uint8).reshape(1, -1)
+            self.pending = b""
+            out.append(self._shape(self._symbols(rows)))
+        out.append(self._interpolate(np.zeros(self.width - 1, dtype=np.complex64)))
+        return np.concatenate(out)
+
+
+# Packets in a hard-decision bit stream, as correlate_access_code_bb_ts finds them
+def find_packets(bits, threshold=ACCESS_CODE_THRESHOLD, max_len=PACKET_LEN + CRC_LEN):
+    """Returns ([(payload bit offset, length), ...], keep).
+
+    `length` counts the payload and its CRC in bytes. `keep` is the first bit
+    that may still belong to a packet cut short by the end of `bits`.
+    """
+    n = len(bits)
+    offsets, _ = find_all(np.packbits(bits), SYNC_WORD, threshold)
+    offsets = offsets[offsets + HEADER_BITS <= n]
+    lengths = np.zeros((0, 2), dtype=np.int64)
+    if len(offsets):
+        fields = np.packbits(bits[offsets[:, None] + np.arange(SYNC_BITS, HEADER_BITS)], axis=1)
+        lengths = (fields[:, 0::2].astype(np.int64) << 8) | fields[:, 1::2]
+    pos, keep, packets = 0, None, []
+    for offset, (length, copy) in zip(offsets.tolist(), lengths.tolist()):
+        if offset < pos:
+            continue
+        if length != copy or not CRC_LEN < length <= max_len:
+            continue
+        end = offset + HEADER_BITS + 8 * length
+        if end > n:
+            keep = offset
+            break
+        packets.append((offset + HEADER_BITS, length))
+        pos = end
+    if keep is None:
+        keep = max(pos, n - HEADER_BITS + 1, 0)
+    return packets, keep
+
+
+# Repack packet bits into bytes and check the CRC32: the payload of every packet, or None where it failed
+def check_packets(bits, packets):
+    payloads = [None] * len(packets)
+    for length in {length for _, length in packets}:
+        index = [i for i, (_, l) in enumerate(packets) if l == length]
+        starts = np.array([packets[i][0] for i in index])
+        rows = np.packbits(bits[starts[:, None] + np.arange(8 * length)], axis=1)
+        for i, row, ok in zip(index, rows, check_rows(rows)):
+            if ok:
+                payloads[i] = row[:-CRC_LEN].tobytes()
+    return payloads
+
+
+class Demodulator:
+    """Matched filter, decisions, differential decoding, access code search and CRC check of crcreceiver.
+
+    Timing and carrier are taken as ideal, so the symbol sync, equalizer and Costas
+    loop of the flowgraph are not modelled. Packets failing the CRC are dropped, as
+    digital.crc32_bb does, and counted.
+    """
+
+    def __init__(self, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, excess_bw=EXCESS_BW,
+                 threshold=ACCESS_CODE_THRESHOLD, differential=True):
+        self.sps = sps
+        self.mult = mult
+        self.differential = differential
+        self.max_len = packet_len + CRC_LEN
+        self.threshold = threshold
+        self.taps = rrc_taps(sps, excess_bw)[::-1].copy()
+        self.samples_buf = np.zeros(0, dtype=np.complex64)
+        # Absolute index of samples_buf[0] and of the next matched filter output to sample
+        self.base = 0
+        self.next = len(self.taps) - 1
+        self.state = 0
+        self.bits = np.zeros(0, dtype=np.uint8)
+        self.samples = 0
+        self.packets = 0
+        self.crc_failures = 0
+        self.payload_bytes = 0
+
+    # Matched filter sampled at the symbol instants, then quadrant decisions
+    def _decide(self, iq):
+        buf = np.concatenate((self.samples_buf, iq))
+        ntaps = len(self.taps)
+        first = self.next - (ntaps - 1) - self.base
+        count = max(0, (len(buf) - ntaps - first) // self.sps + 1)
+        if count:
+            windows = np.lib.stride_tricks.sliding_window_view(buf, ntaps)[first:first + count * self.sps:self.sps]
+            z = windows @ self.taps
+            self.next += count * self.sps
+        else:
+            z = np.zeros(0, dtype=np.complex64)
+        keep = self.next - (ntaps - 1) - self.base
+        self.samples_buf = buf[keep:]
+        self.base += keep
+        return _QUADRANT[(z.real < 0).astype(np.uint8) + 2 * (z.imag < 0).astype(np.uint8)]
+
+    # Differential decoding and 2-bit unpacking
+    def _bits(self, coded):
+        symbols = coded
+        if self.differential:
+            prev = np.concatenate(([self.state], coded[:-1])).astype(np.uint8)
+            if len(coded):
+                self.state = int(coded[-1])
+            symbols = (coded - prev) & 3
+        return np.stack((symbols >> 1, symbols & 1), axis=1).reshape(-1)
+
+    # Find packets in a bit stream from demap() and return the payload bytes that pass the CRC
+    def deframe(self, bits):
+        """Bits of a packet cut short by the end of `bits` are kept for the next call."""
+        bits = np.concatenate((self.bits, bits))
+        packets, keep = find_packets(bits, self.threshold, self.max_len)
+        self.bits = bits[keep:]
+        return self._check(bits, packets)
+
+    # Check the CRC32 of the packets found and return the good payloads in order
+    def _check(self, bits, packets):
+        payloads = check_packets(bits, packets)
+        self.crc_failures += sum(p is None for p in payloads)
+        self.packets += len(packets)
+        data = b"".join(p for p in payloads if p is not None)
+        self.payload_bytes += len(data)
+        return data
+
+    # Received samples to hard-decision bits, before any packet search
+    def demap(self, iq):
+        self.samples += len(iq)
+        iq = np.asarray(iq, dtype=np.complex64) * np.float32(1 / self.mult)
+        return self._bits(self._decide(iq))
+
+    # Demodulate a block of received samples and return the payload bytes of the packets completed in it
+    def process(self, iq):
+        return self.deframe(self.demap(iq))
+
+    # Bits of the last symbols still inside the matched filter
+    def drain(self):
+        bits = self.demap(np.zeros(len(self.taps), dtype=np.complex64))
+        self.samples -= len(self.taps)
+        return bits
+
+    # Push the last symbols out of the matched filter and finish their packets
+    def flush(self):
+        return self.deframe(self.drain())
+
+
+# Modulate a byte string in one go
+def modulate(data, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN):
+    mod = Modulator(sps, mult, packet_len)
+    return np.concatenate((mod.process(data), mod.flush()))
+
+
+# Demodulate received samples in one go; returns (payload, demodulator) so the counters can be read
+def demodulate(iq, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN):
+    demod = Demodulator(sps, mult, packet_len)
+    data = demod.process(iq) + demod.flush()
+    return data, demod
+
+
+# Modulate a file into complex64 IQ samples, the format of a GNU Radio file sink
+def transmit_file(input_path, iq_path, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, chunk_size=CHUNK_SIZE):
+    mod = Modulator(sps, mult, packet_len)
+    nbytes = 0
+    start = time.perf_counter()
+    with open(input_path, "rb") as src, open(iq_path, "wb") as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            nbytes += len(chunk)
+            mod.process(chunk).tofile(dst)
+        mod.flush().tofile(dst)
+    elapsed = time.perf_counter() - start
+    print(f"Modulated {nbytes} bytes in {mod.packets} packets into {mod.samples} samples -> {iq_path}")
+    print(f"- Airtime at {SAMP_RATE / 1e6:g} Msps: {mod.samples / SAMP_RATE:.3f} s")
+    print(f"- Took {elapsed:.3f} s ({mod.samples / max(elapsed, 1e-9) / 1e6:.2f} Msps)")
+    return {"bytes": nbytes, "packets": mod.packets, "samples": mod.samples, "seconds": elapsed}
+
+
+# Pass IQ samples through an AWGN channel and demodulate them into a file
+def receive_file(iq_path, output_path, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN, ebn0_db=None,
+                 seed=None, chunk_samples=IQ_CHUNK):
+    demod = Demodulator(sps, mult, packet_len)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    with open(iq_path, "rb") as src, open(output_path, "wb") as dst:
+        while True:
+            iq = np.fromfile(src, dtype=np.complex64, count=chunk_samples)
+            if not len(iq):
+                break
+            dst.write(demod.process(awgn(iq, ebn0_db, sps, mult, rng)))
+        dst.write(demod.flush())
+    elapsed = time.perf_counter() - start
+    channel = "noise-free" if ebn0_db is None else f"Eb/N0 {ebn0_db:g} dB"
+    print(f"Demodulated {demod.samples} samples ({channel}) -> {output_path}")
+    print(f"- Packets: {demod.packets} found, {demod.crc_failures} failed CRC, {demod.payload_bytes} payload bytes kept")
+    print(f"- Took {elapsed:.3f} s ({demod.samples / max(elapsed, 1e-9) / 1e6:.2f} Msps)")
+    return {"samples": demod.samples, "packets": demod.packets, "crc_failures": demod.crc_failures,
+            "bytes": demod.payload_bytes, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the CRC QPSK transmitter and receiver in NumPy.")
+    parser.add_argument("--input_path", help="File to transmit (skip to only receive).")
+    parser.add_argument("--iq_path", required=True, help="IQ samples written by TX and read by RX (complex64).")
+    parser.add_argument("--output_path", help="Where to write the received payload (skip to only transmit).")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol.")
+    parser.add_argument("--mult", type=float, default=MULTIPLY_CONST, help="Multiply constant.")
+    parser.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Payload bytes per packet.")
+    parser.add_argument("--ebn0", type=float, default=None, help="Eb/N0 of the AWGN channel in dB (default: no noise).")
+    parser.add_argument("--seed", type=int, default=None, help="Noise seed.")
+    args = parser.parse_args()
+
+    if args.input_path:
+        transmit_file(args.input_path, args.iq_path, args.sps, args.mult, args.packet_len)
+    if args.output_path:
+        receive_file(args.iq_path, args.output_path, args.sps, args.mult, args.packet_len, args.ebn0, args.seed)
@@ -1,44 +1,175 @@
 import os
+import mmap
 import argparse
 
-# Function to remove both front and back preambles and detection sequences from a file
-def remove_preamble(file_path, output_path):
-    """Removes preambles and detection sequences from the input file and writes the cleaned content to a new file."""
-    # Define the detection sequence and preamble
-    detect_sequence = bytes([0b00110011]) * 5  # Detection sequence (16 bytes long)
-    preamble = bytes([0b10101010]) * 100000       # Preamble sequence
+from framing import DEFAULT_PROFILE, PACKET_LEN, SPS, get_profile, profile_names
 
-    # Check if the input file exists
-    if not os.path.exists(file_path):
-        print(f"Error: File '{file_path}' does not exist.")
-        exit(1)
+# Size of the blocks copied from the capture to the output file
+CHUNK_SIZE = 1024 * 1024
 
-    # Read the input file content
-    with open(file_path, 'rb') as file:
-        content = file.read()
+# Copy the byte range [start, end) of a buffer to a file in bounded blocks
+def _copy_span(buffer, start, end, output_file, chunk_size=CHUNK_SIZE):
+    view = memoryview(buffer)
+    try:
+        for offset in range(start, end, chunk_size):
+            output_file.write(view[offset:min(offset + chunk_size, end)])
+    finally:
+        view.release()
 
-    # Remove the front detection sequence and preamble
+# Locate the payload with exact byte searches and copy it to the output
+def _remove_preamble_exact(content, detect_sequence, output_file, chunk_size):
+    # Locate the front detection sequence and preamble
+    start = 0
     start_index = content.find(detect_sequence)
     if start_index != -1:
-        content = content[start_index + len(detect_sequence):]
+        start = start_index + len(detect_sequence)
 
-    # Remove the back detection sequence and preamble
-    end_index = content.rfind(detect_sequence)
+    # Locate the back detection sequence and preamble
+    end = len(content)
+    end_index = content.rfind(detect_sequence, start)
     if end_index != -1:
-        content = content[:end_index]
+        end = end_index
 
     # Write the cleaned content to the output file
-    with open(output_path, 'wb') as output_file:
-        output_file.write(content)
+    _copy_span(content, start, end, output_file, chunk_size)
+
+# Locate the payload with the bit-level correlator and copy it, realigned, to the output
+def _remove_preamble_tolerant(content, profile, max_bit_errors, output_file, chunk_size):
+    # NumPy is only needed for the bit-error tolerant search
+    from correlator import find_first, find_last, iter_bit_span
+
+    # Correlate on the frame edges (preamble tail + detection sequence and vice versa)
+    # so the longer pattern keeps false matches in noise negligible
+    opening = profile.opening_marker()
+    closing = profile.closing_marker()
+
+    start_bit = 0
+    head = find_first(content, opening, max_bit_errors)
+    if head is not None:
+        start_bit = head[0] + len(opening) * 8
+        print(f"Front detection sequence found at bit {head[0] + profile.guard_len * 8} ({head[1]} bit errors)")
+
+    end_bit = len(content) * 8
+    tail = find_last(content, closing, max_bit_errors, start_bit)
+    if tail is not None:
+        end_bit = tail[0]
+        print(f"Back detection sequence found at bit {tail[0]} ({tail[1]} bit errors)")
+
+    for block in iter_bit_span(content, start_bit, end_bit, chunk_size):
+        output_file.write(block)
+
+# Function to remove both front and back preambles and detection sequences from a file
+def remove_preamble(file_path, output_path, chunk_size=CHUNK_SIZE, max_bit_errors=None, profile=None):
+    """Removes preambles and detection sequences from the input file and writes the cleaned content to a new file.
+
+    The capture is memory-mapped and searched in place: forward from the head for
+    the first detection sequence and backward from the tail for the last one. Only
+    the payload between them is copied to the output.
+
+    With `max_bit_errors` set, the frame edges are found with a bit-level correlator
+    that accepts up to that many flipped bits at any bit offset, and a payload that
+    is not byte-aligned in the capture is shifted back onto byte boundaries.
+    """
+    # Define the detection sequence and preamble
+    profile = profile or get_profile(DEFAULT_PROFILE)
+    detect_sequence = profile.detect_sequence  # Detection sequence
+
+    # Check if the input file exists
+    if not os.path.exists(file_path):
+        print(f"Error: File '{file_path}' does not exist.")
+        exit(1)
+
+    with open(file_path, 'rb') as file, open(output_path, 'wb') as output_file:
+        # An empty capture cannot be mapped and has no payload
+        if os.fstat(file.fileno()).st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                if max_bit_errors is None:
+                    _remove_preamble_exact(content, detect_sequence, output_file, chunk_size)
+                else:
+                    _remove_preamble_tolerant(content, profile, max_bit_errors, output_file, chunk_size)
     
     print(f"Preambles removed and cleaned content saved to: {output_path}")
 
+# Scan a capture for every preamble/detect/payload/detect/preamble frame
+def find_bursts(content, profile):
+    """Returns an index of (start, end, complete) payload offsets for every burst in the content.
+
+    A burst opens at preamble bytes followed by the detection sequence and closes at
+    the detection sequence followed by preamble bytes. The scan runs once from head
+    to tail. A burst cut off by the end of the capture (or whose closing edge was
+    lost) ends at its last detection sequence, or at the next burst, and is marked
+    incomplete.
+    """
+    detect_sequence = profile.detect_sequence
+    opening = profile.opening_marker()
+    closing = profile.closing_marker()
+    bursts = []
+    pos = 0
+    while True:
+        head = content.find(opening, pos)
+        if head == -1:
+            break
+        start = head + len(opening)
+
+        # Never let a burst run into the next one
+        next_head = content.find(opening, start)
+        limit = len(content) if next_head == -1 else next_head + len(opening)
+
+        end = content.find(closing, start, limit)
+        complete = end != -1
+        if not complete:
+            end = content.rfind(detect_sequence, start, limit)
+            if end == -1:
+                end = len(content) if next_head == -1 else next_head
+        bursts.append((start, end, complete))
+        pos = end if next_head == -1 else max(end, next_head)
+    return bursts
+
+# Function to write every framed burst in a capture to its own output file
+def extract_bursts(file_path, output_path, chunk_size=CHUNK_SIZE, profile=None):
+    """Writes the payload of every burst in the input file to numbered output files.
+
+    The files are named after `output_path` with a burst number added before the
+    extension (rx.jpg -> rx_000.jpg, rx_001.jpg, ...). Returns the list of
+    (output file, start, end, complete) entries.
+    """
+    profile = profile or get_profile(DEFAULT_PROFILE)
+
+    if not os.path.exists(file_path):
+        print(f"Error: File '{file_path}' does not exist.")
+        exit(1)
+
+    root, ext = os.path.splitext(output_path)
+    written = []
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            print("No bursts found in the capture.")
+            return written
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            for number, (start, end, complete) in enumerate(find_bursts(content, profile)):
+                burst_path = f"{root}_{number:03d}{ext}"
+                with open(burst_path, 'wb') as output_file:
+                    _copy_span(content, start, end, output_file, chunk_size)
+                written.append((burst_path, start, end, complete))
+                status = "" if complete else " (incomplete)"
+                print(f"Burst {number}: bytes {start}-{end} ({end - start} bytes){status} saved to: {burst_path}")
+
+    if not written:
+        print("No bursts found in the capture.")
+    return written
+
 # Main script
 if __name__ == "__main__":
     # Set up argument parser
     parser = argparse.ArgumentParser(description="Remove preambles and detection sequences from a file.")
     parser.add_argument("--input_path_rx", required=True, help="Path to the input file with preambles.")
     parser.add_argument("--output_path", required=True, help="Path to save the cleaned content.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, choices=profile_names(), help="Framing profile used by the transmitter.")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol of the transmitter; sizes the 'minimal' preamble.")
+    parser.add_argument("--packet_len", "--packet-len", dest="packet_len", type=int, default=PACKET_LEN, help="Payload bytes per flowgraph packet; sizes the 'minimal' preamble.")
+    parser.add_argument("--max_bit_errors", type=int, default=None, help="Tolerate up to this many bit errors and any bit offset when locating the detection sequences.")
+    parser.add_argument("--all_bursts", action="store_true", help="Write every burst in the capture to its own numbered output file.")
     
     # Parse the arguments
     args = parser.parse_args()
@@ -48,6 +179,11 @@ if __name__ == "__main__":
     output_path = args.output_path
     
     # Remove preamble and save cleaned content
-    print("Removing preamble from the file...")
-    remove_preamble(input_path_rx, output_path)
+    profile = get_profile(args.profile, args.sps, args.packet_len)
+    if args.all_bursts:
+        print("Extracting all bursts from the file...")
+        extract_bursts(input_path_rx, output_path, profile=profile)
+    else:
+        print("Removing preamble from the file...")
+        remove_preamble(input_path_rx, output_path, max_bit_errors=args.max_bit_errors, profile=profile)
     print("Process completed successfully.")
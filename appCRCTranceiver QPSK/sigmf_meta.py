@@ -0,0 +1,66 @@
+import datetime
+import json
+import os
+
+SIGMF_VERSION = "1.0.0"
+# Samples as written by a gr_complex file sink
+DATATYPE = "cf32_le"
+# Namespace for the link settings a recording was made with
+NAMESPACE = "crc_qpsk"
+
+
+# Metadata file that belongs to a recording: capture.sigmf-data -> capture.sigmf-meta
+def meta_path(data_path):
+    return os.path.splitext(data_path)[0] + ".sigmf-meta"
+
+
+# Write SigMF-style metadata next to a raw IQ recording
+def write_meta(data_path, samp_rate, center_freq=None, gain=None, hw=None, **settings):
+    """Writes the .sigmf-meta file for `data_path` and returns its path.
+
+    `settings` (sps, packet_len, ...) are stored under the crc_qpsk namespace
+    so a replay can check it decodes with the settings the capture was made with.
+    """
+    capture = {
+        "core:sample_start": 0,
+        "core:datetime": datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z"),
+    }
+    if center_freq is not None:
+        capture["core:frequency"] = center_freq
+    if gain is not None:
+        capture[f"{NAMESPACE}:gain"] = gain
+    meta = {
+        "global": {
+            "core:datatype": DATATYPE,
+            "core:sample_rate": samp_rate,
+            "core:version": SIGMF_VERSION,
+            "core:recorder": "crcreceiver",
+            **({"core:hw": hw} if hw else {}),
+            **{f"{NAMESPACE}:{k}": v for k, v in settings.items()},
+        },
+        "captures": [capture],
+        "annotations": [],
+    }
+    path = meta_path(data_path)
+    with open(path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return path
+
+
+# Metadata of a recording, or None when it has no .sigmf-meta file
+def read_meta(data_path):
+    path = meta_path(data_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# Link settings stored with a recording ({} without metadata)
+def recorded_settings(meta):
+    if not meta:
+        return {}
+    prefix = f"{NAMESPACE}:"
+    settings = {k[len(prefix):]: v for k, v in meta["global"].items() if k.startswith(prefix)}
+    settings["samp_rate"] = meta["global"].get("core:sample_rate")
+    return settings
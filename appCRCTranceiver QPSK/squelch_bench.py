@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from gnuradio import blocks, gr
+
+from crcchains import build_rx_chain, set_link_variables
+from framing import PACKET_LEN, SAMP_RATE, SPS
+from qpsk_sim import MULTIPLY_CONST, awgn, modulate, noise_variance
+
+DUTY_CYCLES = [1.0, 0.5, 0.2, 0.1, 0.02]
+# Packets sent back to back in every burst
+BURST_PACKETS = 500
+
+
+# Bursts of random packets spread over `seconds` of noise so they fill `duty` of the air time
+def make_capture(duty, seconds, ebn0_db, rng, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN,
+                 burst_packets=BURST_PACKETS, samp_rate=SAMP_RATE):
+    """Returns (samples, payload bytes sent). The air between bursts is noise only."""
+    def burst():
+        return modulate(rng.integers(0, 256, burst_packets * packet_len, dtype=np.uint8).tobytes(), sps, mult, packet_len)
+
+    first = burst()
+    period = int(len(first) / duty)
+    bursts = max(1, int(seconds * samp_rate) // period)
+    iq = np.zeros(bursts * period, dtype=np.complex64)
+    for k in range(bursts):
+        samples = first if k == 0 else burst()
+        iq[(k + 1) * period - len(samples):(k + 1) * period] = samples
+    return awgn(iq, ebn0_db, sps, mult, rng), bursts * burst_packets * packet_len
+
+
+# Squelch level halfway (in dB) between the noise and the signal after Multiply_Const is undone
+def default_squelch_db(ebn0_db, sps=SPS, mult=MULTIPLY_CONST):
+    return 10 * np.log10(noise_variance(ebn0_db, sps, mult) / mult ** 2) / 2
+
+
+# Run the receive chain over a recording, unthrottled; returns (wall s, CPU s, bytes received, samples gated through)
+def run_receiver(iq_path, squelch_db=None, sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN):
+    tb = gr.top_block("Squelch benchmark", catch_exceptions=True)
+    set_link_variables(tb, sps, mult)
+    tb.blocks_file_source_0 = blocks.file_source(gr.sizeof_gr_complex*1, iq_path, False, 0, 0)
+    rx_in, rx_out = build_rx_chain(tb, packet_len, squelch_db=squelch_db)
+    tb.blocks_null_sink_0 = blocks.null_sink(gr.sizeof_char*1)
+    tb.connect((tb.blocks_file_source_0, 0), (rx_in, 0))
+    tb.connect((rx_out, 0), (tb.blocks_null_sink_0, 0))
+    wall, cpu = time.perf_counter(), time.process_time()
+    tb.run()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    gated = tb.energy_gate_0.passed if squelch_db is not None else tb.blocks_file_source_0.nitems_written(0)
+    return wall, cpu, tb.blocks_null_sink_0.nitems_read(0), gated
+
+
+# Compare CPU time with and without the squelch over a range of duty cycles
+def run_bench(duty_cycles, seconds, ebn0_db, squelch_db=None, seed=None, sps=SPS, mult=MULTIPLY_CONST,
+              packet_len=PACKET_LEN):
+    squelch_db = default_squelch_db(ebn0_db, sps, mult) if squelch_db is None else squelch_db
+    rng = np.random.default_rng(seed)
+    print(f"Eb/N0 {ebn0_db} dB, squelch at {squelch_db:.1f} dB, {seconds} s of air per duty cycle")
+    print(f"{'duty':>6} {'CPU off':>9} {'CPU on':>9} {'saved':>7} {'Msps on':>8} {'gated':>7} {'rx off':>7} {'rx on':>7}")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        iq_path = os.path.join(tmp, "capture.cf32")
+        for duty in duty_cycles:
+            iq, sent = make_capture(duty, seconds, ebn0_db, rng, sps, mult, packet_len)
+            iq.tofile(iq_path)
+            _, cpu_off, rx_off, _ = run_receiver(iq_path, None, sps, mult, packet_len)
+            wall_on, cpu_on, rx_on, gated = run_receiver(iq_path, squelch_db, sps, mult, packet_len)
+            rows.append((duty, cpu_off, cpu_on, rx_off / sent, rx_on / sent))
+            print(f"{duty:>6.0%} {cpu_off:>8.2f}s {cpu_on:>8.2f}s {1 - cpu_on / cpu_off:>7.0%} "
+                  f"{len(iq) / wall_on / 1e6:>8.2f} {gated / len(iq):>7.0%} {rx_off / sent:>7.1%} {rx_on / sent:>7.1%}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU time of the receive chain with and without the energy-detect squelch.")
+    parser.add_argument("--duty_cycles", type=float, nargs="+", default=DUTY_CYCLES, help="Fractions of air time carrying bursts.")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Seconds of air (at 1.5 Msps) per duty cycle.")
+    parser.add_argument("--ebn0_db", type=float, default=12.0, help="Eb/N0 of the bursts; sets the noise floor.")
+    parser.add_argument("--squelch_db", type=float, help="Squelch level in dB (default: halfway between noise and signal).")
+    parser.add_argument("--sps", type=int, default=SPS, help="Samples per symbol.")
+    parser.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Payload bytes per packet.")
+    parser.add_argument("--seed", type=int, help="Seed of the random data and noise.")
+    args = parser.parse_args()
+    run_bench(args.duty_cycles, args.seconds, args.ebn0_db, args.squelch_db, args.seed, args.sps,
+              packet_len=args.packet_len)
@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from acquisition import (PULL_IN_CFO, PULL_IN_TIMING, WINDOW_SYMBOLS, correct, delay, detect, estimate, reference,
+                         self_test)
+from framing import BITS_PER_SYMBOL, PREAMBLE_BYTE
+from qpsk_sim import Modulator, awgn
+
+
+def preamble(sps):
+    return Modulator(sps).raw(bytes([PREAMBLE_BYTE]) * (WINDOW_SYMBOLS * BITS_PER_SYMBOL // 8))
+
+
+def channel(iq, cfo, lag, phase):
+    t = np.arange(len(iq))
+    return (delay(iq, lag) * np.exp(1j * (2 * np.pi * cfo * t + phase))).astype(np.complex64)
+
+
+def test_detect():
+    rng = np.random.default_rng(0)
+    noise = awgn(np.zeros(WINDOW_SYMBOLS * 2, dtype=np.complex64), 0.0, rng=rng)
+    assert detect(preamble(2)) > 0.9
+    assert detect(noise) < 0.3
+
+
+@pytest.mark.parametrize("sps", [2, 4])
+@pytest.mark.parametrize("cfo, lag, phase", [(0.0, 0.0, 0.0), (0.01, 0.3, 1.0), (-0.02, 1.7, -2.5)])
+def test_estimate(sps, cfo, lag, phase):
+    cfo, lag = cfo / sps, lag * sps / 2
+    ref = reference(sps)
+    acq = estimate(channel(preamble(sps), cfo, lag, phase), sps)
+    assert abs(acq.cfo - cfo) < PULL_IN_CFO / sps
+    assert abs((acq.timing - ref.timing - lag + sps / 2) % sps - sps / 2) < PULL_IN_TIMING * sps
+    assert acq.purity > 0.9
+
+
+def test_correct_undoes_frequency_offset():
+    sps = 2
+    rx = channel(preamble(sps), 0.015, 0.6, 0.8)
+    fixed = correct(rx, estimate(rx, sps), sps)
+    assert estimate(fixed, sps).cfo == pytest.approx(0.0, abs=1e-4)
+
+
+def test_self_test_within_pull_in():
+    assert self_test(trials=10, ebn0_db=12.0, seed=1)
@@ -0,0 +1,73 @@
+import os
+import random
+
+import pytest
+
+pytest.importorskip("Cryptodome")
+
+from aes_decryptor import PacketDecryptor, decrypt_bytes, decrypt_file
+from aes_encryptor import (PACKET_HEADER, PACKET_LAST, PACKET_TAG_LEN, encrypt_bytes, encrypt_file,
+                           generate_key, packet_payload_len)
+
+
+def payload(n, seed=0):
+    return random.Random(seed).randbytes(n)
+
+
+@pytest.mark.parametrize("mode", ["cbc", "gcm"])
+@pytest.mark.parametrize("size", [0, 15, 16, 100000])
+def test_round_trip(mode, size):
+    key, data = generate_key(), payload(size)
+    assert decrypt_bytes(encrypt_bytes(data, key, mode=mode, workers=1), key, workers=1) == data
+
+
+def test_file_round_trip(tmp_path):
+    src, enc, dec, key = (tmp_path / name for name in ("in.bin", "in.enc", "out.bin", "key"))
+    src.write_bytes(payload(5000))
+    encrypt_file(str(src), str(enc), str(key), mode="gcm", workers=1)
+    decrypt_file(str(enc), str(dec), str(key), workers=1)
+    assert dec.read_bytes() == src.read_bytes()
+
+
+@pytest.mark.parametrize("packet_len", [19, 64, 255])
+def test_packet_round_trip(packet_len):
+    key, data = generate_key(), payload(3000)
+    sealed = encrypt_bytes(data, key, mode="packet", packet_len=packet_len)
+    assert len(sealed) % packet_len == 0
+    assert decrypt_bytes(sealed, key, packet_len=packet_len) == data
+
+
+def test_packet_gcm_rejects_tampering():
+    key, data = generate_key(), payload(500)
+    sealed = bytearray(encrypt_bytes(data, key, mode="packet", packet_len=64))
+    sealed[64 + PACKET_HEADER.size] ^= 1
+    decryptor = PacketDecryptor(key, 64)
+    opened = decryptor.feed(bytes(sealed))
+    assert [seq for seq, _ in opened] == [seq for seq in range(len(sealed) // 64) if seq != 1]
+    assert decryptor.missing() == [1]
+
+
+def test_packet_dropped_records_and_noise():
+    packet_len = 64
+    key, data = generate_key(), payload(5000)
+    sealed = encrypt_bytes(data, key, mode="packet", packet_len=packet_len)
+    records = [sealed[i:i + packet_len] for i in range(0, len(sealed), packet_len)]
+    dropped = {2, 5, 6}
+    # Preamble bytes ahead of the records and a lost packet's worth of garbage in one gap
+    stream = b"\xaa" * 37 + b"".join(os.urandom(packet_len) if seq == 5 else b"" if seq in dropped else record
+                                      for seq, record in enumerate(records))
+    decryptor = PacketDecryptor(key, packet_len)
+    opened = [r for i in range(0, len(stream), 100) for r in decryptor.feed(stream[i:i + 100])]
+
+    chunk = packet_payload_len(packet_len)
+    assert dict(opened) == {seq: data[seq * chunk:(seq + 1) * chunk] for seq in range(len(records)) if seq not in dropped}
+    assert decryptor.missing() == sorted(dropped)
+    assert not decryptor.done
+
+
+def test_packet_len_limits():
+    with pytest.raises(ValueError):
+        packet_payload_len(PACKET_HEADER.size + PACKET_TAG_LEN)
+    assert packet_payload_len(PACKET_LAST - 1 + PACKET_HEADER.size + PACKET_TAG_LEN) == PACKET_LAST - 1
+    with pytest.raises(ValueError):
+        packet_payload_len(PACKET_LAST + PACKET_HEADER.size + PACKET_TAG_LEN)
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from correlator import find_all, find_first, find_last, iter_bit_span
+
+PATTERN = b"\xaa" * 8 + b"\x33" * 5
+
+
+# Bytes shifted right by `shift` bits, with random bits shifted in at the front
+def slip(data, shift, seed=0):
+    if not shift:
+        return data
+    bits = random.Random(seed).getrandbits(shift) << len(data) * 8 | int.from_bytes(data, "big")
+    return (bits << 8 - shift).to_bytes(len(data) + 1, "big")
+
+
+def flip(data, *bits):
+    data = bytearray(data)
+    for bit in bits:
+        data[bit // 8] ^= 0x80 >> bit % 8
+    return bytes(data)
+
+
+def noise(n, seed):
+    # Noise without 0x33 runs, so the pattern only matches where it was put
+    return bytes(b if b != 0x33 else 0x32 for b in random.Random(seed).randbytes(n))
+
+
+@pytest.mark.parametrize("shift", range(8))
+def test_find_first_and_last_at_any_bit_offset(shift):
+    data = noise(500, 1) + PATTERN + noise(300, 2) + PATTERN + noise(200, 3)
+    data = slip(data, shift)
+    first, last = 500 * 8 + shift, (500 + len(PATTERN) + 300) * 8 + shift
+    assert find_first(data, PATTERN, 0, chunk_size=64) == (first, 0)
+    assert find_last(data, PATTERN, 0, chunk_size=64) == (last, 0)
+    assert find_first(data, PATTERN, 0, start_bit=first + 1) == (last, 0)
+
+
+def test_bit_errors():
+    data = noise(200, 4) + PATTERN + noise(200, 5)
+    damaged = flip(data, 200 * 8 + 70, 200 * 8 + 90)
+    assert find_first(damaged, PATTERN, 1) is None
+    assert find_first(damaged, PATTERN, 2) == (200 * 8, 2)
+
+
+def test_find_all():
+    offsets = [100, 400, 1000]
+    data = b""
+    for offset in offsets:
+        data += noise(offset - len(data), offset) + PATTERN
+    found, distances = find_all(data + noise(50, 0), PATTERN, 2)
+    assert found.tolist() == [8 * offset for offset in offsets]
+    assert distances.tolist() == [0, 0, 0]
+
+
+@pytest.mark.parametrize("shift", [0, 3])
+def test_iter_bit_span_realigns(shift):
+    data = random.Random(6).randbytes(1000)
+    slipped = slip(data, shift)
+    assert b"".join(bytes(block) for block in iter_bit_span(slipped, shift, shift + len(data) * 8, 100)) == data
@@ -0,0 +1,51 @@
+import zlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from crc_batch import BATCH_MAX_LEN, RESIDUE, check_rows, crc32_rows, verify_file
+
+
+def random_rows(count, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (count, width), dtype=np.uint8)
+
+
+def zlib_rows(rows):
+    return np.array([zlib.crc32(row.tobytes()) for row in rows], dtype=np.uint32)
+
+
+@pytest.mark.parametrize("width", [1, 3, 4, 5, 12, BATCH_MAX_LEN, BATCH_MAX_LEN + 1, 260])
+def test_crc32_rows_matches_zlib(width):
+    rows = random_rows(500, width)
+    assert np.array_equal(crc32_rows(rows), zlib_rows(rows))
+
+
+@pytest.mark.parametrize("width", [BATCH_MAX_LEN + 1, 261])
+def test_crc32_rows_batches_any_width(width):
+    rows = random_rows(200, width)
+    assert np.array_equal(crc32_rows(rows, max_len=None), zlib_rows(rows))
+
+
+# Packets as digital.crc32_bb sends them: payload followed by its little-endian CRC32
+def packets(count, packet_len, seed=0):
+    payloads = random_rows(count, packet_len, seed)
+    crcs = zlib_rows(payloads).astype("<u4").view(np.uint8).reshape(count, 4)
+    return payloads, np.concatenate((payloads, crcs), axis=1)
+
+
+def test_check_rows():
+    _, rows = packets(100, 8)
+    assert zlib.crc32(rows[0].tobytes()) == RESIDUE
+    rows[[3, 50], 2] ^= 0x40
+    assert np.flatnonzero(~check_rows(rows)).tolist() == [3, 50]
+
+
+def test_verify_file(tmp_path):
+    payloads, rows = packets(1000, 8)
+    rows[7, 0] ^= 1
+    path, out = tmp_path / "packets.bin", tmp_path / "good.bin"
+    path.write_bytes(rows.tobytes() + b"\x00\x01")
+    mask = verify_file(str(path), 8, str(out), chunk_packets=128)
+    assert np.flatnonzero(~mask).tolist() == [7]
+    assert out.read_bytes() == np.delete(payloads, 7, axis=0).tobytes()
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from addPreamble import add_preamble
+from framing import FrameTracker, get_profile, profile_names
+from removePreamble import extract_bursts, remove_preamble
+
+
+def payload(n, seed=0):
+    return random.Random(seed).randbytes(n)
+
+
+def frame(tmp_path, data, profile, align=None):
+    src, framed = tmp_path / "in.bin", tmp_path / "framed.bin"
+    src.write_bytes(data)
+    add_preamble(str(src), str(framed), chunk_size=4096, profile=profile, align=align)
+    return framed
+
+
+@pytest.mark.parametrize("name", profile_names())
+def test_round_trip(tmp_path, name):
+    profile = get_profile(name)
+    data = payload(10000)
+    framed = frame(tmp_path, data, profile)
+    assert framed.stat().st_size == len(data) + profile.overhead
+    out = tmp_path / "out.bin"
+    remove_preamble(str(framed), str(out), chunk_size=4096, profile=profile)
+    assert out.read_bytes() == data
+
+
+@pytest.mark.parametrize("packet_len", [8, 19, 64, 256])
+def test_align_starts_payload_on_packet_boundary(tmp_path, packet_len):
+    profile = get_profile("preamble")
+    data = payload(1000)
+    blob = frame(tmp_path, data, profile, align=packet_len).read_bytes()
+    assert blob.index(profile.detect_sequence + data) + profile.detect_len == blob.index(data)
+    assert blob.index(data) % packet_len == 0
+    out = tmp_path / "out.bin"
+    remove_preamble(str(tmp_path / "framed.bin"), str(out), profile=profile)
+    assert out.read_bytes() == data
+
+
+def test_round_trip_with_bit_errors_and_slip(tmp_path):
+    profile = get_profile("preamble")
+    data = payload(5000)
+    blob = bytearray(frame(tmp_path, data, profile).read_bytes())
+    # One flipped bit in each detection sequence
+    blob[profile.preamble_len + 3] ^= 0x10
+    blob[-profile.preamble_len - 2] ^= 0x01
+    # Shift the whole capture by three bits
+    bits = int.from_bytes(blob, "big") >> 3
+    slipped = tmp_path / "slipped.bin"
+    slipped.write_bytes(bits.to_bytes(len(blob), "big"))
+    out = tmp_path / "out.bin"
+    remove_preamble(str(slipped), str(out), max_bit_errors=2, profile=profile)
+    assert out.read_bytes() == data
+
+
+def test_extract_bursts(tmp_path):
+    profile = get_profile("preamble")
+    bursts = [payload(300 + 100 * k, seed=k) for k in range(3)]
+    capture = b""
+    for k, data in enumerate(bursts):
+        capture += frame(tmp_path, data, profile).read_bytes()
+    # The last burst is cut off before its closing marker
+    capture = capture[:-profile.preamble_len - profile.detect_len]
+    (tmp_path / "capture.bin").write_bytes(capture)
+    written = extract_bursts(str(tmp_path / "capture.bin"), str(tmp_path / "rx.bin"), profile=profile)
+    assert [open(path, "rb").read() for path, _, _, _ in written] == bursts
+    assert [complete for _, _, _, complete in written] == [True, True, False]
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 4096])
+def test_frame_tracker(chunk):
+    profile = get_profile("preamble")
+    data = payload(2000)
+    stream = bytes([profile.preamble_byte]) * 50 + profile.opening_marker() + data + profile.closing_marker() + b"junk"
+    tracker = FrameTracker(profile)
+    out = b"".join(tracker.feed(stream[i:i + chunk]) for i in range(0, len(stream), chunk))
+    assert out == data
+    assert tracker.done
+    assert tracker.flush() == b""
+
+
+def test_frame_tracker_flush_without_closing_marker():
+    profile = get_profile("preamble")
+    data = payload(100) + profile.detect_sequence[:3]
+    tracker = FrameTracker(profile)
+    out = tracker.feed(profile.opening_marker() + data)
+    assert out != data
+    assert out + tracker.flush() == data
+    assert not tracker.done
@@ -0,0 +1,212 @@
+import argparse
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import traceback
+
+from framing import PACKET_LEN, SPS
+
+HOST = "127.0.0.1"
+PORT = 52001
+MULTIPLY_CONST = 0.707
+
+ROLES = ("tx", "rx", "both")
+
+
+# Send one command to a running daemon and return its reply
+def request(cmd, host=HOST, port=PORT, timeout=None, **fields):
+    """Sends {"cmd": cmd, **fields} as one JSON line and returns the decoded reply.
+
+    Raises OSError when no daemon is listening.
+    """
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        conn.sendall((json.dumps(dict(fields, cmd=cmd)) + "\n").encode())
+        with conn.makefile("r", encoding="utf-8") as reply:
+            return json.loads(reply.readline())
+
+
+# True when a daemon answers on host:port
+def is_running(host=HOST, port=PORT):
+    try:
+        return request("status", host, port, timeout=1).get("ok", False)
+    except OSError:
+        return False
+
+
+class Transceiver:
+    """Keeps the headless flowgraphs, their filter taps and the radio open between transfers.
+
+    The transmitter is built once and restarted for every file. The receiver
+    runs the whole time; a receive job points its file sink at the job's path and
+    closes it again when the job ends, and in between the payloads are dropped.
+
+    The receiver has no FrameGate, so a receive job does not end at the end of
+    the transmission: it runs for its duration (or until stop_receive) and the
+    file holds everything received meanwhile, preamble and detection sequences
+    included, for removePreamble.py to strip.
+    """
+
+    def __init__(self, role="both", sps=SPS, mult=MULTIPLY_CONST, packet_len=PACKET_LEN):
+        self.settings = {"sps": sps, "mult": mult, "packet_len": packet_len}
+        self.tx = self.rx = None
+        self.tx_lock = threading.Lock()
+        self.rx_lock = threading.Lock()
+        self.rx_job = None
+        self._rx_ids = itertools.count(1)
+        start = time.perf_counter()
+        if role in ("tx", "both"):
+            from crctransmitter_headless import crctransmitter_headless
+            self.tx = crctransmitter_headless(filename_variable=os.devnull, packet_len=packet_len, sps=sps, Multiply_Const=mult)
+        if role in ("rx", "both"):
+            from crcreceiver_headless import crcreceiver_headless
+            self.rx = crcreceiver_headless(packet_len=packet_len, recfilename_variable=os.devnull, sps=sps, Multiply_Const=mult)
+            self.rx.blocks_file_sink_0.close()
+            self.rx.start()
+        print(f"Flowgraphs ready ({role}) in {time.perf_counter() - start:.2f} s")
+
+    # Refuse jobs made for other link settings than the flowgraphs were built with
+    def _check_settings(self, job):
+        for key, value in self.settings.items():
+            if key in job and job[key] != value:
+                raise ValueError(f"daemon runs with {key}={value}, job asks for {job[key]}")
+
+    # Transmit a whole file; returns once it has been sent
+    def send(self, job):
+        if self.tx is None:
+            raise ValueError("daemon was started without a transmitter")
+        self._check_settings(job)
+        path = job["path"]
+        if not os.path.isfile(path):
+            raise ValueError(f"no such file: {path}")
+        with self.tx_lock:
+            start = time.perf_counter()
+            self.tx.set_filename_variable(path)
+            self.tx.start()
+            self.tx.wait()
+            elapsed = time.perf_counter() - start
+        return {"bytes": os.path.getsize(path), "seconds": elapsed}
+
+    # Start writing received payloads to a file, for `duration` seconds or until stop_receive
+    def receive(self, job):
+        if self.rx is None:
+            raise ValueError("daemon was started without a receiver")
+        self._check_settings(job)
+        with self.rx_lock:
+            if self.rx_job is not None:
+                raise ValueError(f"already receiving into {self.rx_job['path']}")
+            self.rx.set_recfilename_variable(job["path"])
+            rx_job = self.rx_job = {"id": next(self._rx_ids), "path": job["path"], "started": time.time(),
+                                    "stopped": threading.Event()}
+        if job.get("duration") is None:
+            return {"path": job["path"], "job": rx_job["id"]}
+        # A stop_receive in the meantime ends the wait early and has already closed the file
+        rx_job["stopped"].wait(float(job["duration"]))
+        with self.rx_lock:
+            if self.rx_job is rx_job:
+                self._end_receive()
+        return {"path": rx_job["path"], "bytes": os.path.getsize(rx_job["path"])}
+
+    # Close the current receive file; called with rx_lock held
+    def _end_receive(self):
+        self.rx.blocks_file_sink_0.close()
+        self.rx_job["stopped"].set()
+        self.rx_job = None
+
+    # Close the current receive file
+    def stop_receive(self, job=None):
+        with self.rx_lock:
+            if self.rx_job is None:
+                raise ValueError("not receiving")
+            path = self.rx_job["path"]
+            self._end_receive()
+        return {"path": path, "bytes": os.path.getsize(path)}
+
+    def status(self, job=None):
+        return dict(self.settings, tx=self.tx is not None, rx=self.rx is not None,
+                    receiving=self.rx_job["path"] if self.rx_job else None)
+
+    def close(self):
+        if self.rx is not None:
+            if self.rx_job is not None:
+                self.stop_receive()
+            self.rx.stop()
+            self.rx.wait()
+
+
+class Handler(socketserver.StreamRequestHandler):
+    # One JSON command per line, one JSON reply per command
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+                cmd = job.get("cmd")
+                if cmd == "shutdown":
+                    threading.Thread(target=self.server.shutdown).start()
+                    reply = {}
+                elif cmd in ("send", "receive", "stop_receive", "status"):
+                    reply = getattr(self.server.transceiver, cmd)(job)
+                else:
+                    raise ValueError(f"unknown command: {cmd}")
+                reply["ok"] = True
+            except (ValueError, KeyError, OSError) as e:
+                reply = {"ok": False, "error": str(e)}
+            except Exception as e:
+                # Anything else (e.g. a RuntimeError from GNU Radio) still gets a reply line
+                traceback.print_exc()
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Serve jobs on a local socket until a shutdown command or Ctrl+C
+def serve(transceiver, host=HOST, port=PORT):
+    with Server((host, port), Handler) as server:
+        server.transceiver = transceiver
+        print(f"Listening on {host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            transceiver.close()
+    print("Transceiver stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived CRC QPSK transceiver taking jobs on a local socket.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("serve", help="Build the flowgraphs once and serve jobs.")
+    run.add_argument("--role", choices=ROLES, required=True, help="Open the transmitter, the receiver, or both.")
+    run.add_argument("--sps", type=int, default=SPS, help="Samples per symbol.")
+    run.add_argument("--mult", type=float, default=MULTIPLY_CONST, help="Multiply constant.")
+    run.add_argument("--packet_len", type=int, default=PACKET_LEN, help="Payload bytes per packet.")
+    run.add_argument("--port", type=int, default=PORT, help="Local control port.")
+
+    send = sub.add_parser("send", help="Ask a running daemon to transmit a file.")
+    send.add_argument("path")
+    receive = sub.add_parser("receive", help="Ask a running daemon to receive into a file.")
+    receive.add_argument("path")
+    receive.add_argument("--duration", type=float, help="Seconds to receive (default: until stop_receive).")
+    for name in ("stop_receive", "status", "shutdown"):
+        sub.add_parser(name, help=f"Send the {name} command.")
+    for p in sub.choices.values():
+        if p is not run:
+            p.add_argument("--port", type=int, default=PORT, help="Local control port.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(Transceiver(args.role, args.sps, args.mult, args.packet_len), port=args.port)
+    else:
+        fields = {k: v for k, v in vars(args).items() if k not in ("command", "port") and v is not None}
+        if "path" in fields:
+            fields["path"] = os.path.abspath(fields["path"])
+        print(json.dumps(request(args.command, port=args.port, **fields)))